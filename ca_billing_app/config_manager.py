@@ -27,6 +27,9 @@ class ConfigManager:
         # Default settings
         defaults = {
             "database_path": get_default_db_path(),
+            "db_profile": "auto",
+            "query_log": False,
+            "slow_query_ms": 100,
             "last_backup_date": None
         }
         self.save_settings(defaults)
@@ -45,5 +48,22 @@ class ConfigManager:
         self.settings["database_path"] = path
         self.save_settings()
 
+    def get_db_profile(self):
+        return self.settings.get("db_profile", "auto")
+
+    def set_db_profile(self, name):
+        self.settings["db_profile"] = name
+        self.save_settings()
+
+    def get_query_log_enabled(self):
+        # ANKITACA_QUERY_LOG=1 turns it on for one run without editing settings
+        env = os.environ.get("ANKITACA_QUERY_LOG")
+        if env is not None:
+            return env.strip().lower() in ("1", "true", "yes", "on")
+        return bool(self.settings.get("query_log", False))
+
+    def get_slow_query_ms(self):
+        return float(os.environ.get("ANKITACA_SLOW_QUERY_MS") or self.settings.get("slow_query_ms", 100))
+
 # Global instance
 config_manager = ConfigManager()
@@ -1,5 +1,6 @@
 import os
 import shutil
+import sqlite3
 import datetime
 import smtplib
 from email.mime.multipart import MIMEMultipart
@@ -12,14 +13,17 @@ import sys
 
 try:
     from services.reporting_service import ReportingService
-    from exports.excel_exporter import ExcelExporter
+    from utils.streaming_exporter import StreamingExporter
+    from db.database import db_manager
 except ImportError:
     # Fallback for if we are running the script directly from inside its folder
     import os
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
     from services.reporting_service import ReportingService
-    from exports.excel_exporter import ExcelExporter
+    from utils.streaming_exporter import StreamingExporter
+    from db.database import db_manager
 
+from itertools import chain
 from config_manager import config_manager
 
 # --- CONFIGURATION ---
@@ -44,19 +48,29 @@ def backup_database():
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_file = os.path.join(BACKUP_DIR, f"billing_backup_{timestamp}.db")
     
-    shutil.copy2(DB_PATH, backup_file)
+    # In WAL mode recent commits may still live in billing.db-wal, so a plain
+    # file copy can miss them. SQLite's online backup copies a consistent image,
+    # read through a snapshot (straight from the file; a detached snapshot
+    # would only copy it twice).
+    dst = sqlite3.connect(backup_file)
+    try:
+        with db_manager.snapshot() as src:
+            src.backup(dst)
+    finally:
+        dst.close()
     print(f"Database backed up to: {backup_file}")
     return backup_file
 
 def generate_invoice_extract():
     # Generate Excel Report
     service = ReportingService()
-    exporter = ExcelExporter()
+    exporter = StreamingExporter()
     
-    # Fetch ALL data for backup purposes
-    data = service.export_data(query_type="invoices")
+    # ALL data for backup purposes, streamed from the database into the file
+    rows = service.iter_export_data(query_type="invoices", detached=True)
+    first = next(rows, None)
     
-    if not data:
+    if first is None:
         print("No invoice data to extract.")
         return None
         
@@ -64,9 +78,9 @@ def generate_invoice_extract():
     filename = f"Invoice_Extract_{timestamp}.xlsx"
     filepath = os.path.join(BACKUP_DIR, filename)
     
-    headers = list(data[0].keys())
-    exporter.export_to_excel(data, headers, filepath)
-    print(f"Invoice extract created: {filepath}")
+    headers = list(first.keys())
+    count = exporter.export_to_excel(chain([first], rows), headers, filepath)
+    print(f"Invoice extract created: {filepath} ({count} invoices)")
     return filepath
 
 def send_email(attachment_path):
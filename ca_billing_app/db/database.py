@@ -1,13 +1,37 @@
 import sqlite3
 import os
 import shutil
-from .schema import create_schema
-from config_manager import config_manager
+import atexit
+import threading
+from contextlib import contextmanager
+from .migrations import run_migrations
+from .pool import ConnectionPool
+from .profiles import PROFILES, resolve_profile_name, apply_profile
+from .instrumentation import InstrumentedConnection, QueryStats
+from config_manager import config_manager, CONFIG_DIR
+
+LOG_DIR = os.path.join(CONFIG_DIR, "logs")
+
+READ_POOL_SIZE = 4
+PROGRESS_CHECK_OPS = 1000  # VM instructions between cancel checks
 
 class DatabaseManager:
-    def __init__(self):
-        self.db_path = config_manager.get_db_path()
-        self.migrate_if_needed()
+    def __init__(self, db_path=None, profile=None):
+        # An explicit path pins the manager to that file (scripts, benchmarks);
+        # otherwise the path follows the user's settings.
+        self._fixed_path = db_path
+        self.db_path = db_path or config_manager.get_db_path()
+        self._profile_setting = profile or config_manager.get_db_profile()
+        self.profile_name = resolve_profile_name(self._profile_setting, self.db_path)
+        self.pool = ConnectionPool(self._open_connection)
+        # Read-only connections for snapshot() (reports/exports)
+        self.read_pool = ConnectionPool(self._open_read_connection, max_size=READ_POOL_SIZE)
+        self._local = threading.local()
+        self.query_stats = None
+        if config_manager.get_query_log_enabled():
+            self.enable_query_log()
+        if not db_path:
+            self.migrate_if_needed()
         self.ensure_db_exists()
 
     def migrate_if_needed(self):
@@ -35,19 +59,217 @@ class DatabaseManager:
         if not os.path.exists(db_dir):
             os.makedirs(db_dir)
         
-        # Connect and initialize schema if new
-        conn = sqlite3.connect(self.db_path)
-        create_schema(conn)
-        conn.close()
+        # Create or upgrade the schema (a single PRAGMA read when already current)
+        conn = self._open_connection()
+        try:
+            run_migrations(conn)
+        finally:
+            conn.close()
 
-    def get_connection(self):
-        """Returns a new connection object."""
-        # Refresh path from config in case it changed in UI
-        self.db_path = config_manager.get_db_path()
-        conn = sqlite3.connect(self.db_path)
+    def _open_connection(self):
+        """Opens and configures a raw (unpooled) connection with the active profile."""
+        busy_ms = PROFILES[self.profile_name]["busy_timeout"]
+        factory = InstrumentedConnection if self.query_stats else sqlite3.Connection
+        conn = sqlite3.connect(self.db_path, timeout=busy_ms / 1000.0, check_same_thread=False, factory=factory)
+        if self.query_stats:
+            conn.query_stats = self.query_stats
         conn.execute("PRAGMA foreign_keys = ON")
+        apply_profile(conn, self.profile_name)
         conn.row_factory = sqlite3.Row  # Access columns by name
         return conn
 
+    def _open_read_connection(self):
+        conn = self._open_connection()
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def set_profile(self, name):
+        """Switches the performance profile ('auto' or a PROFILES key) for all new connections."""
+        if not self._fixed_path:
+            config_manager.set_db_profile(name)
+        self._profile_setting = name
+        self.profile_name = resolve_profile_name(name, self.db_path)
+        self._close_pools()
+
+    @contextmanager
+    def profile_scope(self, name):
+        """
+        Temporarily applies another profile (e.g. 'bulk-load') to this thread's
+        connection and restores the active one afterwards.
+        """
+        with self.connection() as conn:
+            apply_profile(conn, name)
+            try:
+                yield conn
+            finally:
+                apply_profile(conn, self.profile_name)
+
+    def enable_query_log(self, slow_ms=None):
+        """
+        Times every statement on new connections, logs slow ones (with their
+        plan) to ~/AnkitaCA/logs/slow_queries.log and writes per-statement
+        totals to ~/AnkitaCA/logs/query_stats.txt at exit.
+        """
+        if self.query_stats is None:
+            self.query_stats = QueryStats(LOG_DIR, config_manager.get_slow_query_ms())
+            atexit.register(self.query_stats.dump)
+            # Reopen so every connection goes through the instrumented class
+            self._close_pools()
+        if slow_ms is not None:
+            self.query_stats.slow_ms = slow_ms
+        return self.query_stats
+
+    def refresh_path(self):
+        """Picks up a database path changed from the UI and drops connections to the old file."""
+        if self._fixed_path:
+            return
+        path = config_manager.get_db_path()
+        if path != self.db_path:
+            self._close_pools()
+            self.db_path = path
+            # A move into/out of a cloud folder changes what 'auto' resolves to
+            self.profile_name = resolve_profile_name(self._profile_setting, path)
+            self.ensure_db_exists()
+
+    def get_connection(self):
+        """
+        Returns a pooled connection. Nested calls on the same thread share one
+        connection; close() hands it back to the pool.
+        """
+        self.refresh_path()
+        return self.pool.acquire()
+
+    @contextmanager
+    def connection(self):
+        conn = self.get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def transaction(self, mode="DEFERRED"):
+        """
+        Commits on success, rolls back on error.
+        Inside an already open transaction it simply joins it.
+        """
+        with self.connection() as conn:
+            nested = conn.in_transaction
+            if not nested:
+                conn.execute(f"BEGIN {mode}")
+            try:
+                yield conn
+            except Exception:
+                if not nested:
+                    conn.rollback()
+                raise
+            else:
+                if not nested:
+                    conn.commit()
+
+    @contextmanager
+    def snapshot(self, detached=False):
+        """
+        Read-only connection with a consistent point-in-time view, for
+        reports and exports: a read transaction on a query_only connection.
+        - WAL: writers are never blocked by it (WAL readers don't hold locks
+          writers wait for).
+        - rollback journal (cloud-synced profile): the read holds a SHARED
+          lock, so commits wait (up to busy_timeout) until it ends; keep the
+          work inside the block short.
+        detached=True: for long reads in rollback-journal mode, the file is
+        first copied into memory with the backup API (one short read) and the
+        copy is queried, so writers are not held up. Costs time and memory in
+        proportion to the database size, so only for explicit long jobs.
+        Nested snapshot() calls on one thread share the same view.
+        """
+        self.refresh_path()
+        conn = self.read_pool.acquire()
+        try:
+            if conn.in_transaction:
+                yield conn
+                return
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if not detached or mode.lower() == "wal":
+                with self._cancellable(conn):
+                    conn.execute("BEGIN DEFERRED")
+                    try:
+                        # The first read fixes the snapshot (takes the SHARED lock outside WAL)
+                        conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                        yield conn
+                    finally:
+                        conn.rollback()
+            else:
+                copy = sqlite3.connect(":memory:", check_same_thread=False, factory=type(conn.raw))
+                try:
+                    if self.query_stats:
+                        copy.query_stats = self.query_stats
+                    conn.raw.backup(copy)
+                    copy.row_factory = sqlite3.Row
+                    copy.execute("PRAGMA query_only = ON")
+                    with self._cancellable(copy):
+                        yield copy
+                finally:
+                    copy.close()
+        finally:
+            conn.close()
+
+    @contextmanager
+    def cancel_scope(self, should_cancel):
+        """
+        While active, any statement this thread runs (writer connection or
+        snapshot) is aborted with sqlite3.OperationalError('interrupted') as
+        soon as should_cancel() returns true.
+        """
+        self._local.should_cancel = should_cancel
+        try:
+            with self.connection() as conn:
+                with self._cancellable(conn):
+                    yield
+        finally:
+            self._local.should_cancel = None
+
+    @contextmanager
+    def _cancellable(self, conn):
+        should_cancel = getattr(self._local, "should_cancel", None)
+        if should_cancel is None:
+            yield
+            return
+        conn.set_progress_handler(should_cancel, PROGRESS_CHECK_OPS)
+        try:
+            yield
+        finally:
+            try:
+                conn.set_progress_handler(None, 0)
+            except sqlite3.Error:
+                pass
+
+    def _close_pools(self):
+        self.pool.close_all()
+        self.read_pool.close_all()
+
+    def close(self):
+        self._close_pools()
+
+class _LazyDatabaseManager:
+    """
+    The app-wide DatabaseManager, created on first use: creating it opens
+    (and migrates) the user's database, which importing a service must not
+    do (benchmarks and scripts work on their own files).
+    """
+    def __init__(self):
+        self._manager = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._manager is None:
+            with self._lock:
+                if self._manager is None:
+                    self._manager = DatabaseManager()
+        return self._manager
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
 # Global instance
-db_manager = DatabaseManager()
+db_manager = _LazyDatabaseManager()
@@ -0,0 +1,93 @@
+# Index advisor.
+# Services register their hot SQL here (with representative parameters) and
+# the advisor runs EXPLAIN QUERY PLAN over each one, reporting any full-table
+# scans so a missing index shows up before the data grows.
+
+REGISTERED_QUERIES = {}
+
+def register_query(name, sql, params=(), allow_scan=False):
+    """
+    name: 'service.method' label used in the report
+    allow_scan: the query reads a whole table by design (e.g. full export)
+    """
+    REGISTERED_QUERIES[name] = {"sql": sql, "params": tuple(params), "allow_scan": allow_scan}
+
+def load_service_queries():
+    # Importing the services registers their queries
+    import services.invoice_service  # noqa: F401
+    import services.payment_service  # noqa: F401
+    import services.reporting_service  # noqa: F401
+    import services.recurring_service  # noqa: F401
+
+def explain(conn, sql, params=()):
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return [row[3] for row in rows]
+
+def find_full_scans(plan):
+    """Plan lines that read every row of a table (not an index search)."""
+    scans = []
+    for detail in plan:
+        if not detail.startswith("SCAN "):
+            continue
+        # 'SCAN CONSTANT ROW' / subquery scans aren't table reads
+        if "CONSTANT ROW" in detail or "SUBQUERY" in detail:
+            continue
+        if "USING INDEX" in detail or "USING COVERING INDEX" in detail:
+            continue
+        scans.append(detail)
+    return scans
+
+def analyze_queries(conn):
+    """Returns one result dict per registered query."""
+    load_service_queries()
+    results = []
+    for name, entry in sorted(REGISTERED_QUERIES.items()):
+        try:
+            plan = explain(conn, entry["sql"], entry["params"])
+        except Exception as e:
+            results.append({"name": name, "plan": [], "full_scans": [], "error": str(e), "allow_scan": entry["allow_scan"]})
+            continue
+        results.append({
+            "name": name,
+            "plan": plan,
+            "full_scans": find_full_scans(plan),
+            "error": None,
+            "allow_scan": entry["allow_scan"],
+        })
+    return results
+
+def run_index_advisor(db=None):
+    """Prints the report. Returns the number of unexpected full-table scans."""
+    if db is None:
+        from db.database import db_manager as db
+
+    conn = db.get_connection()
+    try:
+        results = analyze_queries(conn)
+    finally:
+        conn.close()
+
+    problems = 0
+    print(f"Index advisor - {db.db_path}")
+    for r in results:
+        if r["error"]:
+            status = "ERROR"
+            problems += 1
+        elif r["full_scans"] and not r["allow_scan"]:
+            status = "FULL SCAN"
+            problems += 1
+        elif r["full_scans"]:
+            status = "ok (full read by design)"
+        else:
+            status = "ok"
+        print(f"\n[{status}] {r['name']}")
+        if r["error"]:
+            print(f"    {r['error']}")
+        for line in r["plan"]:
+            print(f"    {line}")
+
+    if problems:
+        print(f"\n{problems} query(s) need attention.")
+    else:
+        print("\nAll registered queries use indexes.")
+    return problems
@@ -0,0 +1,279 @@
+import os
+import sys
+import time
+import logging
+import sqlite3
+import sysconfig
+import threading
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+
+# Query instrumentation.
+# When enabled, DatabaseManager opens connections with InstrumentedConnection,
+# whose cursors time every statement (execute + fetching the rows), count the
+# rows and remember which app code ran it. Statements slower than the
+# threshold go to a rotating slow-query log together with their query plan,
+# and per-statement totals can be dumped when the process exits.
+# Disabled (the default) the plain sqlite3.Connection is used: no overhead.
+
+DB_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(DB_PACKAGE_DIR)
+STDLIB_DIR = sysconfig.get_paths()["stdlib"]
+
+SLOW_LOG_MAX_BYTES = 1024 * 1024
+SLOW_LOG_BACKUPS = 3
+
+def normalize_sql(sql):
+    return " ".join(sql.split())
+
+def find_call_site():
+    """
+    'file.py:123 function' of the first app frame outside db/ (services, UI,
+    scripts); falls back to the first non-library frame, e.g. for migrations.
+    """
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(DB_PACKAGE_DIR):
+            if filename.startswith(APP_DIR):
+                return f"{os.path.relpath(filename, APP_DIR)}:{frame.f_lineno} {frame.f_code.co_name}"
+            if fallback is None and not filename.startswith(("<frozen", STDLIB_DIR)):
+                fallback = f"{filename}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback or "?"
+
+class QueryStats:
+    """Thread-safe per-statement aggregates plus the slow-query log."""
+    def __init__(self, log_dir, slow_ms=100):
+        self.log_dir = log_dir
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._explained = set()
+        self._slow_logger = None
+        self.started = time.time()
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+            self.started = time.time()
+
+    def record(self, conn, sql, params, elapsed_ms, rows, call_site, error=None):
+        key = normalize_sql(sql)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = {
+                    "sql": key, "calls": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "rows": 0, "errors": 0, "call_sites": Counter(),
+                }
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["rows"] += rows
+            entry["call_sites"][call_site] += 1
+            if error:
+                entry["errors"] += 1
+            explain = elapsed_ms >= self.slow_ms and key not in self._explained
+            if explain:
+                self._explained.add(key)
+
+        if elapsed_ms >= self.slow_ms:
+            self._log_slow(conn, sql, params, elapsed_ms, rows, call_site, explain)
+
+    def _log_slow(self, conn, sql, params, elapsed_ms, rows, call_site, explain):
+        lines = [f"{elapsed_ms:.1f} ms, {rows} rows, {call_site}", f"  {normalize_sql(sql)}"]
+        if params:
+            lines.append(f"  params: {params!r}"[:500])
+        # The plan is captured once per statement; repeats only log timing.
+        if explain:
+            for detail in self._query_plan(conn, sql, params):
+                lines.append(f"  plan: {detail}")
+        self._get_slow_logger().warning("\n".join(lines))
+
+    def _query_plan(self, conn, sql, params):
+        verb = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+        if verb not in ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE"):
+            return []
+        try:
+            # A plain sqlite3.Cursor so the EXPLAIN itself isn't recorded
+            rows = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()
+            return [row[3] for row in rows]
+        except sqlite3.Error as e:
+            return [f"(unavailable: {e})"]
+
+    def _get_slow_logger(self):
+        if self._slow_logger is None:
+            os.makedirs(self.log_dir, exist_ok=True)
+            logger = logging.getLogger("ankitaca.slow_queries")
+            if not logger.handlers:
+                handler = RotatingFileHandler(
+                    os.path.join(self.log_dir, "slow_queries.log"),
+                    maxBytes=SLOW_LOG_MAX_BYTES, backupCount=SLOW_LOG_BACKUPS, encoding="utf-8"
+                )
+                handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                logger.addHandler(handler)
+                logger.propagate = False
+            self._slow_logger = logger
+        return self._slow_logger
+
+    def snapshot(self):
+        """Per-statement stats, most expensive (total time) first."""
+        with self._lock:
+            entries = [dict(e, call_sites=Counter(e["call_sites"])) for e in self._stats.values()]
+        return sorted(entries, key=lambda e: e["total_ms"], reverse=True)
+
+    def format_report(self, top=25):
+        entries = self.snapshot()
+        total_ms = sum(e["total_ms"] for e in entries)
+        calls = sum(e["calls"] for e in entries)
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started))
+        lines = [f"Query stats since {started}: {calls} statements, {total_ms:.1f} ms total", ""]
+        for e in entries[:top]:
+            avg = e["total_ms"] / e["calls"]
+            lines.append(
+                f"{e['total_ms']:9.1f} ms  {e['calls']:6d} calls  avg {avg:7.2f}  max {e['max_ms']:7.1f}  "
+                f"{e['rows']:8d} rows" + (f"  {e['errors']} errors" if e["errors"] else "")
+            )
+            lines.append(f"    {e['sql'][:300]}")
+            for site, count in e["call_sites"].most_common(3):
+                lines.append(f"    <- {site} ({count})")
+        if len(entries) > top:
+            lines.append(f"... {len(entries) - top} more statements")
+        return "\n".join(lines)
+
+    def dump(self, path=None):
+        """Writes the report (default ~/AnkitaCA/logs/query_stats.txt). Returns the path."""
+        if not self._stats:
+            return None
+        path = path or os.path.join(self.log_dir, "query_stats.txt")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.format_report(top=100) + "\n")
+        logging.info(f"Query stats written to {path}")
+        return path
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Times execute() plus all fetching of its rows. A statement is recorded
+    once its rows are exhausted, or when the cursor is reused, closed or
+    garbage collected (for the common fetchone()-only case).
+    """
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        call_site = find_call_site()
+        start = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except Exception as e:
+            self._record(sql, parameters, time.perf_counter() - start, 0, call_site, e)
+            raise
+        elapsed = time.perf_counter() - start
+        if self.description is None:
+            # DML / DDL: nothing to fetch
+            self._record(sql, parameters, elapsed, max(self.rowcount, 0), call_site)
+        else:
+            self._pending = [sql, parameters, elapsed, 0, call_site]
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        call_site = find_call_site()
+        start = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        except Exception as e:
+            self._record(sql, None, time.perf_counter() - start, 0, call_site, e)
+            raise
+        self._record(sql, None, time.perf_counter() - start, max(self.rowcount, 0), call_site)
+        return self
+
+    def executescript(self, sql_script):
+        self._finish()
+        call_site = find_call_site()
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._record(sql_script, None, time.perf_counter() - start, 0, call_site)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._add_fetch(time.perf_counter() - start, 0 if row is None else 1, done=row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add_fetch(time.perf_counter() - start, len(rows), done=not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._add_fetch(time.perf_counter() - start, len(rows), done=True)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add_fetch(time.perf_counter() - start, 0, done=True)
+            raise
+        self._add_fetch(time.perf_counter() - start, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def _add_fetch(self, elapsed, rows, done=False):
+        pending = self._pending
+        if pending is None:
+            return
+        pending[2] += elapsed
+        pending[3] += rows
+        if done:
+            self._finish()
+
+    def _finish(self):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            self._record(*pending)
+
+    def _record(self, sql, params, elapsed, rows, call_site, error=None):
+        conn = self.connection
+        stats = getattr(conn, "query_stats", None)
+        if stats is not None:
+            stats.record(conn, sql, params, elapsed * 1000.0, rows, call_site, error)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3.connect(..., factory=InstrumentedConnection); set .query_stats after connecting."""
+    query_stats = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
@@ -0,0 +1,495 @@
+import logging
+from .schema import create_schema, create_indexes
+
+# Ordered schema migrations.
+# PRAGMA user_version stores the last applied version, so an up-to-date
+# database costs one PRAGMA read at startup and no DDL at all.
+# Each migration runs in its own BEGIN IMMEDIATE transaction and records its
+# version before committing: an interrupted run resumes at the failed step.
+# Steps must be safe on databases that were patched by the old
+# utils/migrate_v*.py scripts (check before altering).
+
+MIGRATIONS = []
+
+REBUILD_CHUNK_ROWS = 5000
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+def get_user_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+def add_column_if_missing(conn, table, column, definition):
+    if column not in table_columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def log_progress(description, done, total):
+    if total:
+        logging.info(f"Migrating: {description} ({done}/{total})")
+    else:
+        logging.info(f"Migrating: {description}")
+
+def rebuild_table(conn, table, create_sql, select_exprs, progress=None, description=""):
+    """
+    Recreates `table` from `create_sql` (which must create `{table}_new`) and
+    copies rows in rowid chunks, all inside the caller's transaction.
+    select_exprs: {new_column: SQL expression over the old table}
+    """
+    progress = progress or log_progress
+    new_table = f"{table}_new"
+    conn.execute(f"DROP TABLE IF EXISTS {new_table}")
+    conn.execute(create_sql)
+
+    columns = ", ".join(select_exprs.keys())
+    exprs = ", ".join(select_exprs.values())
+    total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    done = 0
+    last_rowid = -1
+    while True:
+        bounds = conn.execute(
+            f"SELECT MAX(rowid), COUNT(*) FROM (SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+            (last_rowid, REBUILD_CHUNK_ROWS)
+        ).fetchone()
+        if not bounds[1]:
+            break
+        conn.execute(
+            f"INSERT INTO {new_table} ({columns}) SELECT {exprs} FROM {table} WHERE rowid > ? AND rowid <= ?",
+            (last_rowid, bounds[0])
+        )
+        last_rowid = bounds[0]
+        done += bounds[1]
+        progress(description or f"rebuilding {table}", done, total)
+
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+
+def run_migrations(conn, progress=None):
+    """
+    Applies pending migrations. Returns the number applied (0 on the fast path).
+    conn must not be inside a transaction.
+    """
+    latest = MIGRATIONS[-1][0]
+    current = get_user_version(conn)
+    if current >= latest:
+        return 0
+
+    progress = progress or log_progress
+    pending = [m for m in MIGRATIONS if m[0] > current]
+    applied = 0
+
+    # Table rebuilds drop and recreate parents of FK'd tables; with enforcement
+    # on, DROP TABLE invoices would cascade into invoice_items/payments.
+    # This pragma is a no-op inside a transaction, so set it first.
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for step, (version, description, apply) in enumerate(pending, 1):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another instance may have migrated while we waited for the lock
+                if get_user_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                progress(f"v{version} {description}", step, len(pending))
+                apply(conn, progress)
+                problems = conn.execute("PRAGMA foreign_key_check").fetchall()
+                if problems:
+                    logging.warning(f"Migration v{version}: {len(problems)} rows with broken foreign keys")
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+                applied += 1
+            except Exception:
+                conn.rollback()
+                logging.error(f"Migration v{version} ({description}) failed; database left at v{get_user_version(conn)}")
+                raise
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+    return applied
+
+# --- Migrations -------------------------------------------------------------
+
+@migration(1, "base tables")
+def _base_tables(conn, progress):
+    create_schema(conn)
+
+@migration(2, "allotted bank/branch/city on invoices")
+def _allotted_columns(conn, progress):
+    # was utils/migrate_v1.py
+    add_column_if_missing(conn, "invoices", "allotted_bank", "TEXT DEFAULT ''")
+    add_column_if_missing(conn, "invoices", "allotted_branch", "TEXT DEFAULT ''")
+    add_column_if_missing(conn, "invoices", "allotted_city", "TEXT DEFAULT ''")
+
+@migration(3, "place of supply on invoices")
+def _place_of_supply(conn, progress):
+    # was utils/migrate_v2.py
+    add_column_if_missing(conn, "invoices", "place_of_supply", "TEXT DEFAULT ''")
+
+@migration(4, "email on offices")
+def _office_email(conn, progress):
+    # was utils/migrate_v3.py
+    add_column_if_missing(conn, "offices", "email", "TEXT")
+
+BRANCH_COLUMNS = ["id", "branch_name", "city", "bank_name", "ifsc_code", "account_number", "created_at"]
+
+@migration(5, "branches unique on (bank, branch)")
+def _rebuild_branches(conn, progress):
+    # was utils/migrate_v4.py. Older files also carry a NOT NULL bank_branch
+    # column the app no longer fills, which makes every new branch insert fail.
+    if table_columns(conn, "branches") == BRANCH_COLUMNS:
+        return
+    rebuild_table(conn, "branches", """
+        CREATE TABLE branches_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            branch_name TEXT NOT NULL,
+            city TEXT NOT NULL,
+            bank_name TEXT NOT NULL,
+            ifsc_code TEXT NOT NULL,
+            account_number TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(bank_name, branch_name)
+        )
+    """, {col: col for col in BRANCH_COLUMNS}, progress, "rebuilding branches")
+
+@migration(6, "indexes for hot queries")
+def _hot_query_indexes(conn, progress):
+    create_indexes(conn)
+
+MONEY_TO_PAISE = "CAST(ROUND(COALESCE({col}, 0) * 100) AS INTEGER)"
+
+@migration(7, "money as integer paise")
+def _money_in_paise(conn, progress):
+    # REAL columns can't hold exact paise (and REAL affinity turns stored
+    # integers back into floats), so the three money tables are rebuilt with
+    # INTEGER columns.
+    invoice_money = ["taxable_value", "cgst_amount", "sgst_amount", "igst_amount", "grand_total"]
+    invoice_cols = [
+        "id", "invoice_number", "invoice_date", "financial_year", "month_str", "serial_number",
+        "client_gstin", "office_id", "tax_type", *invoice_money, "status", "pdf_path",
+        "allotted_bank", "allotted_branch", "allotted_city", "place_of_supply", "created_at",
+    ]
+    rebuild_table(conn, "invoices", """
+        CREATE TABLE invoices_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_number TEXT NOT NULL UNIQUE,
+            invoice_date DATE NOT NULL,
+            financial_year TEXT NOT NULL, -- e.g., '2526'
+            month_str TEXT NOT NULL, -- e.g., '04'
+            serial_number INTEGER NOT NULL, -- Resets monthly
+
+            client_gstin TEXT NOT NULL,
+            office_id INTEGER NOT NULL,
+            tax_type TEXT CHECK(tax_type IN ('IGST', 'CGST_SGST', 'NONE')) NOT NULL,
+
+            -- Amounts in paise
+            taxable_value INTEGER NOT NULL DEFAULT 0,
+            cgst_amount INTEGER NOT NULL DEFAULT 0,
+            sgst_amount INTEGER NOT NULL DEFAULT 0,
+            igst_amount INTEGER NOT NULL DEFAULT 0,
+            grand_total INTEGER NOT NULL DEFAULT 0,
+
+            status TEXT DEFAULT 'Generated', -- Generated, Paid, Partially Paid, Cancelled
+            pdf_path TEXT,
+
+            allotted_bank TEXT DEFAULT '',
+            allotted_branch TEXT DEFAULT '',
+            allotted_city TEXT DEFAULT '',
+            place_of_supply TEXT DEFAULT '',
+
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+
+            FOREIGN KEY (client_gstin) REFERENCES clients(gstin),
+            FOREIGN KEY (office_id) REFERENCES offices(id)
+        )
+    """, {col: (MONEY_TO_PAISE.format(col=col) if col in invoice_money else col) for col in invoice_cols},
+        progress, "converting invoices to paise")
+
+    rebuild_table(conn, "invoice_items", """
+        CREATE TABLE invoice_items_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_id INTEGER NOT NULL,
+            description TEXT NOT NULL,
+            hsn_code TEXT,
+            amount INTEGER NOT NULL, -- paise
+            gst_rate INTEGER NOT NULL, -- 0, 5, 12, 18
+
+            FOREIGN KEY (invoice_id) REFERENCES invoices(id) ON DELETE CASCADE
+        )
+    """, {
+        "id": "id", "invoice_id": "invoice_id", "description": "description", "hsn_code": "hsn_code",
+        "amount": MONEY_TO_PAISE.format(col="amount"), "gst_rate": "gst_rate",
+    }, progress, "converting invoice items to paise")
+
+    rebuild_table(conn, "payments", """
+        CREATE TABLE payments_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_id INTEGER NOT NULL,
+            amount_received INTEGER NOT NULL, -- paise
+            payment_date DATE NOT NULL,
+            payment_mode TEXT, -- NEFT, IMPS, CHEQUE, CASH
+            reference_number TEXT,
+            notes TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+
+            FOREIGN KEY (invoice_id) REFERENCES invoices(id) ON DELETE CASCADE
+        )
+    """, {
+        "id": "id", "invoice_id": "invoice_id",
+        "amount_received": MONEY_TO_PAISE.format(col="amount_received"),
+        "payment_date": "payment_date", "payment_mode": "payment_mode",
+        "reference_number": "reference_number", "notes": "notes", "created_at": "created_at",
+    }, progress, "converting payments to paise")
+
+    # Indexes went with the old tables
+    create_indexes(conn)
+
+@migration(8, "invoice number counters")
+def _invoice_sequences(conn, progress):
+    # One row per (FY, month) holding the last serial handed out, so the next
+    # number is a primary-key lookup instead of a scan of the month's invoices.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS invoice_sequences (
+            financial_year TEXT NOT NULL,
+            month_str TEXT NOT NULL,
+            last_serial INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (financial_year, month_str)
+        ) WITHOUT ROWID
+    """)
+    # Backfill with the highest serial already used, parsed from the numbers
+    # themselves (as generate_invoice_number did) so manual numbers count too.
+    last = {}
+    for row in conn.execute("SELECT financial_year, month_str, invoice_number FROM invoices"):
+        parts = row[2].split('/')
+        if len(parts) == 4 and parts[3].isdigit():
+            key = (row[0], row[1])
+            last[key] = max(last.get(key, 0), int(parts[3]))
+    conn.executemany("""
+        INSERT INTO invoice_sequences (financial_year, month_str, last_serial) VALUES (?, ?, ?)
+        ON CONFLICT (financial_year, month_str) DO UPDATE SET last_serial = MAX(last_serial, excluded.last_serial)
+    """, [(fy, month, serial) for (fy, month), serial in last.items()])
+
+@migration(9, "recurring invoice templates and PDF queue")
+def _recurring_templates(conn, progress):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS recurring_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            client_gstin TEXT NOT NULL,
+            office_id INTEGER NOT NULL,
+            tax_type TEXT CHECK(tax_type IN ('IGST', 'CGST_SGST', 'NONE')) NOT NULL,
+            allotted_bank TEXT DEFAULT '',
+            allotted_branch TEXT DEFAULT '',
+            allotted_city TEXT DEFAULT '',
+            place_of_supply TEXT DEFAULT '',
+            invoice_day INTEGER NOT NULL DEFAULT 1, -- day of month; clamped to the month's length
+            start_month TEXT NOT NULL, -- 'YYYY-MM', first month to bill
+            end_month TEXT, -- 'YYYY-MM', last month to bill (NULL: open-ended)
+            is_active BOOLEAN DEFAULT 1,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+
+            FOREIGN KEY (client_gstin) REFERENCES clients(gstin),
+            FOREIGN KEY (office_id) REFERENCES offices(id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS recurring_template_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            template_id INTEGER NOT NULL,
+            description TEXT NOT NULL,
+            hsn_code TEXT,
+            amount INTEGER NOT NULL, -- paise
+            gst_rate INTEGER NOT NULL, -- 0, 5, 12, 18
+
+            FOREIGN KEY (template_id) REFERENCES recurring_templates(id) ON DELETE CASCADE
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recurring_template_items_template_id ON recurring_template_items (template_id)")
+    # Which invoice a template produced for a month; the primary key makes a
+    # second run for the same month a no-op for that template.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS recurring_invoices (
+            template_id INTEGER NOT NULL,
+            period TEXT NOT NULL, -- 'YYYY-MM'
+            invoice_id INTEGER NOT NULL,
+            PRIMARY KEY (template_id, period),
+
+            FOREIGN KEY (template_id) REFERENCES recurring_templates(id) ON DELETE CASCADE,
+            FOREIGN KEY (invoice_id) REFERENCES invoices(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """)
+    # Invoices whose PDF still has to be (re)generated
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pdf_queue (
+            invoice_id INTEGER PRIMARY KEY,
+            queued_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+
+            FOREIGN KEY (invoice_id) REFERENCES invoices(id) ON DELETE CASCADE
+        )
+    """)
+
+@migration(10, "reserved invoice number ledger")
+def _reserved_invoice_numbers(conn, progress):
+    # Numbers taken out of the sequence without an invoice (skipped/voided).
+    # Before this, a skip inserted a Cancelled zero-value invoice for a dummy
+    # client SKIP00000000000 plus a placeholder item, which every report saw.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reserved_invoice_numbers (
+            invoice_number TEXT PRIMARY KEY,
+            financial_year TEXT NOT NULL,
+            month_str TEXT NOT NULL,
+            serial_number INTEGER NOT NULL,
+            reserved_date DATE NOT NULL,
+            reason TEXT DEFAULT '',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reserved_invoice_numbers_fy_month
+        ON reserved_invoice_numbers (financial_year, month_str, serial_number)
+    """)
+    # Move the old dummy invoices into the ledger
+    dummy = "SELECT id FROM invoices WHERE client_gstin = 'SKIP00000000000'"
+    conn.execute(f"""
+        INSERT OR IGNORE INTO reserved_invoice_numbers (
+            invoice_number, financial_year, month_str, serial_number, reserved_date, reason, created_at
+        )
+        SELECT invoice_number, financial_year, month_str, serial_number, invoice_date, 'Skipped', created_at
+        FROM invoices WHERE id IN ({dummy})
+    """)
+    for table in ("invoice_items", "payments", "pdf_queue", "recurring_invoices"):
+        conn.execute(f"DELETE FROM {table} WHERE invoice_id IN ({dummy})")
+    moved = conn.execute(f"DELETE FROM invoices WHERE id IN ({dummy})").rowcount
+    conn.execute("DELETE FROM clients WHERE gstin = 'SKIP00000000000'")
+    if moved:
+        logging.info(f"Moved {moved} skipped invoice numbers to reserved_invoice_numbers")
+
+@migration(11, "amount paid and balance due on invoices")
+def _invoice_payment_totals(conn, progress):
+    # amount_paid = SUM(payments.amount_received), balance_due = grand_total
+    # - amount_paid, both in paise and kept current by the triggers below, so
+    # outstanding balances are column reads instead of per-invoice SUMs.
+    add_column_if_missing(conn, "invoices", "amount_paid", "INTEGER NOT NULL DEFAULT 0")
+    add_column_if_missing(conn, "invoices", "balance_due", "INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        UPDATE invoices SET amount_paid = COALESCE(
+            (SELECT SUM(amount_received) FROM payments WHERE invoice_id = invoices.id), 0)
+    """)
+    conn.execute("UPDATE invoices SET balance_due = grand_total - amount_paid")
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_payments_insert AFTER INSERT ON payments
+        BEGIN
+            UPDATE invoices SET amount_paid = amount_paid + NEW.amount_received,
+                                balance_due = balance_due - NEW.amount_received
+            WHERE id = NEW.invoice_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_payments_delete AFTER DELETE ON payments
+        BEGIN
+            UPDATE invoices SET amount_paid = amount_paid - OLD.amount_received,
+                                balance_due = balance_due + OLD.amount_received
+            WHERE id = OLD.invoice_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_payments_update AFTER UPDATE OF invoice_id, amount_received ON payments
+        BEGIN
+            UPDATE invoices SET amount_paid = amount_paid - OLD.amount_received,
+                                balance_due = balance_due + OLD.amount_received
+            WHERE id = OLD.invoice_id;
+            UPDATE invoices SET amount_paid = amount_paid + NEW.amount_received,
+                                balance_due = balance_due - NEW.amount_received
+            WHERE id = NEW.invoice_id;
+        END
+    """)
+    # New invoices start unpaid; edits and re-rates change grand_total
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_invoices_insert AFTER INSERT ON invoices
+        BEGIN
+            UPDATE invoices SET balance_due = NEW.grand_total - NEW.amount_paid WHERE id = NEW.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_invoices_grand_total AFTER UPDATE OF grand_total ON invoices
+        BEGIN
+            UPDATE invoices SET balance_due = NEW.grand_total - NEW.amount_paid WHERE id = NEW.id;
+        END
+    """)
+
+GST_SUMMARY_COLUMNS = ("taxable_value", "cgst_amount", "sgst_amount", "igst_amount", "grand_total")
+
+@migration(12, "monthly GST summary")
+def _gst_monthly_summary(conn, progress):
+    # Totals of the non-cancelled invoices per office, FY, month and tax type,
+    # kept current by triggers on invoices, so GST summaries read a handful
+    # of rows per month however many invoices there are.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS gst_monthly_summary (
+            office_id INTEGER NOT NULL,
+            financial_year TEXT NOT NULL,
+            month_str TEXT NOT NULL,
+            tax_type TEXT NOT NULL,
+            invoice_count INTEGER NOT NULL DEFAULT 0,
+            taxable_value INTEGER NOT NULL DEFAULT 0, -- paise
+            cgst_amount INTEGER NOT NULL DEFAULT 0,
+            sgst_amount INTEGER NOT NULL DEFAULT 0,
+            igst_amount INTEGER NOT NULL DEFAULT 0,
+            grand_total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (financial_year, month_str, office_id, tax_type)
+        ) WITHOUT ROWID
+    """)
+    sums = ", ".join(f"SUM({col})" for col in GST_SUMMARY_COLUMNS)
+    conn.execute("DELETE FROM gst_monthly_summary")
+    conn.execute(f"""
+        INSERT INTO gst_monthly_summary (
+            office_id, financial_year, month_str, tax_type, invoice_count, {", ".join(GST_SUMMARY_COLUMNS)}
+        )
+        SELECT office_id, financial_year, month_str, tax_type, COUNT(*), {sums}
+        FROM invoices WHERE status != 'Cancelled'
+        GROUP BY office_id, financial_year, month_str, tax_type
+    """)
+
+    # Adds NEW / takes away OLD (cancelled invoices don't count)
+    add = f"""
+        INSERT INTO gst_monthly_summary (
+            office_id, financial_year, month_str, tax_type, invoice_count, {", ".join(GST_SUMMARY_COLUMNS)}
+        )
+        SELECT NEW.office_id, NEW.financial_year, NEW.month_str, NEW.tax_type, 1,
+               {", ".join(f"NEW.{col}" for col in GST_SUMMARY_COLUMNS)}
+        WHERE NEW.status != 'Cancelled'
+        ON CONFLICT (financial_year, month_str, office_id, tax_type) DO UPDATE SET
+            invoice_count = invoice_count + 1,
+            {", ".join(f"{col} = {col} + excluded.{col}" for col in GST_SUMMARY_COLUMNS)};
+    """
+    remove = f"""
+        UPDATE gst_monthly_summary SET
+            invoice_count = invoice_count - 1,
+            {", ".join(f"{col} = {col} - OLD.{col}" for col in GST_SUMMARY_COLUMNS)}
+        WHERE OLD.status != 'Cancelled'
+          AND financial_year = OLD.financial_year AND month_str = OLD.month_str
+          AND office_id = OLD.office_id AND tax_type = OLD.tax_type;
+        DELETE FROM gst_monthly_summary
+        WHERE invoice_count = 0
+          AND financial_year = OLD.financial_year AND month_str = OLD.month_str
+          AND office_id = OLD.office_id AND tax_type = OLD.tax_type;
+    """
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_gst_summary_insert AFTER INSERT ON invoices BEGIN {add} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_gst_summary_delete AFTER DELETE ON invoices BEGIN {remove} END")
+    # Payments only move status between Generated/Partially Paid/Paid; those
+    # updates leave the summary alone
+    changed = " OR ".join(
+        [f"OLD.{col} IS NOT NEW.{col}" for col in ("office_id", "financial_year", "month_str", "tax_type") + GST_SUMMARY_COLUMNS]
+        + ["(OLD.status = 'Cancelled') != (NEW.status = 'Cancelled')"]
+    )
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_gst_summary_update AFTER UPDATE ON invoices
+        WHEN {changed}
+        BEGIN {remove} {add} END
+    """)
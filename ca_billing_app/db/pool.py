@@ -0,0 +1,212 @@
+import sqlite3
+import threading
+import time
+import logging
+
+# Connection pooling for the SQLite database.
+# Every thread gets exactly one connection while it is working with the DB
+# (nested get_connection() calls on the same thread share it), the main/UI
+# thread keeps its connection open for the life of the app, and worker
+# threads hand theirs back to a bounded idle pool when they are done.
+
+class PoolExhaustedError(sqlite3.OperationalError):
+    pass
+
+class PooledConnection:
+    """
+    Thin proxy around a sqlite3.Connection.
+    close() hands the connection back to the pool instead of closing it,
+    so existing `conn = get_connection() ... conn.close()` code keeps working.
+    """
+    def __init__(self, pool, raw_conn, generation):
+        self._pool = pool
+        self._conn = raw_conn
+        self._generation = generation
+        self._depth = 0
+        self._owner = None
+        self.last_used = time.monotonic()
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def execute(self, sql, parameters=()):
+        return self._conn.execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._conn.executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._conn.executescript(sql_script)
+
+    def cursor(self):
+        return self._conn.cursor()
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._pool.release(self)
+
+    def __getattr__(self, name):
+        # row_factory, in_transaction, total_changes, interrupt ...
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class ConnectionPool:
+    def __init__(self, connect, max_size=8, timeout=10.0, health_check_interval=30.0):
+        """
+        connect: callable returning a fully configured sqlite3.Connection.
+        max_size: upper bound on open connections (pinned + in use + idle).
+        """
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._local = threading.local()
+        self._idle = []
+        self._open_count = 0
+        self._generation = 0
+        self._in_use = {}  # thread ident -> PooledConnection
+        self._cond = threading.Condition()
+        self._main_ident = threading.main_thread().ident
+
+    def acquire(self):
+        current = getattr(self._local, "conn", None)
+        if current is not None and current._conn is not None:
+            if current._depth > 0 or self._is_healthy(current):
+                current._depth += 1
+                return current
+            # Pinned connection went bad while idle; replace it.
+            with self._cond:
+                self._in_use.pop(current._owner, None)
+                self._discard(current)
+
+        conn = self._checkout()
+        conn._depth = 1
+        conn._owner = threading.get_ident()
+        self._local.conn = conn
+        with self._cond:
+            self._in_use[conn._owner] = conn
+        return conn
+
+    def _checkout(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                while self._idle:
+                    conn = self._idle.pop()
+                    if self._is_healthy(conn):
+                        return conn
+                    self._discard(conn)
+
+                if self._open_count < self.max_size:
+                    self._open_count += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolExhaustedError(
+                        f"No database connection available after {self.timeout:.0f}s "
+                        f"({self.max_size} connections in use)"
+                    )
+                self._cond.wait(remaining)
+
+        try:
+            return PooledConnection(self, self._connect(), self._generation)
+        except Exception:
+            with self._cond:
+                self._open_count -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        if conn._depth <= 0:
+            return
+        conn._depth -= 1
+        if conn._depth > 0:
+            return
+
+        # Outermost close(): behave like a real close and drop uncommitted work.
+        if conn._conn is not None and conn._conn.in_transaction:
+            try:
+                conn._conn.rollback()
+            except sqlite3.Error as e:
+                logging.warning(f"Rollback on connection release failed: {e}")
+        conn.last_used = time.monotonic()
+
+        stale = conn._generation != self._generation
+        if conn._owner == self._main_ident and conn._conn is not None and not stale:
+            # UI thread keeps its connection pinned for reuse.
+            return
+
+        self._local.conn = None
+        with self._cond:
+            self._in_use.pop(conn._owner, None)
+            conn._owner = None
+            if stale:
+                self._discard(conn)
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def connection_for_thread(self, thread_ident):
+        """Returns the connection a given thread is currently using, if any."""
+        with self._cond:
+            return self._in_use.get(thread_ident)
+
+    def _is_healthy(self, conn):
+        if conn._conn is None:
+            return False
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            conn._conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        # Caller holds self._cond
+        try:
+            if conn._conn is not None:
+                conn._conn.close()
+        except sqlite3.Error:
+            pass
+        conn._conn = None
+        self._open_count -= 1
+
+    def close_all(self):
+        """
+        Closes idle connections and the pinned UI connection, e.g. after the
+        database file has moved. Connections still checked out are closed
+        when their owner releases them.
+        """
+        with self._cond:
+            self._generation += 1
+            while self._idle:
+                self._discard(self._idle.pop())
+            main_conn = self._in_use.get(self._main_ident)
+            if main_conn is not None and main_conn._depth == 0:
+                self._in_use.pop(self._main_ident, None)
+                self._discard(main_conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "open": self._open_count,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "max_size": self.max_size,
+            }
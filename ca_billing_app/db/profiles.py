@@ -0,0 +1,88 @@
+import logging
+
+# SQLite performance profiles.
+# The active profile is applied to every connection the pool opens.
+# A value of None leaves that setting as SQLite/the file already has it.
+
+PROFILES = {
+    # Local disk. WAL lets report screens read while invoices are being written.
+    "desktop-safe": {
+        "label": "Desktop (safe)",
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,       # ~16 MB page cache
+        "temp_store": "MEMORY",
+        "mmap_size": 64 * 1024 * 1024,
+        "busy_timeout": 5000,
+    },
+    # Google Drive / OneDrive / Dropbox folders sync files one at a time, so the
+    # -wal/-shm side files of WAL mode can be uploaded out of step with the main
+    # file. Stay in rollback-journal mode there and wait longer for locks.
+    "cloud-synced": {
+        "label": "Cloud-synced folder",
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "temp_store": "MEMORY",
+        "mmap_size": 0,
+        "busy_timeout": 15000,
+    },
+    # Imports and batch jobs. Trades crash durability of the last few
+    # transactions for speed; journal mode is left as the file has it because
+    # switching out of WAL needs exclusive access.
+    "bulk-load": {
+        "label": "Bulk load",
+        "journal_mode": None,
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+        "mmap_size": 256 * 1024 * 1024,
+        "busy_timeout": 30000,
+    },
+}
+
+AUTO_PROFILE = "auto"
+DEFAULT_PROFILE = "desktop-safe"
+
+PRAGMA_ORDER = ["busy_timeout", "journal_mode", "synchronous", "cache_size", "temp_store", "mmap_size"]
+
+def get_sync_provider(path):
+    """Returns the cloud sync service a path lives under, or None for local storage."""
+    path = (path or "").lower()
+    if "google drive" in path or "g:" in path or "googledrive" in path:
+        return "Google Drive"
+    if "onedrive" in path:
+        return "OneDrive"
+    if "dropbox" in path:
+        return "Dropbox"
+    return None
+
+def resolve_profile_name(name, db_path):
+    """'auto' (or an unknown name) picks a profile from where the DB file lives."""
+    if name in PROFILES:
+        return name
+    if get_sync_provider(db_path):
+        return "cloud-synced"
+    return DEFAULT_PROFILE
+
+def apply_profile(conn, name):
+    profile = PROFILES[name]
+    for pragma in PRAGMA_ORDER:
+        value = profile.get(pragma)
+        if value is None:
+            continue
+        try:
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        except Exception as e:
+            # e.g. journal_mode can't change while another process holds the file
+            logging.warning(f"Could not apply PRAGMA {pragma}={value} ({name}): {e}")
+
+def describe_profile(name):
+    profile = PROFILES[name]
+    parts = []
+    if profile["journal_mode"]:
+        parts.append(f"journal={profile['journal_mode']}")
+    parts.append(f"sync={profile['synchronous']}")
+    parts.append(f"cache={abs(profile['cache_size']) // 1000} MB")
+    parts.append(f"mmap={profile['mmap_size'] // (1024 * 1024)} MB")
+    return f"{profile['label']} ({', '.join(parts)})"
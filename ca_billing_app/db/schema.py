@@ -4,12 +4,33 @@ import os
 # Database schema and constants.
 # Paths are now centrally managed in config_manager.py
 
+# Secondary indexes for the hot report/service queries: (name, table, columns)
+INDEXES = [
+    # generate_invoice_number, get_gst_summary, export_data, report filters
+    ("idx_invoices_fy_month", "invoices", "financial_year, month_str"),
+    # get_pending_payments
+    ("idx_invoices_status", "invoices", "status"),
+    # client filters on pending payments
+    ("idx_invoices_client_gstin", "invoices", "client_gstin"),
+    # per-invoice payment totals (add_payment, get_pending_payments)
+    ("idx_payments_invoice_id", "payments", "invoice_id"),
+    # invoice detail loads and the invoice list description join
+    ("idx_invoice_items_invoice_id", "invoice_items", "invoice_id"),
+    # export_data's ORDER BY invoice_date (streamed in index order, no sort)
+    ("idx_invoices_invoice_date", "invoices", "invoice_date"),
+]
+
+def create_indexes(connection):
+    for name, table, columns in INDEXES:
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
 def create_schema(connection):
+    """
+    Base tables (schema version 1). Runs inside the migration transaction,
+    later changes live in db/migrations.py.
+    """
     cursor = connection.cursor()
     
-    # Enable foreign keys
-    cursor.execute("PRAGMA foreign_keys = ON;")
-    
     # 1. FIRM OFFICE MASTER
     # Stores details for multiple CA offices if needed, though usually one firm.
     cursor.execute("""
@@ -70,6 +91,7 @@ def create_schema(connection):
         -- 0=None, 1=IGST, 2=CGST+SGST
         tax_type TEXT CHECK(tax_type IN ('IGST', 'CGST_SGST', 'NONE')) NOT NULL,
         
+        -- Money columns are rebuilt as INTEGER paise by migration v7
         taxable_value REAL DEFAULT 0.0,
         cgst_amount REAL DEFAULT 0.0,
         sgst_amount REAL DEFAULT 0.0,
@@ -121,5 +143,3 @@ def create_schema(connection):
         FOREIGN KEY (invoice_id) REFERENCES invoices(id) ON DELETE CASCADE
     );
     """)
-
-    connection.commit()
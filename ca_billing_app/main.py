@@ -18,12 +18,71 @@ def run_daily_tasks():
 def main():
     parser = argparse.ArgumentParser(description="CA Billing App")
     parser.add_argument("--daily-task", action="store_true", help="Run background daily tasks (backup/email)")
+    parser.add_argument("--index-advisor", action="store_true", help="Check the hot service queries for full-table scans")
+    parser.add_argument("--query-log", action="store_true", help="Time all SQL, log slow queries and write query stats on exit (~/AnkitaCA/logs)")
+    parser.add_argument("--import-invoices", metavar="FILE", help="Import invoices from a CSV/.xlsx file (one line per item) and exit")
+    parser.add_argument("--rejects", metavar="FILE", help="Where --import-invoices/--reconcile write rejected or unmatched rows (default: <FILE>_rejects.csv / <FILE>_unmatched.csv)")
+    parser.add_argument("--reconcile", metavar="FILE", help="Match the credits of a bank statement (CSV/.xlsx) to pending invoices, record the payments and exit")
+    parser.add_argument("--repair-statuses", nargs="?", const="", metavar="FY", help="Recompute every invoice's status (or one FY's, e.g. 2526) from its payments, list the changes and exit")
+    parser.add_argument("--dry-run", action="store_true", help="With --reconcile/--repair-statuses: show what would change without writing")
+    parser.add_argument("--recurring-run", nargs="?", const="", metavar="YYYY-MM", help="Create the month's recurring invoices (default: this month), render their PDFs and exit")
+    parser.add_argument("--audit-numbers", metavar="FY", help="List missing, reserved and duplicate invoice numbers of a financial year (e.g. 2526) and exit")
     args = parser.parse_args()
 
+    if args.query_log:
+        from db.database import db_manager
+        db_manager.enable_query_log()
+
     if args.daily_task:
         run_daily_tasks()
         return
 
+    if args.import_invoices:
+        from services.invoice_importer import InvoiceImporter
+        result = InvoiceImporter().import_file(args.import_invoices, rejects_path=args.rejects)
+        print(result.summary())
+        sys.exit(1 if result.rejects else 0)
+
+    if args.reconcile:
+        from services.statement_reconciler import StatementReconciler
+        result = StatementReconciler().reconcile_file(args.reconcile, unmatched_path=args.rejects, dry_run=args.dry_run)
+        for m in result.matches:
+            print(f"line {m['row']:>5}  {m['invoice_number']}  {m['amount']:>12}  ({m['rule']})")
+        print(result.summary() + (" [dry run, nothing recorded]" if args.dry_run else ""))
+        sys.exit(1 if result.rejects else 0)
+
+    if args.repair_statuses is not None:
+        from services.payment_service import PaymentService
+        diffs = PaymentService().repair_statuses(args.repair_statuses or None, dry_run=args.dry_run)
+        for d in diffs:
+            paid = "" if d['amount_paid'] == d['total_received'] else f"  paid {d['amount_paid']} -> {d['total_received']}"
+            balance = "" if d['balance_due'] == d['expected_balance'] else f"  balance {d['balance_due']} -> {d['expected_balance']}"
+            print(f"{d['invoice_number']}  {d['status']} -> {d['expected_status']}  (total {d['grand_total']}, received {d['total_received']}){paid}{balance}")
+        print(f"{len(diffs)} invoices {'would change [dry run]' if args.dry_run else 'repaired'}")
+        sys.exit(0)
+
+    if args.recurring_run is not None:
+        from services.recurring_service import RecurringService
+        service = RecurringService()
+        created = service.run_month(args.recurring_run or None)
+        print(f"{len(created)} recurring invoices created")
+        generated, failed = service.pdf_queue.process()
+        print(f"{generated} PDFs generated, {failed} failed")
+        sys.exit(1 if failed else 0)
+
+    if args.audit_numbers:
+        from services.invoice_service import InvoiceService
+        problems = InvoiceService().audit_sequence(args.audit_numbers)
+        for p in problems:
+            serials = str(p['first_serial']) if p['first_serial'] == p['last_serial'] else f"{p['first_serial']}-{p['last_serial']}"
+            print(f"{args.audit_numbers}/{p['month_str']}  {p['issue']:<9}  {serials:<9}  {p['invoice_number'] or ''}")
+        print(f"{len(problems)} issues")
+        sys.exit(1 if any(p['issue'] != 'Reserved' for p in problems) else 0)
+
+    if args.index_advisor:
+        from db.index_advisor import run_index_advisor
+        sys.exit(1 if run_index_advisor() else 0)
+
     app = QApplication(sys.argv)
     app.setApplicationName("CA Billing App")
     
@@ -36,7 +95,12 @@ def main():
         from ui.main_window import MainWindow
         window = MainWindow()
         window.show()
-        sys.exit(app.exec())
+        exit_code = app.exec()
+        from services.async_service import async_service
+        async_service.shutdown()
+        from services.invoice_cache import invoice_detail_cache
+        logging.info(f"Invoice detail cache: {invoice_detail_cache.stats()}")
+        sys.exit(exit_code)
     except Exception as e:
         logging.critical(f"Application crash: {e}")
         sys.exit(1)
@@ -6,6 +6,8 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 from utils.num_wrapper import num_to_words
+from utils.money import Money
+from utils.tax_engine import compute_invoice, rate_split
 
 INVOICE_ROOT = "Invoices"
 
@@ -132,35 +134,14 @@ class InvoicePDFGenerator:
         rows = [h1, h2]
         
         idx = 1
-        total_taxable = 0.0
-        total_cgst = 0.0
-        total_sgst = 0.0
-        total_igst = 0.0
-        
-        for item in items:
-            amt = float(item['amount'])
-            rate = float(item['gst_rate'])
-            
-            # Tax Logic
-            cgst_r, cgst_a = 0, 0
-            sgst_r, sgst_a = 0, 0
-            igst_r, igst_a = 0, 0
-            
-            tax_val = amt * (rate / 100.0)
-            
-            if inv['tax_type'] == 'IGST':
-                igst_r = rate
-                igst_a = tax_val
-            elif inv['tax_type'] == 'CGST_SGST':
-                cgst_r = rate / 2
-                cgst_a = tax_val / 2
-                sgst_r = rate / 2
-                sgst_a = tax_val / 2
-            
-            total_taxable += amt
-            total_cgst += cgst_a
-            total_sgst += sgst_a
-            total_igst += igst_a
+        # Tax Logic (the tax engine, same per-line rounding as the stored totals)
+        tax = compute_invoice(items, inv['tax_type'])
+        total_taxable, total_cgst, total_sgst, total_igst = tax.taxable, tax.cgst, tax.sgst, tax.igst
+        
+        for item, line in zip(items, tax.lines):
+            amt = line.amount
+            cgst_r, sgst_r, igst_r = rate_split(line.rate, inv['tax_type'])
+            cgst_a, sgst_a, igst_a = line.cgst, line.sgst, line.igst
             
             row = [
                 str(idx),
@@ -210,8 +191,8 @@ class InvoicePDFGenerator:
         elements.append(t)
         
         # 4. TOTALS & WORDS
-        grand_total = inv['grand_total']
-        grand_total_rounded = round(grand_total) # Assuming rounding
+        grand_total = Money.from_rupees(inv['grand_total'])
+        grand_total_rounded = round(grand_total) # Whole rupees, half-up
         
         # Total Box
         elements.append(Spacer(1, 0)) # No space, attach to table
@@ -0,0 +1,106 @@
+import sqlite3
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from db.database import db_manager
+from services.invoice_service import InvoiceService
+from services.payment_service import PaymentService
+from services.reporting_service import ReportingService
+
+# Runs service calls on a small worker pool so the Qt main thread never waits
+# on SQLite. Each worker thread gets its own pooled connection.
+#
+# Read requests are submitted under a key ("invoice_list.load",
+# "reports.pending", ...). Submitting again under the same key supersedes the
+# previous request: it is cancelled if it hasn't started, or its running
+# query is aborted (DatabaseManager.cancel_scope) if it has. Writes are
+# submitted without a key and always run to completion.
+
+MAX_WORKERS = 3
+
+class _Request:
+    __slots__ = ("key", "future", "superseded")
+
+    def __init__(self, key):
+        self.key = key
+        self.future = None
+        self.superseded = False
+
+class AsyncService:
+    def __init__(self, db=None, max_workers=MAX_WORKERS):
+        self.db = db or db_manager
+        self.invoices = InvoiceService()
+        self.payments = PaymentService()
+        self.reports = ReportingService()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        # Re-entrant: Future.cancel() runs done-callbacks (_forget) synchronously
+        self._lock = threading.RLock()
+        self._latest = {}  # key -> _Request
+        self._superseded = weakref.WeakSet()  # Futures whose results nobody wants
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on a worker thread and returns its Future.
+        key: supersede any earlier request with the same key (None: never).
+        A superseded request's Future ends cancelled (CancelledError).
+        """
+        request = _Request(key)
+        with self._lock:
+            # _run takes the lock first, so it always sees request.future
+            request.future = self._executor.submit(self._run, request, fn, args, kwargs)
+            if key is not None:
+                previous = self._latest.get(key)
+                self._latest[key] = request
+                if previous is not None:
+                    self._supersede(previous)
+        request.future.add_done_callback(lambda f, r=request: self._forget(r))
+        return request.future
+
+    def cancel(self, key):
+        with self._lock:
+            request = self._latest.pop(key, None)
+            if request is not None:
+                self._supersede(request)
+
+    def is_superseded(self, future):
+        """True once a newer request under the same key was submitted (or it was cancelled)."""
+        with self._lock:
+            return future in self._superseded
+
+    def _run(self, request, fn, args, kwargs):
+        with self._lock:
+            if request.superseded:
+                raise CancelledError()
+        if request.key is None:
+            return fn(*args, **kwargs)
+
+        try:
+            with self.db.cancel_scope(lambda: request.superseded):
+                return fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if request.superseded and "interrupt" in str(e):
+                raise CancelledError() from e
+            raise
+
+    def _supersede(self, request):
+        # Caller holds self._lock
+        request.superseded = True
+        self._superseded.add(request.future)
+        request.future.cancel()
+
+    def _forget(self, request):
+        if request.key is None:
+            return
+        with self._lock:
+            if self._latest.get(request.key) is request:
+                del self._latest[request.key]
+
+    def shutdown(self):
+        with self._lock:
+            for request in list(self._latest.values()):
+                self._supersede(request)
+            self._latest.clear()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+# Global instance
+async_service = AsyncService()
@@ -0,0 +1,412 @@
+import csv
+import sqlite3
+import logging
+from itertools import islice
+from db.database import db_manager
+from services.invoice_service import InvoiceService, parse_serial, record_manual_serials
+from services.payment_service import PaymentService
+from services.invoice_cache import invoice_detail_cache
+from utils.money import Money
+from utils.tabular import parse_date
+from utils.tax_engine import compute_invoice, GST_RATES, TAX_TYPES
+from utils.validators import validate_gstin
+
+# Bulk loading of historical data (onboarding a firm, seed data).
+# Records are plain dicts, read from any iterable (a list, a CSV reader, a
+# generator) one chunk at a time. Each chunk is validated together (one
+# query per lookup, not one per row) and written with executemany in its own
+# transaction, under the 'bulk-load' pragma profile.
+# Bad rows don't stop the load: they are collected in LoadResult.rejects
+# with their 1-based position in the input and the reason.
+
+CHUNK_SIZE = 1000
+LOOKUP_CHUNK = 500  # values per "IN (...)" lookup
+
+STATUSES = ('Generated', 'Paid', 'Partially Paid', 'Cancelled')
+MAX_ITEMS = 5
+
+class LoadResult:
+    def __init__(self, kind):
+        self.kind = kind
+        self.loaded = 0
+        self.skipped = 0
+        self.rejects = []  # {"row": n, "reason": str, "record": dict}
+
+    def reject(self, row_number, record, reason):
+        self.rejects.append({"row": row_number, "reason": reason, "record": record})
+
+    def summary(self):
+        text = f"{self.kind}: {self.loaded} loaded, {len(self.rejects)} rejected"
+        if self.skipped:
+            text += f", {self.skipped} already present"
+        return text
+
+    def write_rejects(self, path):
+        """CSV of rejected rows: row number, reason, then the record's own fields."""
+        fields = []
+        for r in self.rejects:
+            for key in r["record"]:
+                if key not in fields and key != "items":
+                    fields.append(key)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["row", "reason"] + fields)
+            for r in self.rejects:
+                writer.writerow([r["row"], r["reason"]] + [r["record"].get(k, "") for k in fields])
+        return path
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _lookup(conn, sql, values):
+    """Runs sql (with one '{placeholders}') over values in IN-list sized pieces."""
+    values = list(values)
+    rows = []
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        part = values[start:start + LOOKUP_CHUNK]
+        rows.extend(conn.execute(sql.format(placeholders=",".join("?" * len(part))), part).fetchall())
+    return rows
+
+def _text(record, key):
+    value = record.get(key)
+    return "" if value is None else str(value).strip()
+
+class BulkLoader:
+    def __init__(self, db=None, chunk_size=CHUNK_SIZE, skip_existing=False, progress=None):
+        """
+        skip_existing: rows whose key is already in the database are counted as
+                       skipped instead of rejected (re-running a load is safe).
+        progress: optional callable(result) after each committed chunk.
+        """
+        self.db = db or db_manager
+        self.chunk_size = chunk_size
+        self.skip_existing = skip_existing
+        self.progress = progress
+        self.invoice_service = InvoiceService(self.db)
+        self.payment_service = PaymentService()
+
+    # --- Public API -----------------------------------------------------
+
+    def load_clients(self, records):
+        """records: dicts with gstin, client_name, address, email, phone."""
+        return self._load("clients", records, self._prepare_clients, self._insert_clients)
+
+    def load_branches(self, records):
+        """records: dicts with branch_name, city, bank_name, ifsc_code, account_number."""
+        return self._load("branches", records, self._prepare_branches, self._insert_branches)
+
+    def load_invoices(self, records, numbered=False):
+        """
+        Historical invoices with their own numbers. Each record: invoice_number,
+        invoice_date, client_gstin, office_id, tax_type,
+        items [{description, hsn_code, amount, gst_rate}], optional status,
+        allotted_bank/branch/city, place_of_supply. Totals are computed here.
+        Only a 'Cancelled' status is kept: the others are loaded as Generated
+        and become Paid / Partially Paid when their payments are loaded.
+        numbered: records are (row_number, record) pairs, e.g. the source
+        line in an import file, used in rejects instead of the position.
+        """
+        return self._load("invoices", records, self._prepare_invoices, self._insert_invoices, numbered)
+
+    def load_payments(self, records):
+        """
+        records: dicts with invoice_number (or invoice_id), amount, payment_date,
+        optional payment_mode, reference_number, notes. Invoice statuses are
+        recomputed once per chunk.
+        """
+        return self._load("payments", records, self._prepare_payments, self._insert_payments)
+
+    # --- Driver ---------------------------------------------------------
+
+    def _load(self, kind, records, prepare, insert, numbered=False):
+        result = LoadResult(kind)
+        seen = set()  # keys already taken earlier in this same input
+        with self.db.profile_scope("bulk-load") as conn:
+            for chunk in _chunks(records if numbered else enumerate(records, 1), self.chunk_size):
+                conn.execute("BEGIN IMMEDIATE")
+                touched = None
+                try:
+                    rows = prepare(conn, chunk, result, seen)
+                    if rows:
+                        touched = insert(conn, rows, result)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                # Invoices whose cached details changed (only once committed,
+                # or a concurrent read could cache the old values again)
+                if touched:
+                    invoice_detail_cache.invalidate(touched)
+                if self.progress:
+                    self.progress(result)
+        logging.info(f"Bulk load {result.summary()}")
+        return result
+
+    def _insert_rows(self, conn, sql, rows, result):
+        """
+        rows: [(row_number, record, params)]. executemany under a savepoint; if
+        a constraint still fails, redo the chunk row by row to find the culprits.
+        """
+        conn.execute("SAVEPOINT bulk_chunk")
+        try:
+            conn.executemany(sql, [params for _, _, params in rows])
+            conn.execute("RELEASE bulk_chunk")
+            result.loaded += len(rows)
+            return
+        except sqlite3.IntegrityError:
+            conn.execute("ROLLBACK TO bulk_chunk")
+            conn.execute("RELEASE bulk_chunk")
+
+        for row_number, record, params in rows:
+            try:
+                conn.execute(sql, params)
+                result.loaded += 1
+            except sqlite3.IntegrityError as e:
+                result.reject(row_number, record, str(e))
+
+    def _existing_or_duplicate(self, key, existing, seen, row_number, record, result, label):
+        """True (row handled) when key is already in the DB or earlier in the input."""
+        if key in seen:
+            result.reject(row_number, record, f"duplicate {label} in input")
+            return True
+        seen.add(key)
+        if key in existing:
+            if self.skip_existing:
+                result.skipped += 1
+            else:
+                result.reject(row_number, record, f"{label} already exists")
+            return True
+        return False
+
+    # --- Clients --------------------------------------------------------
+
+    def _prepare_clients(self, conn, chunk, result, seen):
+        valid = []
+        for row_number, record in chunk:
+            gstin = _text(record, "gstin").upper()
+            name = _text(record, "client_name")
+            if not validate_gstin(gstin):
+                result.reject(row_number, record, "invalid GSTIN")
+            elif not name:
+                result.reject(row_number, record, "client_name is required")
+            else:
+                valid.append((row_number, record, (
+                    gstin, name, _text(record, "address"), _text(record, "email"), _text(record, "phone")
+                )))
+
+        existing = {r[0] for r in _lookup(conn, "SELECT gstin FROM clients WHERE gstin IN ({placeholders})",
+                                          {params[0] for _, _, params in valid})}
+        return [(n, rec, params) for n, rec, params in valid
+                if not self._existing_or_duplicate(params[0], existing, seen, n, rec, result, "GSTIN")]
+
+    def _insert_clients(self, conn, rows, result):
+        self._insert_rows(conn, "INSERT INTO clients (gstin, client_name, address, email, phone) VALUES (?, ?, ?, ?, ?)",
+                          rows, result)
+
+    # --- Branches -------------------------------------------------------
+
+    def _prepare_branches(self, conn, chunk, result, seen):
+        valid = []
+        for row_number, record in chunk:
+            params = tuple(_text(record, key) for key in ("branch_name", "city", "bank_name", "ifsc_code", "account_number"))
+            missing = [key for key, value in zip(("branch_name", "city", "bank_name"), params) if not value]
+            if missing:
+                result.reject(row_number, record, f"{', '.join(missing)} required")
+            else:
+                valid.append((row_number, record, params))
+
+        existing = {(r["bank_name"], r["branch_name"]) for r in _lookup(
+            conn, "SELECT bank_name, branch_name FROM branches WHERE bank_name IN ({placeholders})",
+            {params[2] for _, _, params in valid})}
+        return [(n, rec, params) for n, rec, params in valid
+                if not self._existing_or_duplicate((params[2], params[0]), existing, seen, n, rec, result, "bank branch")]
+
+    def _insert_branches(self, conn, rows, result):
+        self._insert_rows(conn, "INSERT INTO branches (branch_name, city, bank_name, ifsc_code, account_number) VALUES (?, ?, ?, ?, ?)",
+                          rows, result)
+
+    # --- Invoices -------------------------------------------------------
+
+    def _prepare_invoices(self, conn, chunk, result, seen):
+        valid = []
+        for row_number, record in chunk:
+            try:
+                valid.append((row_number, record, self._invoice_params(record)))
+            except (ValueError, KeyError, TypeError) as e:
+                result.reject(row_number, record, str(e))
+
+        gstins = {params["client_gstin"] for _, _, params in valid}
+        office_ids = {params["office_id"] for _, _, params in valid}
+        numbers = {params["invoice_number"] for _, _, params in valid}
+        known_clients = {r[0] for r in _lookup(conn, "SELECT gstin FROM clients WHERE gstin IN ({placeholders})", gstins)}
+        known_offices = {r[0] for r in _lookup(conn, "SELECT id FROM offices WHERE id IN ({placeholders})", office_ids)}
+        existing = {r[0] for r in _lookup(conn, "SELECT invoice_number FROM invoices WHERE invoice_number IN ({placeholders})", numbers)}
+
+        rows = []
+        for n, rec, params in valid:
+            if params["client_gstin"] not in known_clients:
+                result.reject(n, rec, f"unknown client {params['client_gstin']}")
+            elif params["office_id"] not in known_offices:
+                result.reject(n, rec, f"unknown office {params['office_id']}")
+            elif not self._existing_or_duplicate(params["invoice_number"], existing, seen, n, rec, result, "invoice number"):
+                rows.append((n, rec, params))
+        return rows
+
+    def _invoice_params(self, record):
+        invoice_number = _text(record, "invoice_number")
+        if not invoice_number:
+            raise ValueError("invoice_number is required")
+        invoice_date = parse_date(record.get("invoice_date"))
+        if not validate_gstin(_text(record, "client_gstin")):
+            raise ValueError(f"invalid client GSTIN {_text(record, 'client_gstin')!r}")
+        tax_type = _text(record, "tax_type").upper() or "NONE"
+        if tax_type not in TAX_TYPES:
+            raise ValueError(f"invalid tax_type {tax_type!r}")
+        status = _text(record, "status") or "Generated"
+        if status not in STATUSES:
+            raise ValueError(f"invalid status {status!r}")
+
+        items = []
+        for item in record.get("items") or []:
+            description = _text(item, "description")
+            if not description:
+                raise ValueError("item description is required")
+            try:
+                rate = float(item.get("gst_rate") or 0)
+            except ValueError:
+                rate = None
+            if rate not in GST_RATES:
+                raise ValueError(f"invalid GST rate {item.get('gst_rate')!r}")
+            items.append({
+                "description": description,
+                "hsn_code": _text(item, "hsn_code"),
+                "amount": Money.from_rupees(item.get("amount")),
+                "gst_rate": int(rate),
+            })
+        if not items:
+            raise ValueError("at least one item is required")
+        if len(items) > MAX_ITEMS:
+            raise ValueError(f"more than {MAX_ITEMS} items")
+
+        try:
+            office_id = int(float(record.get("office_id")))
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid office_id {record.get('office_id')!r}")
+
+        taxable, cgst, sgst, igst, grand_total = compute_invoice(items, tax_type).totals()
+        return {
+            "invoice_number": invoice_number,
+            "invoice_date": invoice_date.isoformat(),
+            "financial_year": self.invoice_service.get_financial_year(invoice_date),
+            "month_str": invoice_date.strftime("%m"),
+            "serial_number": parse_serial(invoice_number),
+            "client_gstin": _text(record, "client_gstin").upper(),
+            "office_id": office_id,
+            "tax_type": tax_type,
+            "taxable_value": taxable, "cgst_amount": cgst, "sgst_amount": sgst,
+            "igst_amount": igst, "grand_total": grand_total,
+            # Paid / Partially Paid follow the payments on record (amount_paid
+            # is kept by triggers on payments): load_payments sets them
+            "status": "Cancelled" if status == "Cancelled" else "Generated",
+            "allotted_bank": _text(record, "allotted_bank"),
+            "allotted_branch": _text(record, "allotted_branch"),
+            "allotted_city": _text(record, "allotted_city"),
+            "place_of_supply": _text(record, "place_of_supply"),
+            "items": items,
+        }
+
+    INVOICE_COLUMNS = [
+        "invoice_number", "invoice_date", "financial_year", "month_str", "serial_number",
+        "client_gstin", "office_id", "tax_type",
+        "taxable_value", "cgst_amount", "sgst_amount", "igst_amount", "grand_total", "status",
+        "allotted_bank", "allotted_branch", "allotted_city", "place_of_supply",
+    ]
+
+    def _insert_invoices(self, conn, rows, result):
+        sql = f"INSERT INTO invoices ({', '.join(self.INVOICE_COLUMNS)}) VALUES ({', '.join('?' * len(self.INVOICE_COLUMNS))})"
+        before = result.loaded
+        self._insert_rows(conn, sql, [(n, rec, tuple(p[c] for c in self.INVOICE_COLUMNS)) for n, rec, p in rows], result)
+        if result.loaded == before:
+            return
+
+        # executemany doesn't return row ids: read them back by number
+        ids = {r["invoice_number"]: r["id"] for r in _lookup(
+            conn, "SELECT id, invoice_number FROM invoices WHERE invoice_number IN ({placeholders})",
+            [p["invoice_number"] for _, _, p in rows])}
+        # Keep the number counters ahead of the historical numbers just loaded
+        record_manual_serials(conn, [(p["financial_year"], p["month_str"], p["invoice_number"])
+                                     for _, _, p in rows if p["invoice_number"] in ids])
+        conn.executemany(
+            "INSERT INTO invoice_items (invoice_id, description, hsn_code, amount, gst_rate) VALUES (?, ?, ?, ?, ?)",
+            [(ids[p["invoice_number"]], item["description"], item["hsn_code"], item["amount"], item["gst_rate"])
+             for _, _, p in rows if p["invoice_number"] in ids
+             for item in p["items"]]
+        )
+
+    # --- Payments -------------------------------------------------------
+
+    def _prepare_payments(self, conn, chunk, result, seen):
+        parsed = []
+        for row_number, record in chunk:
+            try:
+                amount = Money.from_rupees(record.get("amount", record.get("amount_received")))
+                if amount.paise <= 0:
+                    raise ValueError("amount must be positive")
+                payment_date = parse_date(record.get("payment_date")).isoformat()
+                key = _text(record, "invoice_number")
+                if record.get("invoice_id"):
+                    try:
+                        key = int(float(record["invoice_id"]))
+                    except (TypeError, ValueError, OverflowError):
+                        raise ValueError(f"invalid invoice_id {record['invoice_id']!r}")
+            except ValueError as e:
+                result.reject(row_number, record, str(e))
+                continue
+            parsed.append((row_number, record, key, amount, payment_date))
+
+        # Invoice ids are ints, numbers are strings
+        numbers = {key for _, _, key, _, _ in parsed if isinstance(key, str)}
+        ids = {key for _, _, key, _, _ in parsed if isinstance(key, int)}
+        invoices = {}
+        for r in _lookup(conn, "SELECT id, invoice_number, grand_total, amount_paid, status FROM invoices WHERE invoice_number IN ({placeholders})", numbers):
+            invoices[r["invoice_number"]] = r
+        for r in _lookup(conn, "SELECT id, invoice_number, grand_total, amount_paid, status FROM invoices WHERE id IN ({placeholders})", ids):
+            invoices[r["id"]] = r
+
+        paid = {r["id"]: r["amount_paid"] for r in invoices.values()}
+        # Earlier chunks are already committed, so amount_paid covers them;
+        # rows of this chunk are added as they are accepted below.
+
+        rows = []
+        for n, rec, key, amount, payment_date in parsed:
+            invoice = invoices.get(key)
+            if invoice is None:
+                result.reject(n, rec, f"unknown invoice {key}")
+                continue
+            if invoice["status"] == "Cancelled":
+                result.reject(n, rec, f"invoice {invoice['invoice_number']} is cancelled")
+                continue
+            balance = invoice["grand_total"] - paid.get(invoice["id"], 0)
+            if amount.paise > balance:
+                result.reject(n, rec, f"amount {amount} exceeds balance {Money(balance)}")
+                continue
+            paid[invoice["id"]] = paid.get(invoice["id"], 0) + amount.paise
+            rows.append((n, rec, (
+                invoice["id"], amount, payment_date, _text(rec, "payment_mode"),
+                _text(rec, "reference_number"), _text(rec, "notes"),
+            )))
+        return rows
+
+    def _insert_payments(self, conn, rows, result):
+        self._insert_rows(conn, """
+            INSERT INTO payments (invoice_id, amount_received, payment_date, payment_mode, reference_number, notes)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows, result)
+        invoice_ids = {params[0] for _, _, params in rows}
+        self.payment_service.recompute_statuses(conn, invoice_ids)
+        return invoice_ids
@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict
+
+# In-process LRU cache of assembled invoice details (the dicts returned by
+# InvoiceService.get_invoice_details), keyed by database file and invoice id.
+# Every code path that writes an invoice, its items or payments calls
+# invalidate(ids); client/office edits touch many invoices and clear() it.
+# Writes made by another app instance on a shared file are not seen: the
+# cache only lives as long as this process and is small.
+
+CACHE_SIZE = 256
+
+class InvoiceDetailCache:
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()  # workers and the UI thread share it
+        self._entries = OrderedDict()  # (db_path, invoice_id) -> details
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped by every invalidation: a load that started before a write
+        # must not put what it read (possibly the old data) into the cache
+        self.generation = 0
+
+    def get(self, db_path, invoice_id):
+        """A copy of the cached details, or None."""
+        key = (db_path, invoice_id)
+        with self._lock:
+            details = self._entries.get(key)
+            if details is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return _copy(details)
+
+    def put(self, db_path, invoice_id, details, generation=None):
+        """generation: the value read before loading details; stale loads are dropped."""
+        key = (db_path, invoice_id)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = _copy(details)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, invoice_ids):
+        """Drops the given invoices (for every database file)."""
+        ids = set(invoice_ids)
+        if not ids:
+            return
+        with self._lock:
+            self.generation += 1
+            for key in [key for key in self._entries if key[1] in ids]:
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries), "max_size": self.max_size,
+                "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions, "invalidations": self.invalidations,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+def _copy(details):
+    # Callers may edit what they get back; the cached copy must not change.
+    # Values are str/int/None/Money (immutable), so copying the containers is enough.
+    return {
+        "invoice": dict(details["invoice"]),
+        "items": [dict(item) for item in details["items"]],
+        "client": dict(details["client"]),
+        "office": dict(details["office"]),
+    }
+
+# Global instance
+invoice_detail_cache = InvoiceDetailCache()
@@ -0,0 +1,80 @@
+import os
+import logging
+from db.database import db_manager
+from services.bulk_loader import BulkLoader, CHUNK_SIZE
+from utils.tabular import iter_rows
+
+# Imports historical / bulk invoices from a CSV or .xlsx file.
+# One line per invoice item; consecutive lines with the same invoice_number
+# make up one invoice, and the invoice-level columns are taken from its
+# first line. Columns (header names are case-insensitive):
+#   invoice_number, invoice_date, client_gstin, tax_type,
+#   description, hsn_code, amount, gst_rate,
+#   optional: office_id, status, allotted_bank, allotted_branch,
+#             allotted_city, place_of_supply
+# The file is streamed and handed to BulkLoader, which validates and commits
+# chunk by chunk, so memory stays flat for very large files. Rejected
+# invoices are reported by their first line in the file.
+# A Paid / Partially Paid status is not taken from the file: it follows the
+# payments imported afterwards (only Cancelled is kept).
+
+INVOICE_FIELDS = (
+    "invoice_number", "invoice_date", "client_gstin", "office_id", "tax_type", "status",
+    "allotted_bank", "allotted_branch", "allotted_city", "place_of_supply",
+)
+ITEM_FIELDS = ("description", "hsn_code", "amount", "gst_rate")
+
+class InvoiceImporter:
+    def __init__(self, db=None, chunk_size=CHUNK_SIZE, office_id=None, progress=None):
+        """
+        office_id: used for lines without an office_id column
+                   (default: the first active office).
+        progress: optional callable(result) after each committed chunk.
+        """
+        self.db = db or db_manager
+        self.loader = BulkLoader(db=self.db, chunk_size=chunk_size, progress=progress)
+        self.office_id = office_id
+
+    def import_file(self, path, rejects_path=None, sheet=None):
+        """
+        Returns the LoadResult. When anything is rejected the details go to
+        rejects_path (default: '<file>_rejects.csv' next to the input).
+        """
+        office_id = self.office_id or self._default_office_id()
+        result = self.loader.load_invoices(self._group_invoices(iter_rows(path, sheet), office_id), numbered=True)
+        if result.rejects:
+            rejects_path = rejects_path or f"{os.path.splitext(path)[0]}_rejects.csv"
+            result.write_rejects(rejects_path)
+            logging.warning(f"{len(result.rejects)} invoices rejected, see {rejects_path}")
+        return result
+
+    def _default_office_id(self):
+        with self.db.connection() as conn:
+            row = conn.execute("SELECT id FROM offices WHERE is_active = 1 ORDER BY id LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def _group_invoices(self, rows, office_id):
+        """Yields (first_line, record) per invoice from (line, row) pairs."""
+        record = None
+        first_line = last_line = None
+        for line_number, row in rows:
+            number = str(row.get("invoice_number") or "").strip()
+            if record is not None and (not number or number != record["invoice_number"]):
+                yield first_line, self._finish(record, first_line, last_line)
+                record = None
+            if record is None:
+                record = {"lines": ""}  # first key: leads the rejects file
+                record.update({field: row.get(field) for field in INVOICE_FIELDS})
+                record["invoice_number"] = number
+                if record["office_id"] in (None, ""):
+                    record["office_id"] = office_id
+                record["items"] = []
+                first_line = line_number
+            record["items"].append({field: row.get(field) for field in ITEM_FIELDS})
+            last_line = line_number
+        if record is not None:
+            yield first_line, self._finish(record, first_line, last_line)
+
+    def _finish(self, record, first_line, last_line):
+        record["lines"] = str(first_line) if first_line == last_line else f"{first_line}-{last_line}"
+        return record
@@ -1,10 +1,205 @@
+import os
 import datetime
+from collections import Counter
 from db.database import db_manager
+from db.index_advisor import register_query
+from services.invoice_cache import invoice_detail_cache
+from services.payment_service import PaymentService
+from utils.money import Money, money_row
+from utils.tax_engine import compute_invoice, compute_batch
 import logging
 
+# Invoice numbers come from invoice_sequences (schema v8): one counter per
+# FY/month, advanced inside the transaction that inserts the invoice.
+LAST_SERIAL_QUERY = """
+    SELECT last_serial
+    FROM invoice_sequences
+    WHERE financial_year = ? AND month_str = ?
+"""
+
+# Takes the next N serials (N = the third parameter)
+ADVANCE_SEQUENCE_SQL = """
+    INSERT INTO invoice_sequences (financial_year, month_str, last_serial) VALUES (?, ?, ?)
+    ON CONFLICT (financial_year, month_str) DO UPDATE SET last_serial = last_serial + excluded.last_serial
+"""
+
+# Manual numbers move the counter past themselves (never backwards)
+BUMP_SEQUENCE_SQL = """
+    INSERT INTO invoice_sequences (financial_year, month_str, last_serial) VALUES (?, ?, ?)
+    ON CONFLICT (financial_year, month_str) DO UPDATE SET last_serial = MAX(last_serial, excluded.last_serial)
+"""
+
+# Invoice list with item descriptions (for search).
+# We group cat description to avoid duplicate rows
+INVOICE_LIST_QUERY = """
+    SELECT i.id, i.invoice_number, i.invoice_date, c.client_name, i.grand_total, i.status,
+           GROUP_CONCAT(it.description, ', ') as descriptions
+    FROM invoices i
+    JOIN clients c ON i.client_gstin = c.gstin
+    LEFT JOIN invoice_items it ON i.id = it.invoice_id
+    GROUP BY i.id
+    ORDER BY i.created_at DESC
+"""
+
+INSERT_INVOICE_SQL = """
+    INSERT INTO invoices (
+        invoice_number, invoice_date, financial_year, month_str, serial_number,
+        client_gstin, office_id, tax_type, 
+        taxable_value, cgst_amount, sgst_amount, igst_amount, grand_total, status,
+        allotted_bank, allotted_branch, allotted_city, place_of_supply
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'Generated', ?, ?, ?, ?)
+"""
+
+INSERT_ITEM_SQL = """
+    INSERT INTO invoice_items (invoice_id, description, hsn_code, amount, gst_rate)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+# Every number of a financial year in one pass: invoices, reserved numbers
+# and, per month, a marker one past the counter. LAG finds the holes (a
+# month's numbers start at 1 and run up to its counter), a COUNT window the
+# serials used twice. Invoices whose number doesn't follow the format (serial
+# stored as 9999) are left out.
+SEQUENCE_AUDIT_QUERY = """
+    WITH numbers AS (
+        SELECT month_str, serial_number AS serial, invoice_number, 'invoice' AS source
+        FROM invoices WHERE financial_year = ?1 AND serial_number != 9999
+        UNION ALL
+        SELECT month_str, serial_number, invoice_number, 'reserved'
+        FROM reserved_invoice_numbers WHERE financial_year = ?1
+        UNION ALL
+        SELECT month_str, last_serial + 1, NULL, 'end'
+        FROM invoice_sequences WHERE financial_year = ?1
+    ),
+    ordered AS (
+        SELECT numbers.*,
+               LAG(serial, 1, 0) OVER (PARTITION BY month_str ORDER BY serial) AS prev_serial,
+               COUNT(*) OVER (PARTITION BY month_str, serial) AS uses
+        FROM numbers
+    )
+    SELECT month_str, prev_serial + 1 AS first_serial, serial - 1 AS last_serial, 'Missing' AS issue, NULL AS invoice_number
+    FROM ordered WHERE serial > prev_serial + 1
+    UNION ALL
+    SELECT month_str, serial, serial, 'Reserved', invoice_number
+    FROM ordered WHERE source = 'reserved'
+    UNION ALL
+    SELECT month_str, serial, serial, 'Duplicate', invoice_number
+    FROM ordered WHERE uses > 1 AND source != 'end'
+    ORDER BY month_str, first_serial, issue
+"""
+
+register_query("invoice.generate_invoice_number", LAST_SERIAL_QUERY, ("2526", "04"))
+# The tables are searched by financial_year; only the (one FY) CTEs are scanned
+register_query("invoice.audit_sequence", SEQUENCE_AUDIT_QUERY, ("2526",), allow_scan=True)
+register_query("invoice.list_invoices", INVOICE_LIST_QUERY, allow_scan=True)
+# Invoice + items + client + office in one joined query (one row per item).
+# Columns come back as "invoice.id", "item.amount", "client.address", ... so
+# the four tables' same-named columns don't collide.
+DETAIL_TABLES = (
+    ("invoice", "invoices", "i"),
+    ("item", "invoice_items", "it"),
+    ("client", "clients", "c"),
+    ("office", "offices", "o"),
+)
+
+DETAILS_FROM = """
+    FROM invoices i
+    LEFT JOIN invoice_items it ON it.invoice_id = i.id
+    LEFT JOIN clients c ON c.gstin = i.client_gstin
+    LEFT JOIN offices o ON o.id = i.office_id
+    WHERE i.id IN ({placeholders})
+    ORDER BY i.id, it.id
+"""
+
+DETAILS_CHUNK = 500  # invoice ids per query
+
+# Stored items and current totals, for re-rating a month (or a set of invoices)
+RERATE_ITEMS_QUERY = """
+    SELECT it.invoice_id, it.amount, it.gst_rate, i.tax_type
+    FROM invoice_items it
+    JOIN invoices i ON i.id = it.invoice_id
+    WHERE {where}
+"""
+
+RERATE_TOTALS_QUERY = """
+    SELECT i.id, i.taxable_value, i.cgst_amount, i.sgst_amount, i.igst_amount, i.grand_total
+    FROM invoices i
+    WHERE {where}
+"""
+
+TOTAL_COLUMNS = ("taxable_value", "cgst_amount", "sgst_amount", "igst_amount", "grand_total")
+
+# Invoice columns an edit can change (all of them are printed on the PDF)
+EDITABLE_COLUMNS = (
+    "client_gstin", "office_id", "invoice_date", "tax_type", *TOTAL_COLUMNS,
+    "allotted_bank", "allotted_branch", "allotted_city", "place_of_supply",
+)
+ITEM_COLUMNS = ("description", "hsn_code", "amount", "gst_rate")
+
+register_query("invoice.get_invoice_details",
+               "SELECT i.id, it.id, c.gstin, o.id" + DETAILS_FROM.format(placeholders="?"), (1,))
+
+def format_serial(invoice_number):
+    """Serial from 'A4CA/2526/04/0001', or None if the number doesn't follow the format."""
+    parts = invoice_number.split('/')
+    if len(parts) == 4 and parts[3].isdigit():
+        return int(parts[3])
+    return None
+
+_details_layout = None
+
+def details_layout(conn):
+    """
+    (SELECT list for DETAILS_FROM, [(prefix, columns, start, end)]), built
+    once from the live schema; start/end slice each table out of a row.
+    """
+    global _details_layout
+    if _details_layout is None:
+        select, layout = [], []
+        for prefix, table, alias in DETAIL_TABLES:
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+            layout.append((prefix, columns, len(select), len(select) + len(columns)))
+            select.extend(f'{alias}.{col} AS "{prefix}.{col}"' for col in columns)
+        _details_layout = ("SELECT " + ", ".join(select), layout)
+    return _details_layout
+
+def split_details_row(row, layout):
+    """One joined row -> {'invoice': {...}, 'item': {...}, 'client': {...}, 'office': {...}}"""
+    return {prefix: dict(zip(columns, row[start:end])) for prefix, columns, start, end in layout}
+
+def parse_serial(invoice_number):
+    """Serial for the serial_number column; 9999 for numbers that don't follow the format."""
+    serial = format_serial(invoice_number)
+    return 9999 if serial is None else serial # Fallback
+
+def format_invoice_number(fy, month_str, serial):
+    return f"A4CA/{fy}/{month_str}/{serial:04d}"
+
+def allocate_serial(conn, fy, month_str, count=1):
+    """
+    Advances the FY/month counter by count and returns the first serial of
+    the block. Must run inside a write transaction (BEGIN IMMEDIATE) so no
+    other writer can take the same numbers; rolling back gives them back.
+    """
+    conn.execute(ADVANCE_SEQUENCE_SQL, (fy, month_str, count))
+    return conn.execute(LAST_SERIAL_QUERY, (fy, month_str)).fetchone()[0] - count + 1
+
+def record_manual_serials(conn, serials):
+    """
+    serials: (fy, month_str, invoice_number) of manually numbered invoices.
+    A reserved number used this way is no longer reserved.
+    """
+    conn.executemany(BUMP_SEQUENCE_SQL, [
+        (fy, month_str, format_serial(number)) for fy, month_str, number in serials
+        if format_serial(number) is not None
+    ])
+    conn.executemany("DELETE FROM reserved_invoice_numbers WHERE invoice_number = ?",
+                     [(number,) for _, _, number in serials])
+
 class InvoiceService:
-    def __init__(self):
-        self.db = db_manager
+    def __init__(self, db=None):
+        self.db = db or db_manager
+        self.cache = invoice_detail_cache
 
     def get_financial_year(self, date_obj):
         """
@@ -27,44 +222,60 @@ class InvoiceService:
         """
         Format: A4CA/FY/MM/NNNN
         Resets every month.
-        Parses actual invoice numbers to handle custom invoice numbers correctly.
+        Preview only: the number is actually taken by create_invoice, which
+        may hand out a later one if another invoice got there first.
         """
         fy = self.get_financial_year(date_obj)
         month_str = date_obj.strftime("%m")
         
         conn = self.db.get_connection()
         try:
-            # Get ALL invoice numbers for this FY and month
-            query = """
-                SELECT invoice_number 
-                FROM invoices 
-                WHERE financial_year = ? AND month_str = ?
-            """
-            cursor = conn.execute(query, (fy, month_str))
-            rows = cursor.fetchall()
-            
-            # Parse invoice numbers to find the highest serial
-            max_serial = 0
-            for row in rows:
-                inv_num = row['invoice_number']
-                # Format: A4CA/2526/04/0001
-                # Extract the last part (serial number)
-                try:
-                    parts = inv_num.split('/')
-                    if len(parts) == 4:
-                        serial = int(parts[3])
-                        if serial > max_serial:
-                            max_serial = serial
-                except (ValueError, IndexError):
-                    # Skip malformed invoice numbers
-                    continue
-            
-            next_serial = max_serial + 1
-            serial_str = f"{next_serial:04d}"
-            return f"A4CA/{fy}/{month_str}/{serial_str}", next_serial
+            row = conn.execute(LAST_SERIAL_QUERY, (fy, month_str)).fetchone()
+            next_serial = (row[0] if row else 0) + 1
+            return format_invoice_number(fy, month_str, next_serial), next_serial
         finally:
             conn.close()
 
+    def allocate_invoice_number(self, conn, date_obj):
+        """Takes the next number for date_obj's month; conn must be in a write transaction."""
+        fy = self.get_financial_year(date_obj)
+        month_str = date_obj.strftime("%m")
+        serial = allocate_serial(conn, fy, month_str)
+        return format_invoice_number(fy, month_str, serial), serial
+
+    def reserve_invoice_number(self, date_obj, reason=""):
+        """
+        Takes the next number for date_obj's month without creating an
+        invoice and records it in reserved_invoice_numbers. Returns the number.
+        """
+        fy = self.get_financial_year(date_obj)
+        month_str = date_obj.strftime("%m")
+        with self.db.transaction("IMMEDIATE") as conn:
+            invoice_number, serial = self.allocate_invoice_number(conn, date_obj)
+            conn.execute("""
+                INSERT INTO reserved_invoice_numbers (
+                    invoice_number, financial_year, month_str, serial_number, reserved_date, reason
+                ) VALUES (?, ?, ?, ?, ?, ?)
+            """, (invoice_number, fy, month_str, serial, date_obj.strftime("%Y-%m-%d"), reason))
+        return invoice_number
+
+    def get_reserved_numbers(self, financial_year=None):
+        with self.db.connection() as conn:
+            return [dict(row) for row in conn.execute(f"""
+                SELECT * FROM reserved_invoice_numbers
+                {"WHERE financial_year = ?" if financial_year else ""}
+                ORDER BY financial_year, month_str, serial_number
+            """, (financial_year,) if financial_year else ()).fetchall()]
+
+    def audit_sequence(self, financial_year):
+        """
+        Problems in a financial year's numbering ('2526'), month by month:
+        [{month_str, first_serial, last_serial, issue, invoice_number}] with
+        issue 'Missing' (a run of unused serials), 'Reserved' or 'Duplicate'.
+        """
+        with self.db.connection() as conn:
+            return [dict(row) for row in conn.execute(SEQUENCE_AUDIT_QUERY, (financial_year,)).fetchall()]
+
     def create_invoice(self, client_gstin, office_id, invoice_date, items, tax_type, allotted_details=None, manual_invoice_number=None):
         """
         allotted_details: dict with keys 'bank', 'branch', 'city'
@@ -80,56 +291,27 @@ class InvoiceService:
         city = allotted_details.get('city', '') if allotted_details else ''
         
         pos = allotted_details.get('pos', '') if allotted_details else ''
-        
-        if manual_invoice_number:
-            invoice_number = manual_invoice_number
-            # If manual, we still need a serial number for DB consistency, 
-            # ideally we just grab the next one but don't use it in the string if overridden. 
-            # But the requirement says "Manual override allowed".
-            # To keep it simple and consistent, we'll assume the user provides the full string.
-            # We will interpret the serial number from the manual string if it matches format
-            # or just store 0/max if it breaks format to avoid collision. 
-            # Best effort parse:
-            parts = invoice_number.split('/')
-            if len(parts) == 4 and parts[3].isdigit():
-                serial_number = int(parts[3])
-            else:
-                serial_number = 9999 # Fallback
-        else:
-            invoice_number, serial_number = self.generate_invoice_number(invoice_date)
 
-        # Calculate totals
-        taxable_value = 0.0
-        cgst_total = 0.0
-        sgst_total = 0.0
-        igst_total = 0.0
-        
-        for item in items:
-            amt = float(item['amount'])
-            rate = float(item['gst_rate']) # 0, 5, 12, 18
-            
-            taxable_value += amt
-            
-            if tax_type == 'IGST':
-                igst_total += amt * (rate / 100.0)
-            elif tax_type == 'CGST_SGST':
-                cgst_total += amt * (rate / 2.0 / 100.0)
-                sgst_total += amt * (rate / 2.0 / 100.0)
-                
-        grand_total = taxable_value + cgst_total + sgst_total + igst_total
+        # Calculate totals (exact paise, tax rounded per line)
+        taxable_value, cgst_total, sgst_total, igst_total, grand_total = compute_invoice(items, tax_type).totals()
         
         conn = self.db.get_connection()
         try:
-            conn.execute("BEGIN")
+            # IMMEDIATE: take the write lock before reading the counter, so two
+            # instances sharing the file can't allocate the same number
+            conn.execute("BEGIN IMMEDIATE")
+
+            if manual_invoice_number:
+                invoice_number = manual_invoice_number
+                # The user provides the full string. The serial is parsed from it
+                # when it matches the format (and the counter moves past it),
+                # otherwise 9999 is stored.
+                serial_number = parse_serial(invoice_number)
+                record_manual_serials(conn, [(fy, month_str, invoice_number)])
+            else:
+                invoice_number, serial_number = self.allocate_invoice_number(conn, invoice_date)
             
-            cursor = conn.execute("""
-                INSERT INTO invoices (
-                    invoice_number, invoice_date, financial_year, month_str, serial_number,
-                    client_gstin, office_id, tax_type, 
-                    taxable_value, cgst_amount, sgst_amount, igst_amount, grand_total, status,
-                    allotted_bank, allotted_branch, allotted_city, place_of_supply
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'Generated', ?, ?, ?, ?)
-            """, (
+            cursor = conn.execute(INSERT_INVOICE_SQL, (
                 invoice_number, invoice_date, fy, month_str, serial_number,
                 client_gstin, office_id, tax_type,
                 taxable_value, cgst_total, sgst_total, igst_total, grand_total,
@@ -139,10 +321,7 @@ class InvoiceService:
             invoice_id = cursor.lastrowid
             
             for item in items:
-                conn.execute("""
-                    INSERT INTO invoice_items (invoice_id, description, hsn_code, amount, gst_rate)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (invoice_id, item['description'], item.get('hsn_code', ''), item['amount'], item['gst_rate']))
+                conn.execute(INSERT_ITEM_SQL, (invoice_id, item['description'], item.get('hsn_code', ''), Money.from_rupees(item['amount']), item['gst_rate']))
             
             conn.commit()
             return invoice_id, invoice_number
@@ -153,22 +332,228 @@ class InvoiceService:
         finally:
             conn.close()
 
+    def create_invoices_bulk(self, specs):
+        """
+        Creates many invoices in one transaction (all or nothing), e.g. the
+        monthly retainer run. specs: dicts with the create_invoice arguments
+        (client_gstin, office_id, invoice_date, items, tax_type, optional
+        allotted_details). Each FY/month gets one contiguous block of numbers,
+        in spec order. Returns [(invoice_id, invoice_number)] in spec order.
+        Called inside an open transaction on this thread it joins it.
+        """
+        prepared = []
+        for spec in specs:
+            invoice_date = spec['invoice_date']
+            if isinstance(invoice_date, str):
+                invoice_date = datetime.datetime.strptime(invoice_date, "%Y-%m-%d").date()
+            allotted = spec.get('allotted_details') or {}
+            prepared.append((
+                spec, invoice_date, self.get_financial_year(invoice_date), invoice_date.strftime("%m"),
+                compute_invoice(spec['items'], spec['tax_type']).totals(), allotted,
+            ))
+        if not prepared:
+            return []
+
+        try:
+            with self.db.transaction("IMMEDIATE") as conn:
+                return self._insert_bulk(conn, prepared)
+        except Exception as e:
+            logging.error(f"Error creating invoices in bulk: {e}")
+            raise e
+
+    def _insert_bulk(self, conn, prepared):
+        block_sizes = Counter((fy, month_str) for _, _, fy, month_str, _, _ in prepared)
+        next_serial = {key: allocate_serial(conn, *key, count=count) for key, count in block_sizes.items()}
+
+        invoice_rows = []
+        for spec, invoice_date, fy, month_str, totals, allotted in prepared:
+            serial_number = next_serial[(fy, month_str)]
+            next_serial[(fy, month_str)] += 1
+            invoice_rows.append((
+                format_invoice_number(fy, month_str, serial_number), invoice_date, fy, month_str, serial_number,
+                spec['client_gstin'], spec['office_id'], spec['tax_type'], *totals,
+                allotted.get('bank', ''), allotted.get('branch', ''), allotted.get('city', ''), allotted.get('pos', ''),
+            ))
+
+        # We hold the write lock, so every id above the current max is ours
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM invoices").fetchone()[0]
+        conn.executemany(INSERT_INVOICE_SQL, invoice_rows)
+        ids = {row['invoice_number']: row['id'] for row in conn.execute(
+            "SELECT id, invoice_number FROM invoices WHERE id > ?", (last_id,))}
+
+        results = [(ids[row[0]], row[0]) for row in invoice_rows]
+        conn.executemany(INSERT_ITEM_SQL, [
+            (invoice_id, item['description'], item.get('hsn_code', ''), Money.from_rupees(item['amount']), item['gst_rate'])
+            for (invoice_id, _), (spec, *_) in zip(results, prepared)
+            for item in spec['items']
+        ])
+
+        return results
+
+    def update_invoice(self, invoice_id, client_gstin, office_id, invoice_date, items, tax_type,
+                       allotted_details=None, queue_pdf=False):
+        """
+        Saves an edited invoice (the number stays). Items are matched to the
+        stored ones by position and only changed rows are written; totals are
+        recomputed in the same transaction. A cancelled invoice becomes
+        active again and payment status follows the new total.
+        queue_pdf: put the invoice in pdf_queue when its PDF needs redoing
+        (batch tools); the UI renders it right away instead.
+        Returns (invoice_number, pdf_needs_regeneration).
+        """
+        if isinstance(invoice_date, datetime.date):
+            invoice_date = invoice_date.strftime("%Y-%m-%d")
+        allotted = allotted_details or {}
+        new = dict(zip(EDITABLE_COLUMNS, (
+            client_gstin, office_id, invoice_date, tax_type,
+            *(m.paise for m in compute_invoice(items, tax_type).totals()),
+            allotted.get('bank', ''), allotted.get('branch', ''), allotted.get('city', ''), allotted.get('pos', ''),
+        )))
+        new_items = [(item['description'], item.get('hsn_code', '') or '', Money.from_rupees(item['amount']).paise, int(float(item['gst_rate'])))
+                     for item in items]
+
+        try:
+            with self.db.transaction("IMMEDIATE") as conn:
+                old = conn.execute("SELECT * FROM invoices WHERE id = ?", (invoice_id,)).fetchone()
+                if old is None:
+                    raise ValueError(f"Invoice {invoice_id} not found")
+                changed = {col: value for col, value in new.items() if old[col] != value}
+                if changed or old['status'] == 'Cancelled':
+                    conn.execute(f"""
+                        UPDATE invoices SET {''.join(col + ' = ?, ' for col in changed)}
+                            status = CASE WHEN status = 'Cancelled' THEN 'Generated' ELSE status END
+                        WHERE id = ?
+                    """, (*changed.values(), invoice_id))
+
+                old_items = conn.execute(
+                    "SELECT id, description, hsn_code, amount, gst_rate FROM invoice_items WHERE invoice_id = ? ORDER BY id",
+                    (invoice_id,)).fetchall()
+                updates, inserts, deletes = [], [], []
+                for position in range(max(len(old_items), len(new_items))):
+                    old_item = old_items[position] if position < len(old_items) else None
+                    new_item = new_items[position] if position < len(new_items) else None
+                    if old_item is None:
+                        inserts.append((invoice_id, *new_item))
+                    elif new_item is None:
+                        deletes.append((old_item['id'],))
+                    elif (old_item['description'], old_item['hsn_code'] or '', old_item['amount'], old_item['gst_rate']) != new_item:
+                        updates.append((*new_item, old_item['id']))
+                conn.executemany(f"UPDATE invoice_items SET {', '.join(col + ' = ?' for col in ITEM_COLUMNS)} WHERE id = ?", updates)
+                conn.executemany(INSERT_ITEM_SQL, inserts)
+                conn.executemany("DELETE FROM invoice_items WHERE id = ?", deletes)
+
+                if "grand_total" in changed or old['status'] == 'Cancelled':
+                    PaymentService().recompute_statuses(conn, [invoice_id])
+
+                pdf_missing = not old['pdf_path'] or not os.path.exists(old['pdf_path'])
+                pdf_needs_regeneration = bool(changed or updates or inserts or deletes or pdf_missing)
+                if pdf_needs_regeneration and queue_pdf:
+                    from services.pdf_queue_service import PdfQueueService  # imports this module
+                    PdfQueueService(self.db).enqueue(conn, [invoice_id])
+        except Exception as e:
+            logging.error(f"Error updating invoice {invoice_id}: {e}")
+            raise e
+        finally:
+            self.invalidate([invoice_id])
+        return old['invoice_number'], pdf_needs_regeneration
+
+    def set_pdf_path(self, invoice_id, pdf_path):
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE invoices SET pdf_path = ? WHERE id = ?", (pdf_path, invoice_id))
+        self.invalidate([invoice_id])
+
+    def recalculate_totals(self, financial_year=None, month_str=None, invoice_ids=None):
+        """
+        Re-rates invoices from their stored items with the tax engine (a whole
+        FY/month, or the given ids) and rewrites the totals that differ, then
+        refreshes payment statuses of those invoices. One transaction.
+        Returns the ids whose totals changed.
+        """
+        if invoice_ids is not None:
+            ids = list(invoice_ids)
+            scopes = [("i.id IN ({})".format(",".join("?" * len(ids[start:start + DETAILS_CHUNK]))),
+                       ids[start:start + DETAILS_CHUNK]) for start in range(0, len(ids), DETAILS_CHUNK)]
+        elif financial_year and month_str:
+            scopes = [("i.financial_year = ? AND i.month_str = ?", [financial_year, month_str])]
+        else:
+            raise ValueError("Give invoice_ids or financial_year and month_str")
+
+        with self.db.transaction("IMMEDIATE") as conn:
+            changed = []
+            for where, params in scopes:
+                columns = list(zip(*conn.execute(RERATE_ITEMS_QUERY.format(where=where), params).fetchall())) or [[]] * 4
+                rated = compute_batch(*columns)
+                for row in conn.execute(RERATE_TOTALS_QUERY.format(where=where), params):
+                    new = rated.get(row['id'])
+                    if new is not None and list(row)[1:] != new:
+                        changed.append((*new, row['id']))
+            conn.executemany(
+                f"UPDATE invoices SET {', '.join(col + ' = ?' for col in TOTAL_COLUMNS)} WHERE id = ?", changed)
+            changed_ids = [row[-1] for row in changed]
+            PaymentService().recompute_statuses(conn, changed_ids)
+        self.invalidate(changed_ids)
+        if changed_ids:
+            logging.info(f"Re-rated {len(changed_ids)} invoices")
+        return changed_ids
+
     def get_invoice_details(self, invoice_id):
+        """{'invoice', 'items', 'client', 'office'} for one invoice (one query), or None."""
+        return self.get_invoice_details_many([invoice_id]).get(invoice_id)
+
+    def get_invoice_details_many(self, invoice_ids):
+        """
+        Details for many invoices in one query per DETAILS_CHUNK ids (only
+        for the ones not in the detail cache).
+        Returns {invoice_id: details}; unknown ids are left out.
+        """
+        self.db.refresh_path()
+        db_path = self.db.db_path
+        details = {}
+        ids = []
+        for invoice_id in dict.fromkeys(invoice_ids):
+            cached = self.cache.get(db_path, invoice_id)
+            if cached is None:
+                ids.append(invoice_id)
+            else:
+                details[invoice_id] = cached
+        if not ids:
+            return details
+
+        generation = self.cache.generation
         conn = self.db.get_connection()
         try:
-            invoice = conn.execute("SELECT * FROM invoices WHERE id = ?", (invoice_id,)).fetchone()
-            if not invoice:
-                return None
-                
-            items = conn.execute("SELECT * FROM invoice_items WHERE invoice_id = ?", (invoice_id,)).fetchall()
-            client = conn.execute("SELECT * FROM clients WHERE gstin = ?", (invoice['client_gstin'],)).fetchone()
-            office = conn.execute("SELECT * FROM offices WHERE id = ?", (invoice['office_id'],)).fetchone()
-            
-            return {
-                "invoice": dict(invoice),
-                "items": [dict(i) for i in items],
-                "client": dict(client) if client else {},
-                "office": dict(office) if office else {}
-            }
+            select, layout = details_layout(conn)
+            for start in range(0, len(ids), DETAILS_CHUNK):
+                chunk = ids[start:start + DETAILS_CHUNK]
+                sql = select + DETAILS_FROM.format(placeholders=",".join("?" * len(chunk)))
+                for row in conn.execute(sql, chunk):
+                    parts = split_details_row(tuple(row), layout)
+                    invoice_id = parts["invoice"]["id"]
+                    entry = details.get(invoice_id)
+                    if entry is None:
+                        entry = details[invoice_id] = {
+                            "invoice": money_row(parts["invoice"]),
+                            "items": [],
+                            "client": parts["client"] if parts["client"]["gstin"] is not None else {},
+                            "office": parts["office"] if parts["office"]["id"] is not None else {},
+                        }
+                    if parts["item"]["id"] is not None:
+                        entry["items"].append(money_row(parts["item"]))
+            for invoice_id in ids:
+                if invoice_id in details:
+                    self.cache.put(db_path, invoice_id, details[invoice_id], generation)
+            return details
+        finally:
+            conn.close()
+
+    def invalidate(self, invoice_ids):
+        """Call after writing to these invoices (or their items/payments) outside this service."""
+        self.cache.invalidate(invoice_ids)
+
+    def list_invoices(self):
+        """All invoices, newest first, with their item descriptions joined for searching."""
+        conn = self.db.get_connection()
+        try:
+            return [money_row(row) for row in conn.execute(INVOICE_LIST_QUERY).fetchall()]
         finally:
             conn.close()
@@ -1,55 +1,116 @@
 from db.database import db_manager
+from db.index_advisor import register_query
+from services.invoice_cache import invoice_detail_cache
+from utils.money import Money, money_row
 import logging
 import datetime
 
+STATUS_CHUNK = 500  # ids per UPDATE ... WHERE id IN (...)
+
+register_query("payment.add_payment.balance",
+               "SELECT grand_total, amount_paid, balance_due, status FROM invoices WHERE id = ?", (1,))
+register_query("payment.get_payments_for_invoice", "SELECT * FROM payments WHERE invoice_id = ?", (1,))
+
+# A client's invoices that can take a payment, oldest first (FIFO order)
+OPEN_INVOICES_QUERY = """
+    SELECT id, invoice_number, invoice_date, grand_total, amount_paid, balance_due
+    FROM invoices
+    WHERE client_gstin = ? AND status IN ('Generated', 'Partially Paid') AND balance_due > 0
+    ORDER BY invoice_date, id
+"""
+
+CLIENTS_WITH_BALANCE_QUERY = """
+    SELECT c.gstin, c.client_name, COUNT(*) AS open_invoices, SUM(i.balance_due) AS balance_due
+    FROM invoices i
+    JOIN clients c ON c.gstin = i.client_gstin
+    WHERE i.status IN ('Generated', 'Partially Paid') AND i.balance_due > 0
+    GROUP BY c.gstin
+    ORDER BY c.client_name
+"""
+
+INSERT_PAYMENT_SQL = """
+    INSERT INTO payments (invoice_id, amount_received, payment_date, payment_mode, reference_number, notes)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+register_query("payment.open_invoices", OPEN_INVOICES_QUERY, ("27ABCDE1234F1Z5",))
+
+# What the payments on record say each invoice's amount_paid, balance_due
+# and status should be. Payments are aggregated once, not per invoice;
+# invoices without payments come through the LEFT JOIN with 0 received.
+# ?1 limits it to one financial year (NULL: the whole book).
+EXPECTED_STATUS_CTE = """
+    WITH paid AS (
+        SELECT invoice_id, SUM(amount_received) AS paid FROM payments GROUP BY invoice_id
+    ),
+    expected AS (
+        SELECT i.id, i.invoice_number, i.invoice_date, i.grand_total, i.amount_paid, i.balance_due,
+               COALESCE(p.paid, 0) AS total_received,
+               i.grand_total - COALESCE(p.paid, 0) AS expected_balance,
+               i.status,
+               CASE
+                   WHEN i.status = 'Cancelled' THEN 'Cancelled'
+                   WHEN COALESCE(p.paid, 0) >= i.grand_total THEN 'Paid'
+                   WHEN COALESCE(p.paid, 0) > 0 THEN 'Partially Paid'
+                   ELSE 'Generated'
+               END AS expected_status
+        FROM invoices i
+        LEFT JOIN paid p ON p.invoice_id = i.id
+        WHERE ?1 IS NULL OR i.financial_year = ?1
+    )
+"""
+
+# Invoices that drifted from their payments (manual status changes, old data)
+STATUS_DRIFT = "e.status != e.expected_status OR e.amount_paid != e.total_received OR e.balance_due != e.expected_balance"
+
+STATUS_AUDIT_QUERY = EXPECTED_STATUS_CTE + f"""
+    SELECT * FROM expected e
+    WHERE {STATUS_DRIFT}
+    ORDER BY e.invoice_date, e.id
+"""
+
+# One UPDATE joined against the expected values (SQLite 3.33+ UPDATE ... FROM)
+REPAIR_STATUS_SQL = EXPECTED_STATUS_CTE + f"""
+    UPDATE invoices SET
+        amount_paid = e.total_received,
+        balance_due = e.expected_balance,
+        status = e.expected_status
+    FROM expected e
+    WHERE e.id = invoices.id AND ({STATUS_DRIFT})
+"""
+
+register_query("payment.audit_statuses", STATUS_AUDIT_QUERY, (None,), allow_scan=True)
+
+# invoices.amount_paid / balance_due (schema v11) are kept in step with the
+# payments table by triggers, so nothing here sums payments.
+
 class PaymentService:
     def __init__(self):
         self.db = db_manager
 
     def add_payment(self, invoice_id, amount, payment_date, mode, reference, notes=""):
+        amount = Money.from_rupees(amount)
         conn = self.db.get_connection()
         try:
-            # Get invoice total and current paid amount for validation
-            inv_row = conn.execute("SELECT grand_total FROM invoices WHERE id = ?", (invoice_id,)).fetchone()
-            paid_row = conn.execute("SELECT COALESCE(SUM(amount_received), 0) as total_paid FROM payments WHERE invoice_id = ?", (invoice_id,)).fetchone()
-            
-            grand_total = inv_row['grand_total']
-            already_paid = paid_row['total_paid']
-            remaining = grand_total - already_paid
+            # IMMEDIATE: the balance checked is the one the payment is applied to
+            conn.execute("BEGIN IMMEDIATE")
+
+            inv_row = conn.execute("SELECT grand_total, amount_paid, balance_due, status FROM invoices WHERE id = ?", (invoice_id,)).fetchone()
+            if inv_row is None:
+                raise ValueError(f"Invoice {invoice_id} not found")
+            remaining = Money(inv_row['balance_due'])
             
-            # Validate: payment should not exceed remaining balance
-            if amount > remaining + 0.01:  # Small tolerance for floating point
+            # Validate: payment should not exceed remaining balance (exact, in paise)
+            if amount > remaining:
                 raise ValueError(f"Payment amount (₹{amount:.2f}) exceeds remaining balance (₹{remaining:.2f})")
             
-            conn.execute("BEGIN")
-            
-            # Insert payment
-            conn.execute("""
-                INSERT INTO payments (invoice_id, amount_received, payment_date, payment_mode, reference_number, notes)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (invoice_id, amount, payment_date, mode, reference, notes))
-            
-            # Check totals
-            paid_row = conn.execute("SELECT SUM(amount_received) as total_paid FROM payments WHERE invoice_id = ?", (invoice_id,)).fetchone()
-            total_paid = paid_row['total_paid'] or 0.0
-            
-            inv_row = conn.execute("SELECT grand_total, status FROM invoices WHERE id = ?", (invoice_id,)).fetchone()
-            grand_total = inv_row['grand_total']
-            current_status = inv_row['status']
+            # Insert payment (the trigger moves amount_paid/balance_due)
+            conn.execute(INSERT_PAYMENT_SQL, (invoice_id, amount, payment_date, mode, reference, notes))
             
-            new_status = current_status
-            if current_status != 'Cancelled':
-                if total_paid >= grand_total:
-                    new_status = 'Paid'
-                elif total_paid > 0:
-                    new_status = 'Partially Paid'
-                else:
-                    new_status = 'Generated'
-            
-            if new_status != current_status:
-                conn.execute("UPDATE invoices SET status = ? WHERE id = ?", (new_status, invoice_id))
+            self.recompute_statuses(conn, [invoice_id])
             
             conn.commit()
+            invoice_detail_cache.invalidate([invoice_id])
             return True
         except Exception as e:
             conn.rollback()
@@ -58,9 +119,113 @@ class PaymentService:
         finally:
             conn.close()
 
+    def allocate_payment(self, client_gstin, amount, payment_date, mode, reference, notes="", allocations=None):
+        """
+        Spreads one receipt over a client's open invoices: one payment row per
+        invoice, all in one transaction with one status recompute.
+        allocations: {invoice_id: amount} for an explicit split (must add up
+        to amount); by default the oldest invoices are settled first (FIFO).
+        Returns [(invoice_id, invoice_number, Money)] in allocation order.
+        """
+        amount = Money.from_rupees(amount)
+        if amount.paise <= 0:
+            raise ValueError("Payment amount must be positive")
+        conn = self.db.get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            open_invoices = conn.execute(OPEN_INVOICES_QUERY, (client_gstin,)).fetchall()
+
+            split = []
+            if allocations:
+                by_id = {row['id']: row for row in open_invoices}
+                for invoice_id, part in allocations.items():
+                    part = Money.from_rupees(part)
+                    if part.paise == 0:
+                        continue
+                    row = by_id.get(invoice_id)
+                    if row is None:
+                        raise ValueError(f"Invoice {invoice_id} is not an open invoice of {client_gstin}")
+                    if part.paise < 0 or part.paise > row['balance_due']:
+                        raise ValueError(f"₹{part:.2f} for {row['invoice_number']} is more than its balance (₹{Money(row['balance_due']):.2f})")
+                    split.append((row, part.paise))
+                allocated = Money(sum(part for _, part in split))
+                if allocated != amount:
+                    raise ValueError(f"Allocations add up to ₹{allocated:.2f}, not ₹{amount:.2f}")
+            else:
+                outstanding = Money(sum(row['balance_due'] for row in open_invoices))
+                if amount > outstanding:
+                    raise ValueError(f"Payment amount (₹{amount:.2f}) exceeds the client's open balance (₹{outstanding:.2f})")
+                left = amount.paise
+                for row in open_invoices:
+                    if left == 0:
+                        break
+                    part = min(left, row['balance_due'])
+                    split.append((row, part))
+                    left -= part
+
+            conn.executemany(INSERT_PAYMENT_SQL, [
+                (row['id'], part, payment_date, mode, reference, notes) for row, part in split
+            ])
+            self.recompute_statuses(conn, [row['id'] for row, _ in split])
+            conn.commit()
+            invoice_detail_cache.invalidate([row['id'] for row, _ in split])
+            return [(row['id'], row['invoice_number'], Money(part)) for row, part in split]
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error allocating payment: {e}")
+            raise e
+        finally:
+            conn.close()
+
+    def get_open_invoices(self, client_gstin):
+        with self.db.connection() as conn:
+            return [money_row(row) for row in conn.execute(OPEN_INVOICES_QUERY, (client_gstin,)).fetchall()]
+
+    def get_clients_with_balance(self):
+        with self.db.connection() as conn:
+            return [money_row(row) for row in conn.execute(CLIENTS_WITH_BALANCE_QUERY).fetchall()]
+
+    def repair_statuses(self, financial_year=None, dry_run=False):
+        """
+        Audits every invoice (or one FY's) against its payments and, unless
+        dry_run, fixes the ones that drifted in a single UPDATE.
+        Returns the differences found: [{id, invoice_number, invoice_date,
+        grand_total, amount_paid, balance_due, total_received,
+        expected_balance, status, expected_status}].
+        """
+        with self.db.transaction("IMMEDIATE") as conn:
+            diffs = [money_row(row) for row in conn.execute(STATUS_AUDIT_QUERY, (financial_year,)).fetchall()]
+            if diffs and not dry_run:
+                conn.execute(REPAIR_STATUS_SQL, (financial_year,))
+                logging.info(f"Repaired status/amount paid/balance of {len(diffs)} invoices")
+        if diffs and not dry_run:
+            invoice_detail_cache.invalidate([d['id'] for d in diffs])
+        return diffs
+
+    def recompute_statuses(self, conn, invoice_ids):
+        """
+        Sets Generated / Partially Paid / Paid from amount_paid for the given
+        invoices in one UPDATE (Cancelled is left alone).
+        Runs on the caller's connection and transaction; the caller
+        invalidates the invoice detail cache for these ids after it commits
+        (invalidating earlier lets a concurrent read cache the old values).
+        """
+        ids = list(invoice_ids)
+        for start in range(0, len(ids), STATUS_CHUNK):
+            chunk = ids[start:start + STATUS_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            conn.execute(f"""
+                UPDATE invoices SET status = CASE
+                    WHEN amount_paid >= grand_total THEN 'Paid'
+                    WHEN amount_paid > 0 THEN 'Partially Paid'
+                    ELSE 'Generated'
+                END
+                WHERE id IN ({placeholders}) AND status != 'Cancelled'
+            """, chunk)
+
     def get_payments_for_invoice(self, invoice_id):
         conn = self.db.get_connection()
         try:
-            return [dict(row) for row in conn.execute("SELECT * FROM payments WHERE invoice_id = ?", (invoice_id,)).fetchall()]
+            return [money_row(row) for row in conn.execute("SELECT * FROM payments WHERE invoice_id = ?", (invoice_id,)).fetchall()]
         finally:
             conn.close()
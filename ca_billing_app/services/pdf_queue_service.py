@@ -0,0 +1,76 @@
+import logging
+from db.database import db_manager
+from services.invoice_service import InvoiceService
+from pdf.invoice_pdf import InvoicePDFGenerator
+
+# Invoices created in batches (recurring runs) don't render their PDFs inside
+# the creating transaction; they are queued in pdf_queue and rendered
+# afterwards, one short write per invoice.
+
+MAX_ATTEMPTS = 3
+BATCH_SIZE = 100  # invoice details loaded per query
+
+class PdfQueueService:
+    def __init__(self, db=None, generator=None):
+        self.db = db or db_manager
+        self.invoice_service = InvoiceService(self.db)
+        self.generator = generator
+
+    def enqueue(self, conn, invoice_ids):
+        """Queues invoices on the caller's connection/transaction (re-queuing resets attempts)."""
+        conn.executemany("""
+            INSERT INTO pdf_queue (invoice_id) VALUES (?)
+            ON CONFLICT (invoice_id) DO UPDATE SET attempts = 0, last_error = NULL, queued_at = CURRENT_TIMESTAMP
+        """, [(invoice_id,) for invoice_id in invoice_ids])
+
+    def pending_count(self):
+        with self.db.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM pdf_queue WHERE attempts < ?", (MAX_ATTEMPTS,)).fetchone()[0]
+
+    def process(self, limit=None, progress=None):
+        """
+        Renders queued PDFs oldest first and stores their paths.
+        Failures stay queued (up to MAX_ATTEMPTS tries) with the error;
+        invoices deleted since they were queued are dropped from the queue
+        and counted as failed. Returns (generated, failed).
+        """
+        generator = self.generator or InvoicePDFGenerator()
+        with self.db.connection() as conn:
+            invoice_ids = [row[0] for row in conn.execute("""
+                SELECT invoice_id FROM pdf_queue WHERE attempts < ?
+                ORDER BY queued_at, invoice_id LIMIT ?
+            """, (MAX_ATTEMPTS, -1 if limit is None else limit))]
+
+        generated = failed = 0
+        batch = {}
+        for step, invoice_id in enumerate(invoice_ids, 1):
+            if invoice_id not in batch:
+                batch = self.invoice_service.get_invoice_details_many(invoice_ids[step - 1:step - 1 + BATCH_SIZE])
+            details = batch.get(invoice_id)
+            if details is None:
+                # Deleted since it was queued: nothing to render
+                logging.warning(f"PDF for invoice {invoice_id} skipped: invoice not found")
+                with self.db.transaction() as conn:
+                    conn.execute("DELETE FROM pdf_queue WHERE invoice_id = ?", (invoice_id,))
+                failed += 1
+                continue
+            try:
+                pdf_path = generator.generate(details)
+                if not pdf_path:
+                    raise RuntimeError("no PDF was produced")
+            except Exception as e:
+                logging.error(f"PDF for invoice {invoice_id} failed: {e}")
+                with self.db.transaction() as conn:
+                    conn.execute("UPDATE pdf_queue SET attempts = attempts + 1, last_error = ? WHERE invoice_id = ?",
+                                 (str(e), invoice_id))
+                failed += 1
+                continue
+
+            with self.db.transaction() as conn:
+                conn.execute("UPDATE invoices SET pdf_path = ? WHERE id = ?", (pdf_path, invoice_id))
+                conn.execute("DELETE FROM pdf_queue WHERE invoice_id = ?", (invoice_id,))
+            self.invoice_service.invalidate([invoice_id])
+            generated += 1
+            if progress:
+                progress(step, len(invoice_ids))
+        return generated, failed
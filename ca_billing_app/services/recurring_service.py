@@ -0,0 +1,172 @@
+import calendar
+import datetime
+import logging
+from db.database import db_manager
+from db.index_advisor import register_query
+from services.invoice_service import InvoiceService
+from services.pdf_queue_service import PdfQueueService
+from utils.money import Money, money_row
+
+# Recurring invoice templates (schema v9): the same client, items and
+# allotted bank/branch every month. run_month() creates every due invoice for
+# a month in one transaction and queues the PDFs; recurring_invoices remembers
+# what was created, so running a month twice only creates what is missing.
+
+DUE_TEMPLATES_QUERY = """
+    SELECT t.*
+    FROM recurring_templates t
+    WHERE t.is_active = 1
+      AND t.start_month <= ?1
+      AND (t.end_month IS NULL OR t.end_month >= ?1)
+      AND NOT EXISTS (
+          SELECT 1 FROM recurring_invoices r WHERE r.template_id = t.id AND r.period = ?1
+      )
+    ORDER BY t.id
+"""
+
+DUE_TEMPLATE_ITEMS_QUERY = f"""
+    SELECT * FROM recurring_template_items
+    WHERE template_id IN (SELECT id FROM ({DUE_TEMPLATES_QUERY}))
+    ORDER BY template_id, id
+"""
+
+register_query("recurring.due_templates", DUE_TEMPLATES_QUERY, ("2025-04",), allow_scan=True)
+
+def current_period():
+    return datetime.date.today().strftime("%Y-%m")
+
+def parse_period(period):
+    """'2025-04' -> (2025, 4); ValueError otherwise."""
+    try:
+        date = datetime.datetime.strptime(period.strip(), "%Y-%m")
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid month {period!r} (use YYYY-MM)")
+    return date.year, date.month
+
+def invoice_date_for(period, invoice_day):
+    year, month = parse_period(period)
+    last_day = calendar.monthrange(year, month)[1]
+    return datetime.date(year, month, max(1, min(invoice_day or 1, last_day)))
+
+class RecurringService:
+    def __init__(self, db=None):
+        self.db = db or db_manager
+        self.invoice_service = InvoiceService(self.db)
+        self.pdf_queue = PdfQueueService(self.db)
+
+    def create_template(self, name, client_gstin, office_id, tax_type, items, allotted_details=None,
+                        invoice_day=1, start_month=None, end_month=None):
+        """
+        items: [{description, hsn_code, amount (rupees), gst_rate}] as for create_invoice.
+        allotted_details: dict with keys 'bank', 'branch', 'city', 'pos'.
+        start_month/end_month: 'YYYY-MM' (default: from this month, open-ended).
+        """
+        start_month = start_month or current_period()
+        parse_period(start_month)
+        if end_month:
+            parse_period(end_month)
+        allotted = allotted_details or {}
+        with self.db.transaction() as conn:
+            template_id = conn.execute("""
+                INSERT INTO recurring_templates (
+                    name, client_gstin, office_id, tax_type,
+                    allotted_bank, allotted_branch, allotted_city, place_of_supply,
+                    invoice_day, start_month, end_month
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                name, client_gstin, office_id, tax_type,
+                allotted.get('bank', ''), allotted.get('branch', ''), allotted.get('city', ''), allotted.get('pos', ''),
+                invoice_day, start_month, end_month,
+            )).lastrowid
+            conn.executemany("""
+                INSERT INTO recurring_template_items (template_id, description, hsn_code, amount, gst_rate)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(template_id, item['description'], item.get('hsn_code', ''), Money.from_rupees(item['amount']), item['gst_rate'])
+                  for item in items])
+        return template_id
+
+    def create_template_from_invoice(self, invoice_id, name=None, start_month=None):
+        """Template repeating an existing invoice (same client, items, bank/branch) from start_month."""
+        details = self.invoice_service.get_invoice_details(invoice_id)
+        if not details:
+            raise ValueError(f"Invoice {invoice_id} not found")
+        inv = details['invoice']
+        return self.create_template(
+            name or f"{details['client'].get('client_name', inv['client_gstin'])} - {inv['allotted_branch'] or 'monthly'}",
+            inv['client_gstin'], inv['office_id'], inv['tax_type'],
+            [{'description': i['description'], 'hsn_code': i['hsn_code'], 'amount': i['amount'], 'gst_rate': i['gst_rate']}
+             for i in details['items']],
+            allotted_details={'bank': inv['allotted_bank'], 'branch': inv['allotted_branch'],
+                              'city': inv['allotted_city'], 'pos': inv['place_of_supply']},
+            invoice_day=datetime.date.fromisoformat(str(inv['invoice_date'])[:10]).day,
+            start_month=start_month,
+        )
+
+    def list_templates(self, active_only=False):
+        conn = self.db.get_connection()
+        try:
+            rows = conn.execute(f"""
+                SELECT t.*, c.client_name, COUNT(i.id) AS item_count, COALESCE(SUM(i.amount), 0) AS amount
+                FROM recurring_templates t
+                JOIN clients c ON c.gstin = t.client_gstin
+                LEFT JOIN recurring_template_items i ON i.template_id = t.id
+                {"WHERE t.is_active = 1" if active_only else ""}
+                GROUP BY t.id
+                ORDER BY t.name
+            """).fetchall()
+            return [money_row(row) for row in rows]
+        finally:
+            conn.close()
+
+    def set_active(self, template_id, active):
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE recurring_templates SET is_active = ? WHERE id = ?", (1 if active else 0, template_id))
+
+    def delete_template(self, template_id):
+        """Invoices already created stay; only the template (and its run history) goes."""
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM recurring_templates WHERE id = ?", (template_id,))
+
+    def run_month(self, period=None):
+        """
+        Creates the invoices of every active template not yet billed for
+        period ('YYYY-MM', default this month) in a single transaction and
+        queues their PDFs. Returns [(template_id, invoice_id, invoice_number)].
+        """
+        period = period or current_period()
+        parse_period(period)
+
+        with self.db.transaction("IMMEDIATE") as conn:
+            templates = conn.execute(DUE_TEMPLATES_QUERY, (period,)).fetchall()
+            if not templates:
+                return []
+            items = {}
+            for row in conn.execute(DUE_TEMPLATE_ITEMS_QUERY, (period,)):
+                items.setdefault(row['template_id'], []).append({
+                    'description': row['description'], 'hsn_code': row['hsn_code'] or '',
+                    'amount': Money(row['amount']), 'gst_rate': row['gst_rate'],
+                })
+
+            specs = []
+            for t in templates:
+                if not items.get(t['id']):
+                    logging.warning(f"Recurring template {t['id']} ({t['name']}) has no items; skipped")
+                    continue
+                specs.append((t['id'], {
+                    'client_gstin': t['client_gstin'],
+                    'office_id': t['office_id'],
+                    'invoice_date': invoice_date_for(period, t['invoice_day']),
+                    'items': items[t['id']],
+                    'tax_type': t['tax_type'],
+                    'allotted_details': {'bank': t['allotted_bank'], 'branch': t['allotted_branch'],
+                                         'city': t['allotted_city'], 'pos': t['place_of_supply']},
+                }))
+
+            # Joins this transaction: invoices, run history and PDF queue commit together
+            created = self.invoice_service.create_invoices_bulk([spec for _, spec in specs])
+            conn.executemany("INSERT INTO recurring_invoices (template_id, period, invoice_id) VALUES (?, ?, ?)",
+                             [(template_id, period, invoice_id) for (template_id, _), (invoice_id, _) in zip(specs, created)])
+            self.pdf_queue.enqueue(conn, [invoice_id for invoice_id, _ in created])
+
+        logging.info(f"Recurring run {period}: {len(created)} invoices created")
+        return [(template_id, invoice_id, number) for (template_id, _), (invoice_id, number) in zip(specs, created)]
@@ -1,6 +1,132 @@
 from db.database import db_manager
+from db.index_advisor import register_query
+from utils.money import money_row
+import datetime
 import logging
 
+# gst_monthly_summary (schema v12) holds the non-cancelled invoice totals per
+# office/FY/month/tax type, kept current by triggers on invoices
+GST_SUMMARY_QUERY = """
+    SELECT 
+        SUM(taxable_value) as total_taxable,
+        SUM(cgst_amount) as total_cgst,
+        SUM(sgst_amount) as total_sgst,
+        SUM(igst_amount) as total_igst,
+        SUM(grand_total) as total_revenue
+    FROM gst_monthly_summary
+    WHERE financial_year = ?
+"""
+
+GST_MONTHLY_QUERY = """
+    SELECT month_str,
+        SUM(invoice_count) as invoices,
+        SUM(taxable_value) as total_taxable,
+        SUM(cgst_amount) as total_cgst,
+        SUM(sgst_amount) as total_sgst,
+        SUM(igst_amount) as total_igst,
+        SUM(grand_total) as total_revenue
+    FROM gst_monthly_summary
+    WHERE financial_year = ?
+"""
+
+PENDING_PAYMENTS_QUERY = """
+    SELECT 
+        i.id, i.invoice_number, i.invoice_date, c.client_name, i.grand_total, i.status, 
+        i.allotted_bank, i.allotted_branch, i.client_gstin,
+        i.amount_paid as total_received, i.balance_due
+    FROM invoices i
+    JOIN clients c ON i.client_gstin = c.gstin
+    WHERE i.status IN ('Generated', 'Partially Paid')
+"""
+
+EXPORT_INVOICES_FROM = """
+    FROM invoices i
+    JOIN clients c ON i.client_gstin = c.gstin
+    WHERE 1=1
+"""
+
+EXPORT_INVOICES_QUERY = "SELECT i.*, c.client_name, c.address as client_address" + EXPORT_INVOICES_FROM
+
+# Export fields that don't come from the invoices table
+EXPORT_CLIENT_FIELDS = {"client_name": "c.client_name", "client_address": "c.address AS client_address"}
+
+RECEIVED_PAYMENTS_QUERY = """
+    SELECT p.payment_date, c.client_name, i.invoice_number, p.amount_received, 
+           p.payment_mode, p.reference_number, p.notes
+    FROM payments p
+    JOIN invoices i ON p.invoice_id = i.id
+    JOIN clients c ON i.client_gstin = c.gstin
+    WHERE 1=1
+"""
+
+# Receivables aging as of a date (?1). Balances are what was outstanding on
+# that date: grand_total less the payments received up to it (payments are
+# aggregated once, not per invoice), so a past date isn't skewed by later
+# payments. Cancelled invoices are left out. The bucket boundaries are dates
+# computed once per run (?2 = as_of - 30 days, ?3 = - 60, ?4 = - 90), so each
+# row is bucketed by plain date comparisons instead of julianday() arithmetic.
+AGING_GROUPS = {
+    "client": ("c.gstin AS client_gstin, c.client_name", "c.gstin"),
+    "bank": ("COALESCE(NULLIF(i.allotted_bank, ''), '(none)') AS allotted_bank", "1"),
+    "branch": ("COALESCE(NULLIF(i.allotted_bank, ''), '(none)') AS allotted_bank, "
+               "COALESCE(NULLIF(i.allotted_branch, ''), '(none)') AS allotted_branch", "1, 2"),
+}
+
+AGING_QUERY = """
+    WITH paid AS (
+        SELECT invoice_id, SUM(amount_received) AS paid
+        FROM payments
+        WHERE payment_date <= ?1
+        GROUP BY invoice_id
+    ),
+    open AS (
+        SELECT inv.client_gstin, inv.invoice_date, inv.financial_year, inv.allotted_bank, inv.allotted_branch,
+               inv.grand_total - COALESCE(p.paid, 0) AS balance_due
+        FROM invoices inv
+        LEFT JOIN paid p ON p.invoice_id = inv.id
+        WHERE inv.status != 'Cancelled' AND inv.invoice_date <= ?1
+    )
+    SELECT {columns},
+        COUNT(*) AS invoices,
+        SUM(CASE WHEN i.invoice_date >= ?2 THEN i.balance_due ELSE 0 END) AS days_0_30,
+        SUM(CASE WHEN i.invoice_date < ?2 AND i.invoice_date >= ?3 THEN i.balance_due ELSE 0 END) AS days_31_60,
+        SUM(CASE WHEN i.invoice_date < ?3 AND i.invoice_date >= ?4 THEN i.balance_due ELSE 0 END) AS days_61_90,
+        SUM(CASE WHEN i.invoice_date < ?4 THEN i.balance_due ELSE 0 END) AS days_90_plus,
+        SUM(i.balance_due) AS total_due
+    FROM open i
+    JOIN clients c ON c.gstin = i.client_gstin
+    WHERE i.balance_due > 0
+"""
+
+def aging_cutoffs(as_of):
+    """(as_of, as_of - 30, - 60, - 90 days) as ISO dates, the AGING_QUERY parameters."""
+    return tuple((as_of - datetime.timedelta(days=days)).isoformat() for days in (0, 30, 60, 90))
+
+register_query("reporting.get_gst_summary", GST_SUMMARY_QUERY + " AND month_str = ?", ("2526", "04"))
+register_query("reporting.get_gst_monthly_summary", GST_MONTHLY_QUERY + " GROUP BY month_str", ("2526",))
+register_query("reporting.get_pending_payments", PENDING_PAYMENTS_QUERY)
+register_query("reporting.get_pending_payments.fy_month",
+               PENDING_PAYMENTS_QUERY + " AND i.month_str = ? AND i.financial_year = ? ORDER BY i.invoice_date ASC",
+               ("04", "2526"))
+register_query("reporting.get_pending_payments.gstin",
+               PENDING_PAYMENTS_QUERY + " AND i.client_gstin = ? ORDER BY i.invoice_date ASC",
+               ("27ABCDE1234F1Z5",))
+register_query("reporting.get_aging",
+               AGING_QUERY.format(columns=AGING_GROUPS["client"][0]) + " GROUP BY c.gstin",
+               aging_cutoffs(datetime.date(2025, 4, 1)))
+register_query("reporting.export_data.invoices", EXPORT_INVOICES_QUERY + " ORDER BY i.invoice_date DESC")
+register_query("reporting.export_data.invoices.fy_month",
+               EXPORT_INVOICES_QUERY + " AND i.month_str = ? AND i.financial_year = ? ORDER BY i.invoice_date DESC",
+               ("04", "2526"))
+register_query("reporting.get_received_payments.fy_month",
+               RECEIVED_PAYMENTS_QUERY + " AND i.month_str = ? AND i.financial_year = ? ORDER BY p.payment_date DESC",
+               ("04", "2526"))
+
+# Every report reads through db_manager.snapshot(): a read-only,
+# point-in-time view. In WAL mode it never holds locks invoice/payment writers
+# wait on; in rollback-journal mode writers wait for it, so reports are single
+# short queries.
+
 class ReportingService:
     def __init__(self):
         self.db = db_manager
@@ -9,44 +135,41 @@ class ReportingService:
         """
         Returns aggregated GST data.
         """
-        conn = self.db.get_connection()
-        query = """
-            SELECT 
-                SUM(taxable_value) as total_taxable,
-                SUM(cgst_amount) as total_cgst,
-                SUM(sgst_amount) as total_sgst,
-                SUM(igst_amount) as total_igst,
-                SUM(grand_total) as total_revenue
-            FROM invoices
-            WHERE financial_year = ? AND status != 'Cancelled'
-        """
+        query = GST_SUMMARY_QUERY
         params = [financial_year]
         
         if month:
             query += " AND month_str = ?"
             params.append(month)
             
-        try:
+        with self.db.snapshot() as conn:
             row = conn.execute(query, params).fetchone()
-            return dict(row) if row else {}
-        finally:
-            conn.close()
+            return money_row(row) if row else {}
+
+    def get_gst_monthly_summary(self, financial_year, office_id=None):
+        """
+        Month-by-month GST totals of a financial year (April first), for
+        dashboards; office_id limits it to one office.
+        """
+        query = GST_MONTHLY_QUERY
+        params = [financial_year]
+        
+        if office_id:
+            query += " AND office_id = ?"
+            params.append(office_id)
+            
+        # FY months run 04..12 then 01..03
+        query += " GROUP BY month_str ORDER BY (CAST(month_str AS INTEGER) + 8) % 12"
+        
+        with self.db.snapshot() as conn:
+            return [money_row(row) for row in conn.execute(query, params).fetchall()]
 
     def get_pending_payments(self, month=None, bank=None, branch=None, gstin=None, fy=None):
         """
         Returns list of invoices that are not fully paid.
         Filters: month (str 'MM'), bank (str partial match), gstin (str exact), fy (str '2526')
         """
-        conn = self.db.get_connection()
-        query = """
-            SELECT 
-                i.id, i.invoice_number, i.invoice_date, c.client_name, i.grand_total, i.status, 
-                i.allotted_bank, i.allotted_branch, i.client_gstin,
-                (SELECT SUM(p.amount_received) FROM payments p WHERE p.invoice_id = i.id) as total_received
-            FROM invoices i
-            JOIN clients c ON i.client_gstin = c.gstin
-            WHERE i.status IN ('Generated', 'Partially Paid')
-        """
+        query = PENDING_PAYMENTS_QUERY
         params = []
         
         if month:
@@ -71,71 +194,61 @@ class ReportingService:
             
         query += " ORDER BY i.invoice_date ASC"
         
-        try:
-            rows = conn.execute(query, params).fetchall()
-            results = []
-            for r in rows:
-                d = dict(r)
-                d['balance_due'] = d['grand_total'] - (d['total_received'] or 0.0)
-                results.append(d)
-            return results
-        finally:
-            conn.close()
+        with self.db.snapshot() as conn:
+            return [money_row(r) for r in conn.execute(query, params).fetchall()]
     
-    def export_data(self, query_type, filters=None, fields_to_export=None):
-        conn = self.db.get_connection()
-        try:
-            # Build query dynamically based on type
-            if query_type == "invoices":
-                base_query = """
-                    SELECT i.*, c.client_name, c.address as client_address
-                    FROM invoices i
-                    JOIN clients c ON i.client_gstin = c.gstin
-                    WHERE 1=1
-                """
-                params = []
-                
-                if filters:
-                    if 'month' in filters and filters['month']:
-                        base_query += " AND i.month_str = ?"
-                        params.append(filters['month'])
-                    if 'fy' in filters and filters['fy']:
-                        base_query += " AND i.financial_year = ?"
-                        params.append(filters['fy'])
-                    if 'year' in filters and filters['year']:
-                         # Calendar year check on invoice_date
-                         base_query += " AND strftime('%Y', i.invoice_date) = ?"
-                         params.append(str(filters['year']))
-                
-                base_query += " ORDER BY i.invoice_date DESC"
-                
-                rows = conn.execute(base_query, params).fetchall()
-                result = [dict(row) for row in rows]
-                
-                # Filter fields if needed
-                if fields_to_export:
-                    filtered_result = []
-                    for item in result:
-                        filtered_result.append({k: item[k] for k in fields_to_export if k in item})
-                    return filtered_result
-                return result
-            return []
-        finally:
-            conn.close()
+    def export_data(self, query_type, filters=None, fields_to_export=None, detached=False):
+        """All rows of iter_export_data() as a list (for on-screen reports)."""
+        return list(self.iter_export_data(query_type, filters, fields_to_export, detached))
 
+    def iter_export_data(self, query_type, filters=None, fields_to_export=None, detached=False):
+        """
+        Yields export rows one at a time from a snapshot, selecting only
+        fields_to_export (all invoice columns plus client_name and
+        client_address when empty) in SQL, so any number of rows can be
+        piped into a writer (utils.streaming_exporter) with flat memory.
+        filters: 'month' ('MM'), 'fy' ('2526'), 'year' (calendar year).
+        detached: read from a detached snapshot, so in rollback-journal
+        mode writers aren't held up while a long export is consumed (the
+        database is copied to memory first).
+        """
+        if query_type != "invoices":
+            return
+        with self.db.snapshot(detached=detached) as conn:
+            if fields_to_export:
+                available = {row[1]: f"i.{row[1]}" for row in conn.execute("PRAGMA table_info(invoices)")}
+                available.update(EXPORT_CLIENT_FIELDS)
+                columns = [available[f] for f in fields_to_export if f in available]
+                if not columns:
+                    raise ValueError(f"None of the fields {fields_to_export} can be exported")
+                query = "SELECT " + ", ".join(columns) + EXPORT_INVOICES_FROM
+            else:
+                query = EXPORT_INVOICES_QUERY
+            params = []
+            
+            if filters:
+                if filters.get('month'):
+                    query += " AND i.month_str = ?"
+                    params.append(filters['month'])
+                if filters.get('fy'):
+                    query += " AND i.financial_year = ?"
+                    params.append(filters['fy'])
+                if filters.get('year'):
+                    # Calendar year check on invoice_date
+                    query += " AND strftime('%Y', i.invoice_date) = ?"
+                    params.append(str(filters['year']))
+            
+            query += " ORDER BY i.invoice_date DESC"
+            
+            # The cursor reads from SQLite as it is iterated
+            for row in conn.execute(query, params):
+                yield money_row(row)
+    
     def get_received_payments(self, month=None, fy=None):
-        conn = self.db.get_connection()
-        try:
+        with self.db.snapshot() as conn:
             # Report of payments RECEIVED in a period
             # We filter by payment_date mostly
-            query = """
-                SELECT p.payment_date, c.client_name, i.invoice_number, p.amount_received, 
-                       p.payment_mode, p.reference_number, p.notes
-                FROM payments p
-                JOIN invoices i ON p.invoice_id = i.id
-                JOIN clients c ON i.client_gstin = c.gstin
-                WHERE 1=1
-            """
+            query = RECEIVED_PAYMENTS_QUERY
             params = []
             
             # Report of payments RECEIVED for invoices of a specific period
@@ -151,6 +264,26 @@ class ReportingService:
             
             query += " ORDER BY p.payment_date DESC"
             
-            return [dict(row) for row in conn.execute(query, params).fetchall()]
-        finally:
-            conn.close()
+            return [money_row(row) for row in conn.execute(query, params).fetchall()]
+
+    def get_aging(self, group_by="client", as_of=None, fy=None):
+        """
+        Outstanding balances as of a date (default today) in 0-30, 31-60,
+        61-90 and 90+ day buckets by invoice date, one row per client, per
+        allotted bank or per bank branch (group_by), largest total first.
+        fy: only invoices of that financial year ('2526').
+        """
+        if group_by not in AGING_GROUPS:
+            raise ValueError(f"Unknown aging grouping {group_by!r}")
+        columns, group = AGING_GROUPS[group_by]
+        query = AGING_QUERY.format(columns=columns)
+        params = list(aging_cutoffs(as_of or datetime.date.today()))
+
+        if fy:
+            query += " AND i.financial_year = ?5"
+            params.append(fy)
+
+        query += f" GROUP BY {group} ORDER BY total_due DESC"
+
+        with self.db.snapshot() as conn:
+            return [money_row(row) for row in conn.execute(query, params).fetchall()]
@@ -0,0 +1,229 @@
+import os
+import re
+import logging
+from db.database import db_manager
+from services.bulk_loader import LoadResult
+from services.payment_service import PaymentService
+from services.invoice_cache import invoice_detail_cache
+from utils.money import Money
+from utils.tabular import iter_rows, parse_date
+
+# Month-end reconciliation: reads a bank statement export (CSV/.xlsx), matches
+# each credit to a pending invoice and records the payments.
+# Rules, in order:
+#   reference - an invoice number in the narration/reference column
+#               (banks often drop the slashes: A4CA2526040001)
+#   amount    - exactly one pending invoice has this balance (narrowed to the
+#               client when the narration names one; the oldest one then)
+#   client    - the narration names a client with one pending invoice, or
+#               the credit settles all of the client's pending invoices
+# Anything else is left unmatched for review. Matching and recording run in
+# one IMMEDIATE transaction with one status recompute at the end, so the
+# balances matched against are the ones the payments are applied to.
+# Lines already recorded are skipped, so a statement can be imported again
+# after fixing the unmatched lines: payments with the line's reference and
+# date are summed (a line split over several invoices is several payments)
+# and each line recorded there uses up its amount of that total.
+
+# Statement headers seen across banks, compared without punctuation/spaces
+DATE_COLUMNS = ("txndate", "transactiondate", "date", "valuedate", "postdate")
+NARRATION_COLUMNS = ("narration", "description", "particulars", "remarks", "transactionremarks", "details")
+REFERENCE_COLUMNS = ("chqrefno", "refno", "referenceno", "referencenumber", "utr", "utrno", "chequeno", "chqno")
+CREDIT_COLUMNS = ("credit", "creditamount", "creditamt", "deposit", "depositamt", "depositamount", "cr", "cramount")
+AMOUNT_COLUMNS = ("amount", "transactionamount")
+TYPE_COLUMNS = ("drcr", "crdr", "type", "transactiontype")
+
+INVOICE_NUMBER_PATTERN = re.compile(r"A4CA\W?(\d{4})\W?(\d{2})\W?(\d{4})", re.IGNORECASE)
+PAYMENT_MODES = (("NEFT", "NEFT"), ("IMPS", "IMPS"), ("UPI", "UPI"), ("CHQ", "CHEQUE"), ("CHEQUE", "CHEQUE"), ("CLG", "CHEQUE"))
+
+PENDING_QUERY = """
+    SELECT i.id, i.invoice_number, i.client_gstin, c.client_name, i.balance_due
+    FROM invoices i
+    JOIN clients c ON c.gstin = i.client_gstin
+    WHERE i.status IN ('Generated', 'Partially Paid') AND i.balance_due > 0
+    ORDER BY i.invoice_date, i.id
+"""
+
+def _key(header):
+    return re.sub(r"[^a-z0-9]", "", header)
+
+def _words(text):
+    """'M/s. ABC Pvt-Ltd' -> ' M S ABC PVT LTD ' (padded, for whole-word 'in' checks)"""
+    return " " + " ".join(re.sub(r"[^A-Z0-9]", " ", str(text or "").upper()).split()) + " "
+
+def _pick(row, columns):
+    for column in columns:
+        value = row.get(column)
+        if value not in (None, ""):
+            return value
+    return None
+
+def _payment_mode(narration):
+    words = _words(narration)
+    for token, mode in PAYMENT_MODES:
+        if f" {token} " in words or words.startswith(f" {token}"):
+            return mode
+    return "OTHERS"
+
+class ReconcileResult(LoadResult):
+    def __init__(self):
+        super().__init__("statement")
+        self.matches = []  # {"row", "invoice_number", "amount", "rule"}
+
+    def summary(self):
+        text = f"statement: {self.loaded} payments matched, {len(self.rejects)} lines unmatched"
+        if self.skipped:
+            text += f", {self.skipped} skipped (debits or already recorded)"
+        return text
+
+class StatementReconciler:
+    def __init__(self, db=None):
+        self.db = db or db_manager
+        self.payment_service = PaymentService()
+
+    def reconcile_file(self, path, unmatched_path=None, sheet=None, dry_run=False):
+        """
+        Matches and records the credits of a statement file. Returns the
+        ReconcileResult; unmatched lines go to unmatched_path (default
+        '<file>_unmatched.csv'). dry_run: match only, record nothing.
+        """
+        lines = []
+        result = ReconcileResult()
+        for line_number, row in iter_rows(path, sheet):
+            line = self._parse_line(line_number, {_key(k): v for k, v in row.items()}, row, result)
+            if line:
+                lines.append(line)
+        self.reconcile(lines, result, dry_run)
+        if result.rejects:
+            unmatched_path = unmatched_path or f"{os.path.splitext(path)[0]}_unmatched.csv"
+            result.write_rejects(unmatched_path)
+            logging.warning(f"{len(result.rejects)} statement lines unmatched, see {unmatched_path}")
+        return result
+
+    def _parse_line(self, line_number, row, original, result):
+        try:
+            credit = _pick(row, CREDIT_COLUMNS)
+            if credit is None:
+                amount_type = str(_pick(row, TYPE_COLUMNS) or "CR").strip().upper()
+                credit = _pick(row, AMOUNT_COLUMNS) if amount_type.startswith("C") else None
+            amount = Money.from_rupees(credit)
+            if amount.paise <= 0:
+                result.skipped += 1  # debit
+                return None
+            date = parse_date(_pick(row, DATE_COLUMNS))
+        except ValueError as e:
+            result.reject(line_number, original, str(e))
+            return None
+        narration = str(_pick(row, NARRATION_COLUMNS) or "").strip()
+        reference = str(_pick(row, REFERENCE_COLUMNS) or "").strip()
+        return {
+            "row": line_number, "record": original, "date": date.isoformat(), "amount": amount,
+            "narration": narration, "reference": reference or narration[:100],
+        }
+
+    def reconcile(self, lines, result=None, dry_run=False):
+        """
+        lines: dicts with row, record (the source row, for the unmatched
+        report), date (ISO), amount (Money), narration, reference.
+        """
+        result = result or ReconcileResult()
+        if not lines:
+            return result
+        with self.db.transaction("IMMEDIATE") as conn:
+            pending = [dict(row) for row in conn.execute(PENDING_QUERY)]
+            recorded = {(row[0], row[1]): row[2] for row in conn.execute("""
+                SELECT reference_number, payment_date, SUM(amount_received) FROM payments
+                WHERE payment_date BETWEEN ? AND ?
+                GROUP BY reference_number, payment_date
+            """, (min(line["date"] for line in lines), max(line["date"] for line in lines)))}
+            matcher = _Matcher(pending)
+
+            payments = []
+            for line in lines:
+                key = (line["reference"], line["date"])
+                if recorded.get(key, 0) >= line["amount"].paise:
+                    recorded[key] -= line["amount"].paise
+                    result.skipped += 1
+                    continue
+                allocations, rule = matcher.match(line)
+                if not allocations:
+                    result.reject(line["row"], line["record"], rule)
+                    continue
+                mode = _payment_mode(line["narration"])
+                for invoice, amount in allocations:
+                    payments.append((invoice["id"], amount, line["date"], mode, line["reference"],
+                                     f"Bank statement line {line['row']}: {line['narration']}"[:250]))
+                    result.matches.append({"row": line["row"], "invoice_number": invoice["invoice_number"],
+                                           "amount": Money(amount), "rule": rule})
+                result.loaded += len(allocations)
+
+            if payments and not dry_run:
+                conn.executemany("""
+                    INSERT INTO payments (invoice_id, amount_received, payment_date, payment_mode, reference_number, notes)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, payments)
+                self.payment_service.recompute_statuses(conn, {p[0] for p in payments})
+        if payments and not dry_run:
+            invoice_detail_cache.invalidate({p[0] for p in payments})
+        return result
+
+class _Matcher:
+    """Pending invoices indexed for the three rules; balances follow the matches made."""
+    def __init__(self, pending):
+        self.pending = pending
+        self.by_number = {inv["invoice_number"].upper(): inv for inv in pending}
+        self.by_client = {}
+        self.names = {}
+        for inv in pending:
+            self.by_client.setdefault(inv["client_gstin"], []).append(inv)
+            name = _words(inv["client_name"])
+            if name.strip():
+                self.names[name] = inv["client_gstin"]
+        # Longest names first: 'ABC TRADERS PUNE' wins over 'ABC TRADERS'
+        self.name_order = sorted(self.names, key=len, reverse=True)
+
+    def _client(self, text):
+        for name in self.name_order:
+            if name in text:
+                return self.names[name]
+        return None
+
+    def _open(self, invoices):
+        return [inv for inv in invoices if inv["balance_due"] > 0]
+
+    def _take(self, allocations):
+        for invoice, amount in allocations:
+            invoice["balance_due"] -= amount
+        return allocations
+
+    def match(self, line):
+        """([(invoice, paise)], rule) or ([], reason it stays unmatched)."""
+        amount = line["amount"].paise
+        text = f"{line['narration']} {line['reference']}"
+
+        found = INVOICE_NUMBER_PATTERN.search(text)
+        if found:
+            number = "A4CA/{}/{}/{}".format(*found.groups())
+            invoice = self.by_number.get(number)
+            if invoice is None or invoice["balance_due"] <= 0:
+                return [], f"invoice {number} is not pending"
+            if amount > invoice["balance_due"]:
+                return [], f"amount {line['amount']} exceeds the balance {Money(invoice['balance_due'])} of {number}"
+            return self._take([(invoice, amount)]), "reference"
+
+        gstin = self._client(_words(text))
+        candidates = self.by_client.get(gstin, []) if gstin else self.pending
+        exact = [inv for inv in candidates if inv["balance_due"] == amount]
+        if len(exact) == 1 or (gstin and exact):
+            return self._take([(exact[0], amount)]), "amount"
+        if len(exact) > 1:
+            return [], f"{len(exact)} pending invoices have a balance of {line['amount']}"
+
+        if gstin:
+            open_invoices = self._open(candidates)
+            if len(open_invoices) == 1 and amount <= open_invoices[0]["balance_due"]:
+                return self._take([(open_invoices[0], amount)]), "client"
+            if amount == sum(inv["balance_due"] for inv in open_invoices):
+                return self._take([(inv, inv["balance_due"]) for inv in open_invoices]), "client"
+            return [], f"client {gstin} has {len(open_invoices)} pending invoices; allocate manually"
+        return [], "no matching invoice or client"
@@ -0,0 +1,69 @@
+import logging
+from concurrent.futures import CancelledError
+from PySide6.QtCore import QObject, Signal, Qt
+from services.async_service import async_service
+
+# Delivers AsyncService results back on the Qt main thread.
+# Futures complete on worker threads; the dispatcher lives on the main thread,
+# so emitting its signal from a worker queues the callback into the event loop.
+
+class _MainThreadDispatcher(QObject):
+    deliver = Signal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.deliver.connect(self._call, Qt.QueuedConnection)
+
+    def _call(self, callback):
+        callback()
+
+_dispatcher = None
+
+def _get_dispatcher():
+    # Created lazily by the first UI call, i.e. on the main thread
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = _MainThreadDispatcher()
+    return _dispatcher
+
+def run_async(key, fn, *args, on_result=None, on_error=None, **kwargs):
+    """
+    Runs fn on a DB worker thread and calls on_result(value) or
+    on_error(exception) on the main thread. Results of requests superseded
+    by a newer one with the same key are dropped silently.
+    """
+    dispatcher = _get_dispatcher()
+    future = async_service.submit(key, fn, *args, **kwargs)
+
+    def finished(f):
+        if f.cancelled() or async_service.is_superseded(f):
+            return
+        try:
+            value = f.result()
+        except CancelledError:
+            return
+        except Exception as e:
+            if on_error:
+                on_error(e)
+            else:
+                logging.error(f"Background query '{key or fn.__name__}' failed: {e}")
+            return
+        if on_result:
+            on_result(value)
+
+    def done_callback(f):
+        dispatcher.deliver.emit(lambda: _guarded(finished, f))
+
+    future.add_done_callback(done_callback)
+    return future
+
+def cancel_async(key):
+    """Cancels the pending request under key; its callbacks will not run."""
+    async_service.cancel(key)
+
+def _guarded(callback, future):
+    try:
+        callback(future)
+    except RuntimeError as e:
+        # The widget that asked was closed/deleted before the result arrived
+        logging.debug(f"Dropped async result: {e}")
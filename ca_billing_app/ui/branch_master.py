@@ -6,6 +6,7 @@ from PySide6.QtGui import QAction
 from PySide6.QtCore import Slot, Qt
 from db.database import db_manager
 from services.fuzzy_match_service import FuzzyMatchService
+from ui.async_bridge import run_async, cancel_async
 
 class BranchMaster(QWidget):
     def __init__(self):
@@ -135,16 +136,24 @@ class BranchMaster(QWidget):
     @Slot(str)
     def check_similarity(self, text):
         if len(text) < 3:
+            # Drop any lookup still running for an earlier keystroke
+            cancel_async("branch_master.similar")
             self.suggestion_lbl.setText("")
             return
+        run_async("branch_master.similar", self.find_similar, text, on_result=self.show_similar)
+
+    def find_similar(self, text):
+        # Runs on a DB worker thread; each keystroke supersedes the last lookup
         conn = self.db.get_connection()
         try:
             rows = conn.execute("SELECT branch_name FROM branches").fetchall()
             existing = [r['branch_name'] for r in rows]
-            matches = self.fuzzy.get_similar_branches(text, existing)
-            self.suggestion_lbl.setText(f"Similar: {', '.join([m[0] for m in matches[:2]])}" if matches else "")
+            return self.fuzzy.get_similar_branches(text, existing)
         finally: conn.close()
 
+    def show_similar(self, matches):
+        self.suggestion_lbl.setText(f"Similar: {', '.join([m[0] for m in matches[:2]])}" if matches else "")
+
     def add_branch(self):
         name, city, bank = self.name_input.text().strip(), self.city_input.text().strip(), self.bank_name_input.text().strip()
         ifsc = self.ifsc_input.text().strip()
@@ -167,34 +176,41 @@ class BranchMaster(QWidget):
         except Exception as e: QMessageBox.critical(self, "Error", str(e))
         finally: conn.close()
 
-    def refresh_table(self):
-        self.table.setRowCount(0)
+    def fetch_branches(self):
+        # Runs on a DB worker thread
         conn = self.db.get_connection()
         try:
-            rows = conn.execute("SELECT * FROM branches ORDER BY bank_name").fetchall()
-            for r_idx, row in enumerate(rows):
-                self.table.insertRow(r_idx)
-                for c_idx, key in enumerate(['id', 'branch_name', 'city', 'bank_name', 'ifsc_code', 'account_number']):
-                    self.table.setItem(r_idx, c_idx, QTableWidgetItem(str(row[key])))
-                
-                actions_btn = QPushButton("Actions")
-                actions_btn.setStyleSheet("padding: 2px; background: #f8f9fa; border: 1px solid #ddd;")
-                
-                menu = QMenu(actions_btn)
-                edit_act = QAction("Edit", menu)
-                edit_act.triggered.connect(lambda checked=False, r=r_idx: self.load_for_editing(r))
-                
-                del_act = QAction("Delete", menu)
-                branch_id = row['id']
-                del_act.triggered.connect(lambda checked=False, i=branch_id: self.delete_branch(i))
-                
-                menu.addAction(edit_act)
-                menu.addAction(del_act)
-                actions_btn.setMenu(menu)
-                # Action column is 6
-                self.table.setCellWidget(r_idx, 6, actions_btn)
+            return [dict(row) for row in conn.execute("SELECT * FROM branches ORDER BY bank_name").fetchall()]
         finally: conn.close()
 
+    def refresh_table(self):
+        run_async("branch_master.refresh", self.fetch_branches, on_result=self.populate_table,
+                  on_error=lambda e: QMessageBox.critical(self, "Error", str(e)))
+
+    def populate_table(self, rows):
+        self.table.setRowCount(0)
+        for r_idx, row in enumerate(rows):
+            self.table.insertRow(r_idx)
+            for c_idx, key in enumerate(['id', 'branch_name', 'city', 'bank_name', 'ifsc_code', 'account_number']):
+                self.table.setItem(r_idx, c_idx, QTableWidgetItem(str(row[key])))
+            
+            actions_btn = QPushButton("Actions")
+            actions_btn.setStyleSheet("padding: 2px; background: #f8f9fa; border: 1px solid #ddd;")
+            
+            menu = QMenu(actions_btn)
+            edit_act = QAction("Edit", menu)
+            edit_act.triggered.connect(lambda checked=False, r=r_idx: self.load_for_editing(r))
+            
+            del_act = QAction("Delete", menu)
+            branch_id = row['id']
+            del_act.triggered.connect(lambda checked=False, i=branch_id: self.delete_branch(i))
+            
+            menu.addAction(edit_act)
+            menu.addAction(del_act)
+            actions_btn.setMenu(menu)
+            # Action column is 6
+            self.table.setCellWidget(r_idx, 6, actions_btn)
+
     def load_for_editing(self, row):
         self.current_id = self.table.item(row, 0).text()
         self.name_input.setText(self.table.item(row, 1).text())
@@ -5,7 +5,9 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QFormLayout,
 from PySide6.QtGui import QAction
 from PySide6.QtCore import Qt
 from db.database import db_manager
+from services.invoice_cache import invoice_detail_cache
 from utils.validators import validate_gstin
+from ui.async_bridge import run_async
 
 class ClientMaster(QWidget):
     def __init__(self):
@@ -174,40 +176,49 @@ class ClientMaster(QWidget):
                 conn.execute("INSERT INTO clients VALUES (?, ?, ?, ?, ?)", 
                              (gstin, name, address, email, phone))
             conn.commit()
+            # Cached invoice details embed the client
+            invoice_detail_cache.clear()
             self.clear_form()
             self.refresh_table()
         except Exception as e: QMessageBox.critical(self, "Error", str(e))
         finally: conn.close()
 
-    def refresh_table(self):
-        self.table.setRowCount(0)
+    def fetch_clients(self):
+        # Runs on a DB worker thread
         conn = self.db.get_connection()
         try:
-            rows = conn.execute("SELECT * FROM clients ORDER BY client_name").fetchall()
-            for r_idx, row in enumerate(rows):
-                self.table.insertRow(r_idx)
-                for c_idx, key in enumerate(['gstin', 'client_name', 'address', 'email', 'phone']):
-                    self.table.setItem(r_idx, c_idx, QTableWidgetItem(str(row[key])))
-                
-                # Actions Menu
-                actions_btn = QPushButton("Actions")
-                actions_btn.setStyleSheet("padding: 2px; background: #f8f9fa; border: 1px solid #ddd;")
-                
-                menu = QMenu(actions_btn)
-                edit_act = QAction("Edit", menu)
-                # Need to use row index for load_for_editing, but r_idx changes. 
-                # Safer to pass specific GSTIN or use a captured index correctly.
-                edit_act.triggered.connect(lambda checked=False, r=r_idx: self.load_for_editing(r))
-                
-                del_act = QAction("Delete", menu)
-                client_gstin = row['gstin']
-                del_act.triggered.connect(lambda checked=False, g=client_gstin: self.delete_client(g))
-                
-                menu.addAction(edit_act)
-                menu.addAction(del_act)
-                actions_btn.setMenu(menu)
-                self.table.setCellWidget(r_idx, 5, actions_btn)
+            return [dict(row) for row in conn.execute("SELECT * FROM clients ORDER BY client_name").fetchall()]
         finally: conn.close()
+
+    def refresh_table(self):
+        run_async("client_master.refresh", self.fetch_clients, on_result=self.populate_table,
+                  on_error=lambda e: QMessageBox.critical(self, "Error", str(e)))
+
+    def populate_table(self, rows):
+        self.table.setRowCount(0)
+        for r_idx, row in enumerate(rows):
+            self.table.insertRow(r_idx)
+            for c_idx, key in enumerate(['gstin', 'client_name', 'address', 'email', 'phone']):
+                self.table.setItem(r_idx, c_idx, QTableWidgetItem(str(row[key])))
+            
+            # Actions Menu
+            actions_btn = QPushButton("Actions")
+            actions_btn.setStyleSheet("padding: 2px; background: #f8f9fa; border: 1px solid #ddd;")
+            
+            menu = QMenu(actions_btn)
+            edit_act = QAction("Edit", menu)
+            # Need to use row index for load_for_editing, but r_idx changes. 
+            # Safer to pass specific GSTIN or use a captured index correctly.
+            edit_act.triggered.connect(lambda checked=False, r=r_idx: self.load_for_editing(r))
+            
+            del_act = QAction("Delete", menu)
+            client_gstin = row['gstin']
+            del_act.triggered.connect(lambda checked=False, g=client_gstin: self.delete_client(g))
+            
+            menu.addAction(edit_act)
+            menu.addAction(del_act)
+            actions_btn.setMenu(menu)
+            self.table.setCellWidget(r_idx, 5, actions_btn)
         self.filter_table(self.search_input.text())
 
     def load_for_editing(self, row):
@@ -227,6 +238,7 @@ class ClientMaster(QWidget):
             try:
                 conn.execute("DELETE FROM clients WHERE gstin=?", (gstin,))
                 conn.commit()
+                invoice_detail_cache.clear()
                 self.refresh_table()
                 if self.current_gstin == gstin: self.clear_form()
             finally: conn.close()
@@ -9,8 +9,15 @@ from PySide6.QtCore import QUrl
 from db.database import db_manager
 from services.invoice_service import InvoiceService
 from pdf.invoice_pdf import InvoicePDFGenerator
+from utils.money import Money
+from utils.tax_engine import compute_invoice
+from ui.async_bridge import run_async
 import datetime
 
+ACTIVE_OFFICES_QUERY = "SELECT id, firm_name, address, gstin, pan FROM offices WHERE is_active = 1"
+CLIENTS_QUERY = "SELECT gstin, client_name FROM clients"
+BANKS_QUERY = "SELECT DISTINCT bank_name FROM branches ORDER BY bank_name"
+
 class InvoiceForm(QWidget):
     invoice_processed = Signal()
     
@@ -22,9 +29,6 @@ class InvoiceForm(QWidget):
         self.is_update_mode = is_update_mode
         self.editing_invoice_id = None  # Track which invoice we're editing
         
-        # Runtime Schema Check
-        self.check_db_schema()
-        
         # Create outer scroll area for entire form
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(0, 0, 0, 0)
@@ -163,12 +167,12 @@ class InvoiceForm(QWidget):
         bank_hbox.addWidget(self.branch_combo)
         mid_layout.addWidget(bank_group, 7)
 
-        # Dummy Invoice logic (If Create Mode)
+        # Skip/reserve a number (If Create Mode)
         if not is_update_mode:
-            dummy_group = QGroupBox("Generate Dummy Invoice")
+            dummy_group = QGroupBox("Skip Invoice Number")
             dummy_group.setStyleSheet("font-weight: bold; color: #34495E;")
             dummy_vbox = QVBoxLayout(dummy_group)
-            self.skip_number_btn = QPushButton("Generate Dummy/Placeholder")
+            self.skip_number_btn = QPushButton("Reserve Next Number")
             self.skip_number_btn.setStyleSheet("""
                 QPushButton {
                     background-color: #E67E22; 
@@ -266,38 +270,35 @@ class InvoiceForm(QWidget):
         self.load_offices()
         self.load_clients()
 
-    def check_db_schema(self):
-        conn = self.db.get_connection()
-        try:
-            # Check for place_of_supply
-            cursor = conn.execute("PRAGMA table_info(invoices)")
-            cols = [row['name'] for row in cursor.fetchall()]
-            if 'place_of_supply' not in cols:
-                QMessageBox.critical(self, "Critical Error", 
-                    f"Database Schema Mismatch!\n\n"
-                    f"Connected to: {self.db.db_path}\n"
-                    f"Column 'place_of_supply' is MISSING.\n\n"
-                    "Please close this app and run 'python3 fix_db.py' again."
-                )
-        except Exception as e:
-             print(f"Schema check failed: {e}")
-        finally:
-            conn.close()
-        
-
-        
     def showEvent(self, event):
         # Auto-refresh dropdowns when tab is switched to
         # ONLY if we are NOT currently editing an invoice (to prevent wiping out loaded data)
+        # Loaded on a DB worker thread so switching tabs never waits on SQLite
         if not self.editing_invoice_id:
-            self.load_offices()
-            self.load_clients()
-            self.load_banks()
+            run_async("invoice_form.dropdowns", self.fetch_dropdown_data, on_result=self.apply_dropdown_data)
         super().showEvent(event)
+
+    def fetch_dropdown_data(self):
+        # Runs on a DB worker thread
+        conn = self.db.get_connection()
+        try:
+            return {
+                "offices": [dict(r) for r in conn.execute(ACTIVE_OFFICES_QUERY).fetchall()],
+                "clients": [dict(r) for r in conn.execute(CLIENTS_QUERY).fetchall()],
+                "banks": [r['bank_name'] for r in conn.execute(BANKS_QUERY).fetchall()],
+            }
+        finally:
+            conn.close()
+
+    def apply_dropdown_data(self, data):
+        # An invoice may have been opened for editing while the data loaded
+        if self.editing_invoice_id:
+            return
+        self.fill_banks(data["banks"])
+        self.fill_offices(data["offices"])
+        self.fill_clients(data["clients"])
         
     def load_offices(self):
-        self.office_combo.blockSignals(True)
-        self.office_combo.clear()
         conn = self.db.get_connection()
         try:
             # Check if offices exist, if not create default
@@ -309,7 +310,15 @@ class InvoiceForm(QWidget):
                 """)
                 conn.commit()
                 
-            rows = conn.execute("SELECT id, firm_name, address, gstin, pan FROM offices WHERE is_active = 1").fetchall()
+            rows = conn.execute(ACTIVE_OFFICES_QUERY).fetchall()
+        finally:
+            conn.close()
+        self.fill_offices(rows)
+
+    def fill_offices(self, rows):
+        self.office_combo.blockSignals(True)
+        self.office_combo.clear()
+        try:
             self.office_data = {} # Map ID to full details
             for row in rows:
                 self.office_combo.addItem(row['firm_name'], row['id'])
@@ -322,7 +331,6 @@ class InvoiceForm(QWidget):
                     'display_text': f"{row['firm_name']}\n{row['address']}\nGSTIN: {row['gstin']} | PAN: {row['pan']}"
                 }
         finally:
-            conn.close()
             self.office_combo.blockSignals(False)
             self.on_office_changed()
 
@@ -358,18 +366,21 @@ class InvoiceForm(QWidget):
                 if idx >= 0: self.tax_combo.setCurrentIndex(idx)
             self.tax_combo.blockSignals(False)
     def load_clients(self):
-        self.client_combo.clear()
         conn = self.db.get_connection()
         try:
-            rows = conn.execute("SELECT gstin, client_name FROM clients").fetchall()
-            for row in rows:
-                self.client_combo.addItem(f"{row['gstin']} - {row['client_name']}", row['gstin'])
+            rows = conn.execute(CLIENTS_QUERY).fetchall()
         finally:
             conn.close()
-            # Default to no selection so user can search
-            self.client_combo.blockSignals(True)
-            self.client_combo.setCurrentIndex(-1)
-            self.client_combo.blockSignals(False)
+        self.fill_clients(rows)
+
+    def fill_clients(self, rows):
+        self.client_combo.clear()
+        for row in rows:
+            self.client_combo.addItem(f"{row['gstin']} - {row['client_name']}", row['gstin'])
+        # Default to no selection so user can search
+        self.client_combo.blockSignals(True)
+        self.client_combo.setCurrentIndex(-1)
+        self.client_combo.blockSignals(False)
             
     def add_item_row(self):
         rc = self.items_table.rowCount()
@@ -394,7 +405,7 @@ class InvoiceForm(QWidget):
             
             if desc and amt: # Minimal validation
                 try:
-                    amount_val = float(amt.text())
+                    amount_val = Money.from_rupees(amt.text())
                     rate_val = float(rate.text()) if rate else 0
                     if rate_val not in [0, 5, 12, 18]:
                          QMessageBox.warning(self, "Error", f"Invalid GST Rate at row {i+1}. Allowed: 0, 5, 12, 18")
@@ -420,32 +431,27 @@ class InvoiceForm(QWidget):
             return
             
         tax_type = self.tax_combo.currentText()
-        taxable = 0.0
-        tax_amt = 0.0
-        
-        for item in items:
-            taxable += item['amount']
-            rate = item['gst_rate']
-            if tax_type != 'NONE':
-                tax_amt += item['amount'] * (rate / 100.0)
-                
-        total = taxable + tax_amt
+        tax = compute_invoice(items, tax_type)
+        taxable, tax_amt, total = tax.taxable, tax.tax, tax.grand_total
         self.totals_label.setText(f"Taxable: {taxable:.2f} | Tax: {tax_amt:.2f} | Grand Total: {total:.2f}")
         return taxable, tax_amt, total
 
     def load_banks(self):
-        self.bank_combo.blockSignals(True)
-        self.bank_combo.clear()
         conn = self.db.get_connection()
         try:
             # Get distinct bank names
-            rows = conn.execute("SELECT DISTINCT bank_name FROM branches ORDER BY bank_name").fetchall()
-            self.bank_combo.addItem("Select Bank", "")
-            for row in rows:
-                self.bank_combo.addItem(row['bank_name'], row['bank_name'])
+            banks = [row['bank_name'] for row in conn.execute(BANKS_QUERY).fetchall()]
         finally:
             conn.close()
-            self.bank_combo.blockSignals(False)
+        self.fill_banks(banks)
+
+    def fill_banks(self, banks):
+        self.bank_combo.blockSignals(True)
+        self.bank_combo.clear()
+        self.bank_combo.addItem("Select Bank", "")
+        for bank in banks:
+            self.bank_combo.addItem(bank, bank)
+        self.bank_combo.blockSignals(False)
 
     def load_bank_cities(self, bank_name):
         self.city_combo.blockSignals(True)
@@ -538,13 +544,14 @@ class InvoiceForm(QWidget):
                 # --- UPDATE MODE ---
                 inv_id = self.editing_invoice_id
                 
-                # 1. Get current details for archival
-                conn = self.db.get_connection()
-                try:
-                    old_inv = conn.execute("SELECT invoice_number, pdf_path FROM invoices WHERE id=?", (inv_id,)).fetchone()
-                    invoice_number = old_inv['invoice_number']
-                    old_pdf_path = old_inv['pdf_path']
-                    
+                # 1. Save the edit (only changed items are written)
+                invoice_number, pdf_outdated = self.invoice_service.update_invoice(
+                    inv_id, client_gstin, office_id, date_str, items, tax_type, allotted_details=allotted
+                )
+                inv_details = self.invoice_service.get_invoice_details(inv_id)
+                old_pdf_path = inv_details['invoice']['pdf_path']
+
+                if pdf_outdated:
                     # 2. Archive existing PDF if it exists
                     if old_pdf_path and os.path.exists(old_pdf_path):
                         desktop = os.path.join(os.path.expanduser("~"), "Desktop")
@@ -562,52 +569,12 @@ class InvoiceForm(QWidget):
                         except Exception as e:
                             print(f"Archival failed: {e}")
 
-                    # 3. Update DB Record (Recalculate totals)
-                    taxable_total = sum(float(item['amount']) for item in items)
-                    cgst_total = sgst_total = igst_total = 0.0
-                    for item in items:
-                        amt = float(item['amount'])
-                        rate = float(item['gst_rate'])
-                        tax_val = amt * (rate / 100.0)
-                        if tax_type == 'IGST':
-                            igst_total += tax_val
-                        elif tax_type == 'CGST_SGST':
-                            cgst_total += tax_val / 2
-                            sgst_total += tax_val / 2
-                    
-                    grand_total = taxable_total + cgst_total + sgst_total + igst_total
-                    
-                    conn.execute("""
-                        UPDATE invoices SET 
-                            client_gstin=?, office_id=?, invoice_date=?, tax_type=?,
-                            taxable_value=?, cgst_amount=?, sgst_amount=?, igst_amount=?, grand_total=?,
-                            allotted_bank=?, allotted_branch=?, allotted_city=?, place_of_supply=?,
-                            status = CASE WHEN status = 'Cancelled' THEN 'Generated' ELSE status END
-                        WHERE id=?
-                    """, (client_gstin, office_id, date_str, tax_type, taxable_total, cgst_total, 
-                          sgst_total, igst_total, grand_total, bank, branch, city, allotted['pos'], inv_id))
-                    
-                    # 4. Update items
-                    conn.execute("DELETE FROM invoice_items WHERE invoice_id=?", (inv_id,))
-                    for item in items:
-                        conn.execute("""
-                            INSERT INTO invoice_items (invoice_id, description, hsn_code, amount, gst_rate)
-                            VALUES (?, ?, ?, ?, ?)
-                        """, (inv_id, item['description'], item['hsn_code'], item['amount'], item['gst_rate']))
-                    
-                    conn.commit()
-                finally:
-                    conn.close()
-                
-                # 5. Regenerate PDF
-                inv_details = self.invoice_service.get_invoice_details(inv_id)
-                pdf_path = self.pdf_generator.generate(inv_details)
-                
-                # Update path in DB
-                conn = self.db.get_connection()
-                conn.execute("UPDATE invoices SET pdf_path=? WHERE id=?", (pdf_path, inv_id))
-                conn.commit()
-                conn.close()
+                    # 3. Regenerate PDF
+                    pdf_path = self.pdf_generator.generate(inv_details)
+                    self.invoice_service.set_pdf_path(inv_id, pdf_path)
+                else:
+                    # Nothing printed changed: the existing PDF is still right
+                    pdf_path = old_pdf_path
                 
                 # Reset editing state
                 self.editing_invoice_id = None
@@ -625,10 +592,7 @@ class InvoiceForm(QWidget):
                 pdf_path = self.pdf_generator.generate(inv_details)
                 
                 # Save PDF path to DB
-                conn = self.db.get_connection()
-                conn.execute("UPDATE invoices SET pdf_path = ? WHERE id = ?", (pdf_path, inv_id))
-                conn.commit()
-                conn.close()
+                self.invoice_service.set_pdf_path(inv_id, pdf_path)
                 success_msg = f"Invoice {invoice_number} Generated Successfully!"
             
             # --- Common Post-Processing (Downloads & Opening) ---
@@ -675,17 +639,18 @@ class InvoiceForm(QWidget):
             QMessageBox.critical(self, "Error", f"Error creating invoice: {str(e)}")
     
     def skip_invoice_number(self):
-        """Skip the next invoice number by creating a dummy 'Cancelled' invoice"""
+        """Skip the next invoice number by recording it as reserved"""
         try:
             # Get what the next invoice number would be
             date_obj = self.date_edit.date().toPython()
-            next_invoice_num, next_serial = self.invoice_service.generate_invoice_number(date_obj)
+            next_invoice_num, _ = self.invoice_service.generate_invoice_number(date_obj)
             
             reply = QMessageBox.question(
                 self, 
-                "Generate Dummy Invoice", 
-                f"This will generate a dummy invoice for number:\n{next_invoice_num}\n\n"
-                f"A placeholder 'Cancelled' invoice will be created to maintain the sequence.\n\n"
+                "Skip Invoice Number", 
+                f"This will reserve invoice number:\n{next_invoice_num}\n\n"
+                f"The number is kept out of the sequence (no invoice is created) "
+                f"and can still be used later as a manual invoice number.\n\n"
                 f"Continue?",
                 QMessageBox.Yes | QMessageBox.No
             )
@@ -693,52 +658,14 @@ class InvoiceForm(QWidget):
             if reply == QMessageBox.No:
                 return
             
-            # Create a dummy cancelled invoice to reserve the number
-            conn = self.db.get_connection()
-            
-            # Get required data
-            office_id = self.office_combo.currentData() or 1
-            client_gstin = "SKIP00000000000"  # Dummy GSTIN
-            
-            # Check if dummy client exists, if not create it
-            existing = conn.execute("SELECT gstin FROM clients WHERE gstin=?", (client_gstin,)).fetchone()
-            if not existing:
-                conn.execute(
-                    "INSERT INTO clients (gstin, client_name, address) VALUES (?, ?, ?)",
-                    (client_gstin, "SKIPPED INVOICE", "N/A")
-                )
-            
-            fy = self.invoice_service.get_financial_year(date_obj)
-            month_str = date_obj.strftime("%m")
-            date_str = date_obj.strftime("%Y-%m-%d")
-            
-            # Insert dummy invoice with Cancelled status
-            cursor = conn.execute("""
-                INSERT INTO invoices (
-                    invoice_number, invoice_date, financial_year, month_str, serial_number,
-                    client_gstin, office_id, tax_type, taxable_value, cgst_amount, sgst_amount,
-                    igst_amount, grand_total, status, place_of_supply
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                next_invoice_num, date_str, fy, month_str, next_serial,
-                client_gstin, office_id, 'NONE', 0.0, 0.0, 0.0, 0.0, 0.0,
-                'Cancelled', 'N/A'
-            ))
-            
-            # Get the invoice ID and add a placeholder item
-            invoice_id = cursor.lastrowid
-            conn.execute("""
-                INSERT INTO invoice_items (invoice_id, description, hsn_code, amount, gst_rate)
-                VALUES (?, ?, ?, ?, ?)
-            """, (invoice_id, "PLACEHOLDER - Invoice number reserved for future use", "", 0.0, 0))
-            
-            conn.commit()
-            conn.close()
+            # The number is taken inside the write transaction (it may differ
+            # from the preview if another invoice was created meanwhile)
+            reserved_num = self.invoice_service.reserve_invoice_number(date_obj, reason="Skipped")
             
             QMessageBox.information(
                 self, 
                 "Success", 
-                f"Dummy invoice number {next_invoice_num} has been generated.\n\n"
+                f"Invoice number {reserved_num} has been reserved.\n\n"
                 f"Next invoice will be: {self.get_next_invoice_preview()}"
             )
             
@@ -756,16 +683,14 @@ class InvoiceForm(QWidget):
     
     def load_invoice_for_edit(self, invoice_id):
         """Load an existing invoice for editing"""
-        conn = self.db.get_connection()
         try:
-            # Fetch invoice data
-            invoice = conn.execute("SELECT * FROM invoices WHERE id=?", (invoice_id,)).fetchone()
-            if not invoice:
+            # Fetch invoice data and items (one query)
+            details = self.invoice_service.get_invoice_details(invoice_id)
+            if not details:
                 QMessageBox.warning(self, "Error", "Invoice not found")
                 return
-            
-            # Fetch invoice items
-            items = conn.execute("SELECT * FROM invoice_items WHERE invoice_id=? ORDER BY id", (invoice_id,)).fetchall()
+            invoice = details['invoice']
+            items = details['items']
             
             # Store the invoice ID we're editing
             self.editing_invoice_id = invoice_id
@@ -862,6 +787,4 @@ class InvoiceForm(QWidget):
             
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load invoice: {str(e)}")
-        finally:
-            conn.close()
 
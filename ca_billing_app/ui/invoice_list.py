@@ -5,7 +5,11 @@ from PySide6.QtCore import Qt
 from PySide6.QtGui import QAction, QColor, QBrush
 from db.database import db_manager
 from services.payment_service import PaymentService
+from services.invoice_service import InvoiceService
+from utils.money import Money
+from ui.async_bridge import run_async
 import datetime
+import logging
 
 class PaymentDialog(QDialog):
     def __init__(self, parent=None):
@@ -48,8 +52,8 @@ class PaymentDialog(QDialog):
         
     def validate_and_accept(self):
         try:
-            amt = float(self.amount_input.text())
-            if amt <= 0:
+            amt = Money.from_rupees(self.amount_input.text())
+            if amt.paise <= 0:
                 raise ValueError("Amount must be positive.")
                 
             self.data = {
@@ -62,11 +66,140 @@ class PaymentDialog(QDialog):
         except ValueError:
             QMessageBox.warning(self, "Invalid Input", "Please enter a valid amount.")
 
+class ClientPaymentDialog(QDialog):
+    """One receipt (e.g. a bank NEFT) spread over several invoices of a client."""
+    def __init__(self, payment_service, parent=None):
+        super().__init__(parent)
+        self.payment_service = payment_service
+        self.setWindowTitle("Client Payment (Multiple Invoices)")
+        self.resize(750, 500)
+        self.layout = QVBoxLayout(self)
+        
+        form_layout = QFormLayout()
+        
+        # Client (only those with something outstanding)
+        self.client_combo = QComboBox()
+        for c in self.payment_service.get_clients_with_balance():
+            self.client_combo.addItem(f"{c['client_name']} ({c['gstin']}) - {c['open_invoices']} open, ₹{c['balance_due']:.2f}", c['gstin'])
+        self.client_combo.currentIndexChanged.connect(self.load_open_invoices)
+        form_layout.addRow("Client:", self.client_combo)
+        
+        self.date_edit = QDateEdit()
+        self.date_edit.setCalendarPopup(True)
+        self.date_edit.setDate(datetime.date.today())
+        form_layout.addRow("Payment Date:", self.date_edit)
+        
+        self.amount_input = QLineEdit()
+        self.amount_input.setPlaceholderText("0.00")
+        self.amount_input.textChanged.connect(self.auto_allocate)
+        form_layout.addRow("Amount Received:", self.amount_input)
+        
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems(["NEFT", "UPI", "CHEQUE", "CASH", "IMPS", "TDS", "OTHERS"])
+        form_layout.addRow("Mode:", self.mode_combo)
+        
+        self.ref_input = QLineEdit()
+        self.ref_input.setPlaceholderText("Transaction ID / Cheque No / Notes")
+        form_layout.addRow("Reference/Notes:", self.ref_input)
+        
+        self.layout.addLayout(form_layout)
+        
+        # Open invoices; the Allocate column is filled oldest first and can be edited
+        self.table = QTableWidget()
+        self.table.setColumnCount(4)
+        self.table.setHorizontalHeaderLabels(["Invoice No", "Date", "Balance", "Allocate"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.itemChanged.connect(self.update_allocated_label)
+        self.layout.addWidget(self.table)
+        
+        self.allocated_label = QLabel("Allocated: 0.00 of 0.00")
+        self.layout.addWidget(self.allocated_label)
+        
+        btns = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        btns.accepted.connect(self.save)
+        btns.rejected.connect(self.reject)
+        self.layout.addWidget(btns)
+        
+        self.open_invoices = []
+        self.allocated = None
+        self.load_open_invoices()
+        
+    def load_open_invoices(self):
+        gstin = self.client_combo.currentData()
+        self.open_invoices = self.payment_service.get_open_invoices(gstin) if gstin else []
+        self.table.blockSignals(True)
+        self.table.setRowCount(len(self.open_invoices))
+        for i, inv in enumerate(self.open_invoices):
+            for col, text in enumerate([inv['invoice_number'], str(inv['invoice_date']), f"{inv['balance_due']:.2f}"]):
+                item = QTableWidgetItem(text)
+                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+                self.table.setItem(i, col, item)
+            self.table.setItem(i, 3, QTableWidgetItem(""))
+        self.table.blockSignals(False)
+        self.auto_allocate()
+        
+    def auto_allocate(self):
+        """Fills the Allocate column oldest invoice first (FIFO)."""
+        try:
+            left = Money.from_rupees(self.amount_input.text())
+        except ValueError:
+            left = Money(0)
+        self.table.blockSignals(True)
+        for i, inv in enumerate(self.open_invoices):
+            part = min(left, inv['balance_due']) if left.paise > 0 else Money(0)
+            self.table.item(i, 3).setText(f"{part:.2f}" if part.paise else "")
+            left = left - part
+        self.table.blockSignals(False)
+        self.update_allocated_label()
+        
+    def allocations(self):
+        """{invoice_id: Money} from the Allocate column (ValueError on bad input)."""
+        split = {}
+        for i, inv in enumerate(self.open_invoices):
+            part = Money.from_rupees(self.table.item(i, 3).text())
+            if part.paise:
+                split[inv['id']] = part
+        return split
+        
+    def update_allocated_label(self, *_):
+        try:
+            amount = Money.from_rupees(self.amount_input.text())
+            allocated = Money(sum(m.paise for m in self.allocations().values()))
+            self.allocated_label.setText(f"Allocated: {allocated:.2f} of {amount:.2f}")
+        except ValueError:
+            self.allocated_label.setText("Allocated: invalid amount")
+        
+    def save(self):
+        try:
+            amount = Money.from_rupees(self.amount_input.text())
+            split = self.allocations()
+        except ValueError:
+            QMessageBox.warning(self, "Invalid Input", "Please enter valid amounts.")
+            return
+        if not split:
+            QMessageBox.warning(self, "Invalid Input", "Nothing allocated.")
+            return
+        try:
+            self.allocated = self.payment_service.allocate_payment(
+                self.client_combo.currentData(),
+                amount,
+                self.date_edit.date().toPython(),
+                self.mode_combo.currentText(),
+                self.ref_input.text().strip(),
+                allocations=split
+            )
+            self.accept()
+        except ValueError as e:
+            QMessageBox.warning(self, "Validation Error", str(e))
+        except Exception as e:
+            QMessageBox.critical(self, "Error", str(e))
+
 class InvoiceList(QWidget):
     def __init__(self):
         super().__init__()
         self.db = db_manager
         self.payment_service = PaymentService()
+        self.invoice_service = InvoiceService()
         self.layout = QVBoxLayout(self)
         
         # Search Bar
@@ -81,6 +214,11 @@ class InvoiceList(QWidget):
         self.refresh_btn.clicked.connect(self.load_invoices)
         search_layout.addWidget(self.refresh_btn)
         
+        self.client_payment_btn = QPushButton("Client Payment")
+        self.client_payment_btn.setToolTip("Record one receipt covering several invoices of a client")
+        self.client_payment_btn.clicked.connect(self.open_client_payment_dialog)
+        search_layout.addWidget(self.client_payment_btn)
+        
         self.layout.addLayout(search_layout)
         
         self.table = QTableWidget()
@@ -93,27 +231,16 @@ class InvoiceList(QWidget):
         self.load_invoices()
         
     def load_invoices(self):
-        conn = self.db.get_connection()
-        try:
-            # Join with invoice_items to get descriptions for search
-            # We group cat description to avoid duplicate rows
-            query = """
-                SELECT i.id, i.invoice_number, i.invoice_date, c.client_name, i.grand_total, i.status,
-                       GROUP_CONCAT(it.description, ', ') as descriptions
-                FROM invoices i
-                JOIN clients c ON i.client_gstin = c.gstin
-                LEFT JOIN invoice_items it ON i.id = it.invoice_id
-                GROUP BY i.id
-                ORDER BY i.created_at DESC
-            """
-            rows = conn.execute(query).fetchall()
-            self.all_rows = [dict(row) for row in rows]
-            self.filter_invoices()
-                
-        except Exception as e:
-            print(e)
-        finally:
-            conn.close()
+        run_async("invoice_list.load", self.invoice_service.list_invoices,
+                  on_result=self.on_invoices_loaded, on_error=self.on_invoices_error)
+
+    def on_invoices_loaded(self, rows):
+        self.all_rows = rows
+        self.filter_invoices()
+
+    def on_invoices_error(self, error):
+        logging.error(f"Loading invoices failed: {error}")
+        QMessageBox.critical(self, "Error", f"Could not load invoices: {error}")
 
     def filter_invoices(self):
         text = self.search_input.text().lower().strip()
@@ -205,6 +332,13 @@ class InvoiceList(QWidget):
             except Exception as e:
                 QMessageBox.critical(self, "Error", str(e))
 
+    def open_client_payment_dialog(self):
+        dlg = ClientPaymentDialog(self.payment_service, self)
+        if dlg.exec() and dlg.allocated:
+            lines = "\n".join(f"{number}: ₹{part:.2f}" for _, number, part in dlg.allocated)
+            QMessageBox.information(self, "Success", f"Payment recorded against {len(dlg.allocated)} invoices:\n\n{lines}")
+            self.load_invoices()
+
     def view_history(self, invoice_id):
         payments = self.payment_service.get_payments_for_invoice(invoice_id)
         
@@ -289,6 +423,7 @@ class InvoiceList(QWidget):
             if ok and status:
                 conn.execute("UPDATE invoices SET status=? WHERE id=?", (status, invoice_id))
                 conn.commit()
+                self.invoice_service.invalidate([invoice_id])
                 QMessageBox.information(self, "Success", f"Status changed to: {status}")
                 self.load_invoices()
                 
@@ -5,9 +5,11 @@ import platform
 import shutil
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, 
                                QLineEdit, QPushButton, QMessageBox, QLabel, 
-                               QGroupBox, QScrollArea, QFrame, QFileDialog)
+                               QGroupBox, QScrollArea, QFrame, QFileDialog, QComboBox)
 from PySide6.QtCore import Qt, Slot
 from db.database import db_manager
+from services.invoice_cache import invoice_detail_cache
+from db.profiles import PROFILES, AUTO_PROFILE, get_sync_provider, describe_profile
 from config_manager import config_manager
 import subprocess
 
@@ -145,6 +147,27 @@ class OfficeMaster(QWidget):
         
         storage_layout.addLayout(path_layout)
         
+        # Performance profile (SQLite tuning applied to every connection)
+        profile_layout = QHBoxLayout()
+        profile_title = QLabel("⚙️ Performance Profile:")
+        profile_title.setStyleSheet("color: #2c3e50; font-weight: bold; font-size: 11px;")
+        
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItem("Auto (based on folder)", AUTO_PROFILE)
+        for name, profile in PROFILES.items():
+            self.profile_combo.addItem(profile['label'], name)
+        idx = self.profile_combo.findData(config_manager.get_db_profile())
+        self.profile_combo.setCurrentIndex(idx if idx >= 0 else 0)
+        self.profile_combo.currentIndexChanged.connect(self.change_db_profile)
+        
+        self.profile_lbl = QLabel("")
+        self.profile_lbl.setStyleSheet("color: #7f8c8d; font-size: 11px;")
+        
+        profile_layout.addWidget(profile_title)
+        profile_layout.addWidget(self.profile_combo)
+        profile_layout.addWidget(self.profile_lbl, 1)
+        storage_layout.addLayout(profile_layout)
+        
         self.main_layout.addWidget(storage_card)
         self.update_sync_status()
 
@@ -167,19 +190,32 @@ class OfficeMaster(QWidget):
         self.load_data()
 
     def update_sync_status(self):
-        path = config_manager.get_db_path().lower()
-        if "google drive" in path or "g:" in path or "googledrive" in path:
+        provider = get_sync_provider(config_manager.get_db_path())
+        if provider == "Google Drive":
             self.sync_status_lbl.setText("☁️ Google Drive Synced")
             self.sync_status_lbl.setStyleSheet("color: #3498DB; font-weight: bold; font-size: 11px;")
-        elif "onedrive" in path:
+        elif provider == "OneDrive":
             self.sync_status_lbl.setText("☁️ OneDrive Synced")
             self.sync_status_lbl.setStyleSheet("color: #0078D4; font-weight: bold; font-size: 11px;")
-        elif "dropbox" in path:
+        elif provider == "Dropbox":
             self.sync_status_lbl.setText("☁️ Dropbox Synced")
             self.sync_status_lbl.setStyleSheet("color: #0061FF; font-weight: bold; font-size: 11px;")
         else:
             self.sync_status_lbl.setText("💾 Local Storage")
             self.sync_status_lbl.setStyleSheet("color: #7f8c8d; font-size: 11px;")
+        self.update_profile_status()
+
+    def update_profile_status(self):
+        self.db.refresh_path()
+        self.profile_lbl.setText(f"Active: {describe_profile(self.db.profile_name)}")
+
+    def change_db_profile(self):
+        name = self.profile_combo.currentData()
+        try:
+            self.db.set_profile(name)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to switch profile: {e}")
+        self.update_profile_status()
 
     def change_db_location(self):
         new_dir = QFileDialog.getExistingDirectory(self, "Select Folder to Store Database", os.path.expanduser("~"))
@@ -196,7 +232,8 @@ class OfficeMaster(QWidget):
                                 f"Move your database to:\n{new_path}?\n\nThis will transfer all your current records.",
                                 QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
             try:
-                # 1. Close any existing connections by just letting them be handled by the next get_connection
+                # 1. Close pooled connections so the copy is taken from a quiet file
+                self.db.close()
                 # 2. Copy the file
                 if os.path.exists(old_path):
                     # Ensure destination directory exists
@@ -275,6 +312,8 @@ class OfficeMaster(QWidget):
                 QMessageBox.information(self, "Success", "Business profile saved.")
                 
             conn.commit()
+            # Cached invoice details embed the office
+            invoice_detail_cache.clear()
             self.clear_form()
             self.load_data()
         except Exception as e:
@@ -369,6 +408,7 @@ class OfficeMaster(QWidget):
             try:
                 conn.execute("UPDATE offices SET is_active=0 WHERE id=?", (office_id,))
                 conn.commit()
+                invoice_detail_cache.clear()
                 self.load_data()
                 if self.current_id == office_id: self.clear_form()
             finally: conn.close()
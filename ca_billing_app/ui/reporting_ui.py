@@ -1,11 +1,13 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QMessageBox, 
                                QFileDialog, QCheckBox, QDialog, QDialogButtonBox, QLabel,
                                QScrollArea, QHBoxLayout, QComboBox, QLineEdit, QTabWidget,
-                               QTableWidget, QTableWidgetItem, QGroupBox, QFrame, QGridLayout)
+                               QTableWidget, QTableWidgetItem, QGroupBox, QFrame, QGridLayout, QDateEdit)
 from PySide6.QtGui import QFont, QIcon
 from PySide6.QtCore import Qt
 from services.reporting_service import ReportingService
 from exports.excel_exporter import ExcelExporter
+from utils.money import export_row
+from ui.async_bridge import run_async
 import datetime
 
 class FieldSelectionDialog(QDialog):
@@ -156,6 +158,9 @@ class ReportingUI(QWidget):
         # --- TAB 3: Payment Received ---
         self.tabs.addTab(self.create_received_tab(), "Payment Received")
 
+        # --- TAB 4: Receivables Aging ---
+        self.tabs.addTab(self.create_aging_tab(), "Receivables Aging")
+
     def create_invoice_tab(self):
         tab = QWidget()
         layout = QVBoxLayout(tab)
@@ -319,6 +324,60 @@ class ReportingUI(QWidget):
         
         return tab
 
+    def create_aging_tab(self):
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(15)
+        
+        title = QLabel("Receivables Aging (0-30 / 31-60 / 61-90 / 90+ days)")
+        title.setStyleSheet("font-size: 18px; font-weight: bold; color: #8E44AD; margin-bottom: 5px;")
+        layout.addWidget(title)
+        
+        filter_group = QGroupBox("Aging Criteria")
+        filter_layout = QHBoxLayout(filter_group)
+        filter_layout.setContentsMargins(15, 20, 15, 15)
+        filter_layout.setSpacing(20)
+        
+        self.aging_group_filter = QComboBox()
+        self.aging_group_filter.addItem("Client", "client")
+        self.aging_group_filter.addItem("Allotted Bank", "bank")
+        self.aging_group_filter.addItem("Bank Branch", "branch")
+        
+        self.aging_date = QDateEdit()
+        self.aging_date.setCalendarPopup(True)
+        self.aging_date.setDate(datetime.date.today())
+        
+        self.aging_year_filter = QComboBox()
+        self.populate_fy_dropdown(self.aging_year_filter)
+        
+        self.run_aging_btn = QPushButton("View Aging")
+        self.run_aging_btn.clicked.connect(self.run_aging_report)
+        self.run_aging_btn.setStyleSheet(self.primary_btn_style)
+        
+        self.export_aging_btn = QPushButton("Download Report (XLSX)")
+        self.export_aging_btn.clicked.connect(self.export_aging_excel)
+        self.export_aging_btn.setEnabled(False)
+        self.export_aging_btn.setStyleSheet(self.success_btn_style)
+        
+        filter_layout.addWidget(QLabel("Group By:"))
+        filter_layout.addWidget(self.aging_group_filter)
+        filter_layout.addWidget(QLabel("As Of:"))
+        filter_layout.addWidget(self.aging_date)
+        filter_layout.addWidget(QLabel("Invoice FY:"))
+        filter_layout.addWidget(self.aging_year_filter)
+        filter_layout.addWidget(self.run_aging_btn)
+        filter_layout.addWidget(self.export_aging_btn)
+        filter_layout.addStretch()
+        
+        layout.addWidget(filter_group)
+        
+        self.aging_table = QTableWidget()
+        self.aging_table.setAlternatingRowColors(True)
+        layout.addWidget(self.aging_table)
+        
+        return tab
+
     def populate_fy_dropdown(self, combo):
         # Add last 3 FYs and current
         # Logic: Current Date -> Current FY. Add -1, -2.
@@ -342,9 +401,13 @@ class ReportingUI(QWidget):
         if month: filters['month'] = month
         if fy: filters['fy'] = fy
         
-        # Fetch data
-        self.inv_data = self.service.export_data(query_type="invoices", filters=filters, fields_to_export=[])
-        
+        # Fetch data off the UI thread; a newer run replaces an unfinished one.
+        # Detached: an FY or all-time load (the rows behind Export) is a long read
+        run_async("reports.invoices", self.service.export_data, query_type="invoices", filters=filters, fields_to_export=[],
+                  detached=True, on_result=self.show_invoice_report, on_error=self.show_report_error)
+
+    def show_invoice_report(self, data):
+        self.inv_data = data
         if not self.inv_data:
              self.inv_table.setRowCount(0)
              self.export_inv_btn.setEnabled(False)
@@ -360,7 +423,11 @@ class ReportingUI(QWidget):
         bank = self.bank_filter.text().strip() or None
         branch = self.branch_filter.text().strip() or None
         
-        self.pend_data = self.service.get_pending_payments(month=month, bank=bank, branch=branch, fy=fy)
+        run_async("reports.pending", self.service.get_pending_payments, month=month, bank=bank, branch=branch, fy=fy,
+                  on_result=self.show_pending_report, on_error=self.show_report_error)
+
+    def show_pending_report(self, data):
+        self.pend_data = data
         if not self.pend_data:
              self.pend_table.setRowCount(0)
              self.export_pend_btn.setEnabled(False)
@@ -374,7 +441,11 @@ class ReportingUI(QWidget):
         month = self.recv_month_filter.currentData()
         fy = self.recv_year_filter.currentData()
         
-        self.recv_data = self.service.get_received_payments(month=month, fy=fy)
+        run_async("reports.received", self.service.get_received_payments, month=month, fy=fy,
+                  on_result=self.show_received_report, on_error=self.show_report_error)
+
+    def show_received_report(self, data):
+        self.recv_data = data
         if not self.recv_data:
             self.recv_table.setRowCount(0)
             self.export_recv_btn.setEnabled(False)
@@ -384,6 +455,25 @@ class ReportingUI(QWidget):
         self.populate_table(self.recv_table, self.recv_data)
         self.export_recv_btn.setEnabled(True)
 
+    def run_aging_report(self):
+        run_async("reports.aging", self.service.get_aging, group_by=self.aging_group_filter.currentData(),
+                  as_of=self.aging_date.date().toPython(), fy=self.aging_year_filter.currentData(),
+                  on_result=self.show_aging_report, on_error=self.show_report_error)
+
+    def show_aging_report(self, data):
+        self.aging_data = data
+        if not self.aging_data:
+            self.aging_table.setRowCount(0)
+            self.export_aging_btn.setEnabled(False)
+            QMessageBox.information(self, "Info", "No outstanding balances found.")
+            return
+        
+        self.populate_table(self.aging_table, self.aging_data)
+        self.export_aging_btn.setEnabled(True)
+
+    def show_report_error(self, error):
+        QMessageBox.critical(self, "Error", f"Report failed: {error}")
+
     def populate_table(self, table, data):
         if not data: return
         headers = list(data[0].keys())
@@ -429,7 +519,7 @@ class ReportingUI(QWidget):
             # Filter Data
             filtered_data = []
             for row in self.inv_data:
-                 filtered_data.append({k: row[k] for k in selected_fields if k in row})
+                 filtered_data.append(export_row({k: row[k] for k in selected_fields if k in row}))
 
             # 2. Custom Filename (Save As)
             fy = self.inv_year_filter.currentData()
@@ -455,7 +545,7 @@ class ReportingUI(QWidget):
             if not final_path: return
             
             headers = list(self.pend_data[0].keys())
-            self.exporter.export_to_excel(self.pend_data, headers, final_path)
+            self.exporter.export_to_excel([export_row(r) for r in self.pend_data], headers, final_path)
             QMessageBox.information(self, "Success", f"Exported to:\n{final_path}")
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
@@ -471,7 +561,26 @@ class ReportingUI(QWidget):
             if not final_path: return
 
             headers = list(self.recv_data[0].keys())
-            self.exporter.export_to_excel(self.recv_data, headers, final_path)
+            self.exporter.export_to_excel([export_row(r) for r in self.recv_data], headers, final_path)
+            QMessageBox.information(self, "Success", f"Exported to:\n{final_path}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", str(e))
+
+    def export_aging_excel(self):
+        if not hasattr(self, 'aging_data') or not self.aging_data: return
+        try:
+            fy = self.aging_year_filter.currentData()
+            
+            default_path = self.get_export_path("Receivables_Aging", fy_str=fy)
+            final_path, _ = QFileDialog.getSaveFileName(self, "Save Report", default_path, "Excel Files (*.xlsx)")
+            if not final_path: return
+            
+            headers = list(self.aging_data[0].keys())
+            rows = [export_row(r) for r in self.aging_data]
+            # Firm-wide totals under the groups
+            totals = {h: round(sum(r[h] for r in rows), 2) for h in headers if isinstance(rows[0][h], (int, float))}
+            totals[headers[0]] = f"TOTAL (as of {self.aging_date.date().toPython():%d-%m-%Y})"
+            self.exporter.export_to_excel(rows + [totals], headers, final_path)
             QMessageBox.information(self, "Success", f"Exported to:\n{final_path}")
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import shutil
+import datetime
+import tempfile
+from db.database import DatabaseManager
+from services.invoice_service import InvoiceService
+
+# Throughput of create_invoices_bulk vs one create_invoice call per invoice,
+# on a throwaway database. Run from the app folder:
+#   python -m utils.benchmark_bulk_invoices [sizes...]   (default: 1000 10000)
+
+SINGLE_LIMIT = 1000  # the one-by-one baseline gets slow beyond this
+
+def make_specs(count, office_id, gstin):
+    date = datetime.date(2025, 4, 1)
+    return [{
+        "client_gstin": gstin,
+        "office_id": office_id,
+        "invoice_date": date,
+        "tax_type": "CGST_SGST",
+        "items": [
+            {"description": f"Concurrent audit, branch {i}", "hsn_code": "998221", "amount": "15000", "gst_rate": 18},
+            {"description": "Out of pocket expenses", "hsn_code": "998221", "amount": "1250.50", "gst_rate": 18},
+        ],
+        "allotted_details": {"bank": "SBI", "branch": f"Branch {i}", "city": "Delhi", "pos": "07-Delhi"},
+    } for i in range(count)]
+
+def run(sizes):
+    workdir = tempfile.mkdtemp(prefix="ankitaca-bench-")
+    try:
+        for size in sizes:
+            for mode in ("bulk", "single"):
+                if mode == "single" and size > SINGLE_LIMIT:
+                    continue
+                db = DatabaseManager(db_path=os.path.join(workdir, f"{mode}-{size}.db"))
+                with db.connection() as conn:
+                    office_id = conn.execute("""
+                        INSERT INTO offices (firm_name, address, gstin, pan)
+                        VALUES ('BENCH', 'Delhi', '07AAAAA0000A1Z5', 'AAAAA0000A')
+                    """).lastrowid
+                    conn.execute("INSERT INTO clients (gstin, client_name) VALUES ('07ABCDE1234F1Z5', 'Bench Bank')")
+                    conn.commit()
+                service = InvoiceService(db=db)
+                specs = make_specs(size, office_id, "07ABCDE1234F1Z5")
+
+                start = time.perf_counter()
+                if mode == "bulk":
+                    service.create_invoices_bulk(specs)
+                else:
+                    for spec in specs:
+                        service.create_invoice(spec["client_gstin"], spec["office_id"], spec["invoice_date"],
+                                               spec["items"], spec["tax_type"], allotted_details=spec["allotted_details"])
+                elapsed = time.perf_counter() - start
+                print(f"{mode:6s} {size:6d} invoices  {elapsed:7.2f} s  {size / elapsed:9.0f} invoices/s  ({db.profile_name})")
+                db.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or [1000, 10000])
@@ -0,0 +1,132 @@
+import sqlite3
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from functools import total_ordering
+
+# Money is stored in the database as INTEGER paise (schema v7), so SUM() and
+# comparisons in SQLite are exact. Money wraps those integers in Python.
+
+# Column names (including report aliases) that hold paise.
+MONEY_COLUMNS = {
+    "taxable_value", "cgst_amount", "sgst_amount", "igst_amount", "grand_total",
+    "amount", "amount_received", "amount_paid",
+    "total_received", "balance_due", "expected_balance",
+    "total_taxable", "total_cgst", "total_sgst", "total_igst", "total_revenue",
+    "days_0_30", "days_31_60", "days_61_90", "days_90_plus", "total_due",
+}
+
+PAISE = Decimal("0.01")
+
+@total_ordering
+class Money:
+    """An exact rupee amount held as integer paise."""
+    __slots__ = ("paise",)
+
+    def __init__(self, paise=0):
+        if isinstance(paise, Money):
+            paise = paise.paise
+        self.paise = int(paise or 0)
+
+    @classmethod
+    def from_rupees(cls, value):
+        """Accepts Money, int, float, Decimal or text like '1,234.50'. Rounds half-up to the paisa."""
+        if isinstance(value, Money):
+            return value
+        if value is None:
+            return cls(0)
+        if isinstance(value, str):
+            value = value.replace(",", "").replace("₹", "").strip() or "0"
+        try:
+            amount = Decimal(str(value))
+        except InvalidOperation:
+            raise ValueError(f"Invalid amount: {value!r}")
+        return cls(int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)))
+
+    @property
+    def rupees(self):
+        return (Decimal(self.paise) / 100).quantize(PAISE)
+
+    def percent(self, rate):
+        """rate% of this amount, rounded half-up to the paisa."""
+        share = Decimal(self.paise) * Decimal(str(rate)) / 100
+        return Money(int(share.quantize(Decimal(1), rounding=ROUND_HALF_UP)))
+
+    def __add__(self, other):
+        if isinstance(other, Money):
+            return Money(self.paise + other.paise)
+        if other == 0:
+            return self
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Money):
+            return Money(self.paise - other.paise)
+        return NotImplemented
+
+    def __neg__(self):
+        return Money(-self.paise)
+
+    def _other_paise(self, other):
+        """
+        Paise of a comparison operand. Plain 0 means zero in any unit (old
+        'amount == 0' checks keep working); other plain numbers are ambiguous
+        (rupees or paise?) and raise TypeError instead of comparing unequal.
+        """
+        if isinstance(other, Money):
+            return other.paise
+        if isinstance(other, (int, float, Decimal)):
+            if other == 0:
+                return 0
+            raise TypeError(f"Compare Money with Money, not {other!r} (use Money.from_rupees)")
+        return None
+
+    def __eq__(self, other):
+        paise = self._other_paise(other)
+        if paise is None:
+            return NotImplemented
+        return self.paise == paise
+
+    def __lt__(self, other):
+        paise = self._other_paise(other)
+        if paise is None:
+            return NotImplemented
+        return self.paise < paise
+
+    def __hash__(self):
+        return hash(self.paise)
+
+    def __bool__(self):
+        return self.paise != 0
+
+    def __float__(self):
+        return self.paise / 100.0
+
+    def __round__(self, ndigits=None):
+        """round(money) gives whole rupees (half-up), as printed on invoices."""
+        if ndigits is None:
+            return int(self.rupees.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+        return float(self.rupees.quantize(Decimal(1).scaleb(-ndigits), rounding=ROUND_HALF_UP))
+
+    def __format__(self, spec):
+        return format(self.rupees, spec or ".2f")
+
+    def __str__(self):
+        return f"{self.rupees:.2f}"
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+# Money parameters are written as their paise integer
+sqlite3.register_adapter(Money, lambda m: m.paise)
+
+def money_row(row):
+    """dict(row) with every paise column wrapped in Money."""
+    d = dict(row)
+    for key in MONEY_COLUMNS.intersection(d):
+        d[key] = Money(d[key])
+    return d
+
+def export_row(row):
+    """Row for spreadsheet writers: Money becomes a plain rupee number."""
+    return {k: (float(v) if isinstance(v, Money) else v) for k, v in row.items()}
@@ -0,0 +1,48 @@
+import csv
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from utils.money import export_row
+
+class StreamingExporter:
+    """
+    Writes rows as they come from an iterator (e.g. ReportingService.
+    iter_export_data) without holding them: openpyxl's write-only mode
+    flushes each row to the file, so memory stays flat for any row count.
+    Column widths are set from the headers up front (they can't be measured
+    afterwards in write-only mode).
+    """
+    MIN_WIDTH = 12
+
+    def export_to_excel(self, rows, headers, filename):
+        """rows: iterable of dicts (Money values become numbers). Returns the row count."""
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("Export")
+        for col_num, header in enumerate(headers, 1):
+            ws.column_dimensions[openpyxl.utils.get_column_letter(col_num)].width = max(self.MIN_WIDTH, len(header) + 2)
+        
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = openpyxl.styles.Font(bold=True)
+            header_cells.append(cell)
+        ws.append(header_cells)
+        
+        count = 0
+        for row in rows:
+            row = export_row(row)
+            ws.append([row.get(h, '') for h in headers])
+            count += 1
+        wb.save(filename)
+        return count
+
+    def export_to_csv(self, rows, headers, filename):
+        """Same as export_to_excel, as UTF-8 CSV (with BOM, so Excel reads it right)."""
+        count = 0
+        with open(filename, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            for row in rows:
+                row = export_row(row)
+                writer.writerow([row.get(h, '') for h in headers])
+                count += 1
+        return count
@@ -0,0 +1,69 @@
+import os
+import csv
+import datetime
+
+# Row-by-row reading of CSV and Excel files for the importers.
+# Nothing is loaded whole: CSV is read line by line and .xlsx through
+# openpyxl's read-only mode, so memory stays flat however long the file is.
+
+def normalize_header(name):
+    """'Invoice Number ' -> 'invoice_number'"""
+    return "_".join(str(name or "").strip().lower().replace("-", " ").split())
+
+# ISO, the Indian day-first forms, and what bank statements print ('01-Apr-2025', '01/04/25')
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%d-%b-%Y", "%d %b %Y", "%d/%m/%y", "%d-%m-%y", "%d-%b-%y")
+
+def parse_date(value):
+    """A date from a cell: date/datetime values as they are, text in DATE_FORMATS."""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    text = str(value).strip()
+    if " " in text and ":" in text:
+        text = text.rsplit(" ", 1)[0]  # '2025-04-01 00:00:00' from spreadsheets
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"invalid date {value!r} (use YYYY-MM-DD or DD/MM/YYYY)")
+
+def iter_rows(path, sheet=None):
+    """
+    Yields (line_number, {header: value}) for every non-blank data row.
+    The first row holds the headers; line numbers match what a spreadsheet
+    shows (the header is line 1). .xlsx/.xlsm values keep their Excel types
+    (numbers, datetimes); CSV values are strings.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        yield from _iter_xlsx(path, sheet)
+    elif ext in (".csv", ".txt"):
+        yield from _iter_csv(path)
+    else:
+        raise ValueError(f"Unsupported file type '{ext}' (use .csv or .xlsx)")
+
+def _rows_to_dicts(rows):
+    headers = None
+    for line_number, values in enumerate(rows, 1):
+        if headers is None:
+            headers = [normalize_header(v) for v in values]
+            continue
+        if all(v is None or str(v).strip() == "" for v in values):
+            continue
+        yield line_number, {h: v for h, v in zip(headers, values) if h}
+
+def _iter_csv(path):
+    # utf-8-sig: Excel's "CSV UTF-8" starts with a BOM
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from _rows_to_dicts(csv.reader(f))
+
+def _iter_xlsx(path, sheet=None):
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.active
+        yield from _rows_to_dicts(ws.iter_rows(values_only=True))
+    finally:
+        wb.close()
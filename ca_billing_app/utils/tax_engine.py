@@ -0,0 +1,102 @@
+from utils.money import Money
+
+# GST computation shared by every layer (services, invoice form, PDF).
+# All arithmetic is on integer paise. The rounding rule: each line's CGST,
+# SGST or IGST is rounded half-up to the paisa on its own, and invoice totals
+# are the sums of those rounded line amounts (what the PDF prints per line
+# always adds up to the stored totals).
+#
+# compute_batch() works column-wise on parallel lists (invoice ids, amounts,
+# rates, tax types) so a whole month of items is rated in one pass, without
+# building Money/Decimal objects per line.
+
+GST_RATES = (0, 5, 12, 18)
+TAX_TYPES = ('IGST', 'CGST_SGST', 'NONE')
+
+def _rate_tenths(rate):
+    """Percent -> integer tenths of a percent (18 -> 180, 2.5 -> 25)."""
+    return int(round(float(rate or 0) * 10))
+
+def _half_up(numerator, denominator):
+    """numerator / denominator rounded half away from zero (as Money.percent)."""
+    q = (abs(numerator) * 2 + denominator) // (2 * denominator)
+    return q if numerator >= 0 else -q
+
+def line_tax(amount_paise, rate, tax_type):
+    """(cgst, sgst, igst) in paise for one line."""
+    tenths = _rate_tenths(rate)
+    if tax_type == 'IGST':
+        return 0, 0, _half_up(amount_paise * tenths, 1000)
+    if tax_type == 'CGST_SGST':
+        half = _half_up(amount_paise * tenths, 2000)
+        return half, half, 0
+    return 0, 0, 0
+
+def rate_split(rate, tax_type):
+    """(cgst %, sgst %, igst %) shown for a line."""
+    rate = float(rate or 0)
+    if tax_type == 'IGST':
+        return 0, 0, rate
+    if tax_type == 'CGST_SGST':
+        return rate / 2, rate / 2, 0
+    return 0, 0, 0
+
+class LineTax:
+    __slots__ = ("amount", "rate", "cgst", "sgst", "igst")
+
+    def __init__(self, amount, rate, cgst, sgst, igst):
+        self.amount = amount
+        self.rate = rate
+        self.cgst = cgst
+        self.sgst = sgst
+        self.igst = igst
+
+class InvoiceTax:
+    """Per-line and total tax of one invoice; amounts are Money."""
+    def __init__(self, tax_type, lines):
+        self.tax_type = tax_type
+        self.lines = lines
+        self.taxable = Money(sum(line.amount.paise for line in lines))
+        self.cgst = Money(sum(line.cgst.paise for line in lines))
+        self.sgst = Money(sum(line.sgst.paise for line in lines))
+        self.igst = Money(sum(line.igst.paise for line in lines))
+
+    @property
+    def tax(self):
+        return self.cgst + self.sgst + self.igst
+
+    @property
+    def grand_total(self):
+        return self.taxable + self.tax
+
+    def totals(self):
+        """(taxable, cgst, sgst, igst, grand_total), the invoices table's money columns."""
+        return self.taxable, self.cgst, self.sgst, self.igst, self.grand_total
+
+def compute_invoice(items, tax_type):
+    """items: dicts with 'amount' (rupees or Money) and 'gst_rate'."""
+    lines = []
+    for item in items:
+        amount = Money.from_rupees(item['amount'])
+        cgst, sgst, igst = line_tax(amount.paise, item['gst_rate'], tax_type)
+        lines.append(LineTax(amount, item['gst_rate'], Money(cgst), Money(sgst), Money(igst)))
+    return InvoiceTax(tax_type, lines)
+
+def compute_batch(invoice_ids, amounts, rates, tax_types):
+    """
+    Column-wise rating of many items at once. Parallel sequences, one entry
+    per item: invoice id, amount in paise, GST rate, the invoice's tax type.
+    Returns {invoice_id: [taxable, cgst, sgst, igst, grand_total]} in paise.
+    """
+    totals = {}
+    for invoice_id, amount, rate, tax_type in zip(invoice_ids, amounts, rates, tax_types):
+        cgst, sgst, igst = line_tax(amount, rate, tax_type)
+        entry = totals.get(invoice_id)
+        if entry is None:
+            entry = totals[invoice_id] = [0, 0, 0, 0, 0]
+        entry[0] += amount
+        entry[1] += cgst
+        entry[2] += sgst
+        entry[3] += igst
+        entry[4] += amount + cgst + sgst + igst
+    return totals
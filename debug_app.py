@@ -1,31 +1,31 @@
 import sqlite3
 import re
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "ca_billing_app"))
 
-DB_FILE = "ca_billing_app/data/billing.db"
 GST_REGEX = r"^\d{2}[A-Z]{5}\d{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}$"
 TEST_GSTIN = "27AFFPJ3635J1ZD"
 
-def check_pos_column():
+def check_schema_version():
+    from config_manager import config_manager
+    from db.migrations import MIGRATIONS, get_user_version
+
+    db_file = config_manager.get_db_path()
     print("--- Checking DB Schema ---")
-    if not os.path.exists(DB_FILE):
-        print("DB File not found.")
+    if not os.path.exists(db_file):
+        print(f"DB File not found: {db_file}")
         return
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    conn = sqlite3.connect(db_file)
     try:
-        # Get columns for invoices
-        cursor.execute("PRAGMA table_info(invoices)")
-        cols = cursor.fetchall()
-        col_names = [c[1] for c in cols]
-        print("Columns in 'invoices':", col_names)
-        
-        if 'place_of_supply' in col_names:
-            print("SUCCESS: 'place_of_supply' column exists.")
-        else:
-            print("FAILURE: 'place_of_supply' column MISSING.")
-            
+        version = get_user_version(conn)
+        latest = MIGRATIONS[-1][0]
+        print(f"Database: {db_file}")
+        print(f"Schema version: {version} (latest {latest})")
+        if version < latest:
+            print("Pending migrations are applied automatically on next app start.")
     except Exception as e:
         print(f"Error reading DB: {e}")
     finally:
@@ -48,5 +48,5 @@ def test_gstin():
             print(f"Char {i}: {c} (ASCII {ord(c)})")
 
 if __name__ == "__main__":
-    check_pos_column()
+    check_schema_version()
     test_gstin()